@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Add the composite indexes behind the public listing queries
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY, so the
+tables stay writable while they build; an index left invalid by an
+interrupted build is dropped and built again. On SQLite a plain
+CREATE INDEX IF NOT EXISTS is used. Safe to run more than once.
+"""
+import os
+from sqlalchemy import create_engine, text
+
+# (index name, table, columns) - keep in sync with __table_args__ in main.py
+CONTENT_INDEXES = [
+    ('ix_video_content_published_order', 'video_content', ['is_published', 'order_index', 'id']),
+    ('ix_video_content_published_category_order', 'video_content', ['is_published', 'category', 'order_index', 'id']),
+    ('ix_text_content_published_order', 'text_content', ['is_published', 'order_index', 'id']),
+    ('ix_document_published_created', 'document', ['is_published', 'created_at', 'id']),
+    ('ix_document_published_category_created', 'document', ['is_published', 'category', 'created_at', 'id']),
+]
+
+# Keyset pagination compares (order_index, id) and (created_at, id) row values,
+# which never match NULLs: (table, column, value for NULL). Undated documents
+# sort as the oldest; the date is written the way SQLAlchemy stores DateTime
+# in SQLite, so it compares equal to cursor values there.
+BACKFILLS = [
+    ('video_content', 'order_index', 0),
+    ('text_content', 'order_index', 0),
+    ('document', 'created_at', '1970-01-01 00:00:00.000000'),
+]
+# Columns the models now declare NOT NULL; enforced where ALTER COLUMN exists
+NOT_NULL = [('document', 'created_at')]
+
+
+def create_content_indexes(engine):
+    postgres = engine.dialect.name == 'postgresql'
+
+    with engine.connect() as conn:
+        for table, column, value in BACKFILLS:
+            result = conn.execute(
+                text(f"UPDATE {table} SET {column} = :value WHERE {column} IS NULL"), {'value': value}
+            )
+            print(f"✅ {table}: backfilled {result.rowcount} NULL {column} values")
+        if postgres:
+            for table, column in NOT_NULL:
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+                print(f"✅ {table}.{column} is NOT NULL")
+        conn.commit()
+
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for name, table, columns in CONTENT_INDEXES:
+            if postgres:
+                valid = conn.execute(text("""
+                    SELECT i.indisvalid FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = :name
+                """), {'name': name}).scalar()
+                if valid is False:
+                    print(f"⚠️ {name} is invalid (interrupted build), rebuilding")
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                conn.execute(text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+                ))
+            else:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+            print(f"✅ {name} on {table} ({', '.join(columns)})")
+
+        for table in sorted({table for _, table, _ in CONTENT_INDEXES}):
+            conn.execute(text(f"ANALYZE {table}"))
+        print("✅ Table statistics updated")
+
+
+def add_content_indexes():
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL not found")
+        return
+
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+    engine = create_engine(database_url)
+
+    print("Adding listing indexes...")
+
+    try:
+        create_content_indexes(engine)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == '__main__':
+    add_content_indexes()
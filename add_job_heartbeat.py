@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Add job.heartbeat_at, which workers touch while they run a job (see jobs.py)
+
+Run by migrate.py; safe to run more than once.
+"""
+import os
+from sqlalchemy import create_engine, inspect, text
+
+def add_job_heartbeat(engine=None):
+    if engine is None:
+        database_url = os.environ.get('DATABASE_URL')
+        if not database_url:
+            print("❌ DATABASE_URL not found")
+            return
+
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+        engine = create_engine(database_url)
+
+    if 'heartbeat_at' in {column['name'] for column in inspect(engine).get_columns('job')}:
+        print("✅ job.heartbeat_at already exists")
+        return
+
+    print("Adding heartbeat_at column to job table...")
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE job ADD COLUMN heartbeat_at TIMESTAMP"))
+    print("✅ heartbeat_at column added")
+
+if __name__ == '__main__':
+    add_job_heartbeat()
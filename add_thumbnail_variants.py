@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+import os
+from sqlalchemy import create_engine, text
+
+def add_thumbnail_variants():
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL not found")
+        return
+    
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    
+    engine = create_engine(database_url)
+    
+    print("Adding thumbnail_variants column to video_content table...")
+    
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("""
+                ALTER TABLE video_content 
+                ADD COLUMN IF NOT EXISTS thumbnail_variants TEXT
+            """))
+            conn.commit()
+            print("✅ thumbnail_variants column added")
+            
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            conn.rollback()
+
+if __name__ == '__main__':
+    add_thumbnail_variants()
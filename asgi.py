@@ -0,0 +1,444 @@
+"""
+ASGI entry point: storage-bound endpoints served on an event loop
+
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker --timeout 300
+
+A sync gunicorn worker is pinned for as long as a document download or an
+upload talks to Supabase. Here GET /document/<id> and POST /api/upload do
+their storage I/O with async_storage.py: a request waiting on storage holds
+a coroutine, not the worker, so one worker keeps serving other requests.
+Their database work (a few short queries) runs in a thread pool inside the
+Flask app context, so the models, caches and blob bookkeeping are the ones
+main.py uses.
+
+Every other route, including /api/process-pdf-article (which only queues a
+job), is served by the Flask app through a2wsgi's thread pool, unchanged.
+Documents already in the local disk cache are also handed to Flask, whose
+send_file answers Range and conditional requests from disk.
+"""
+
+import os
+import time
+import sqlite3
+import mimetypes
+import tempfile
+
+import anyio
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.utils import secure_filename
+
+import main
+import metrics
+import async_storage
+from logs import get_logger
+from serializers import dumps
+
+log = get_logger('asgi')
+
+# Threads serving the Flask routes in each worker
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+
+flask_app = WSGIMiddleware(main.app, workers=ASGI_WSGI_THREADS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON encoded like the Flask routes (see serializers.py)"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+class AsyncRoute:
+    """ASGI endpoint for handler(request); a handler returning None leaves the request to Flask
+
+    route is the Flask rule of the same endpoint, so both serving modes
+    report into the same http_* series (see main.record_request).
+    """
+
+    def __init__(self, handler, route):
+        self.handler = handler
+        self.route = route
+
+    async def __call__(self, scope, receive, send):
+        started = time.perf_counter()
+        response = await self.handler(Request(scope, receive))
+        if response is None:
+            await flask_app(scope, receive, send)
+            return
+        sent = {'status': response.status_code, 'bytes': 0}
+
+        async def counting_send(message):
+            if message['type'] == 'http.response.start':
+                sent['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                sent['bytes'] += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await response(scope, receive, counting_send)
+        finally:
+            received = int(Request(scope).headers.get('Content-Length') or 0)
+            main.record_request(self.route, scope['method'], sent['status'], started, received, sent['bytes'])
+
+
+def in_app_context(function, *args):
+    with main.app.app_context():
+        return function(*args)
+
+
+async def call(function, *args):
+    """Run a blocking main.py function in the thread pool, inside the Flask app context"""
+    return await run_in_threadpool(in_app_context, function, *args)
+
+
+async def relay(upstream, writer=None, length=None):
+    """Body of a streamed storage response, optionally copied into the document cache"""
+    try:
+        async for chunk in upstream.aiter_raw(main.PROXY_CHUNK_SIZE):
+            if writer:
+                writer.write(chunk)
+            yield chunk
+        if writer and writer.size == length:
+            await run_in_threadpool(writer.commit)
+    finally:
+        if writer:
+            writer.discard()
+        # Also runs when the client disconnects mid-download
+        with anyio.CancelScope(shield=True):
+            await upstream.aclose()
+
+
+def relay_response(upstream, body, content_type=None, headers=None):
+    response = StreamingResponse(body, status_code=upstream.status_code,
+                                 media_type=content_type or upstream.headers.get('Content-Type', 'application/octet-stream'))
+    for name in main.PROXY_RESPONSE_HEADERS:
+        if name in upstream.headers:
+            response.headers[name] = upstream.headers[name]
+    response.headers.update(headers or {})
+    return response
+
+
+async def proxy_storage_file(request, url, content_type=None, headers=None):
+    """main.proxy_storage_file on the event loop"""
+    forwarded = {name: request.headers[name] for name in main.PROXY_REQUEST_HEADERS if name in request.headers}
+    forwarded['Accept-Encoding'] = 'identity'
+    upstream = await async_storage.request('get', 'GET', url, headers=forwarded, stream=True)
+    if upstream.status_code not in (200, 206, 304, 416):
+        await upstream.aclose()
+        return None
+    return relay_response(upstream, relay(upstream), content_type, headers)
+
+
+async def cached_storage_file(request, url, content_type=None, headers=None):
+    """main.cached_storage_file with the storage requests made on the event loop
+
+    Returns None when the file should be sent from the disk cache by Flask,
+    and a 404 response when storage does not have it. Range and conditional
+    requests that miss the cache are passed through to storage rather than
+    waiting for the whole file. When storage fails to answer a revalidation,
+    Flask is told (through the scope) to serve the stale copy without
+    asking storage again.
+    """
+    cache = main.document_cache
+    conditional = request.method == 'HEAD' or any(name in request.headers for name in main.PROXY_REQUEST_HEADERS)
+    upstream = None
+    if cache.enabled:
+        try:
+            entry = await run_in_threadpool(cache.lookup, url)
+        except sqlite3.Error as e:
+            log.exception('document_cache_error', url=url, error=str(e))
+            cache.count('errors')
+            entry = None
+        if entry and cache.is_fresh(entry):
+            return None
+        if entry:
+            try:
+                upstream = await async_storage.request('get', 'GET', url, stream=True,
+                                                       headers={'If-None-Match': entry.etag,
+                                                                'Accept-Encoding': 'identity'})
+            except httpx.HTTPError as e:
+                log.warning('document_revalidation_failed', url=url, error=str(e))
+                request.scope['document_revalidation_failed'] = True
+                return None
+            if upstream.status_code == 304:
+                await upstream.aclose()
+                await run_in_threadpool(cache.mark_validated, url)
+                cache.count('revalidated')
+                return None
+            if upstream.status_code in (404, 410):
+                await upstream.aclose()
+                await run_in_threadpool(cache.remove, url)
+                return PlainTextResponse("Document not available", 404)
+            if upstream.status_code != 200:
+                await upstream.aclose()
+                log.warning('document_revalidation_failed', url=url, status=upstream.status_code)
+                request.scope['document_revalidation_failed'] = True
+                return None
+            cache.count('refreshed')
+        cache.count('misses')
+
+    if conditional or not cache.enabled:
+        if upstream is not None:
+            await upstream.aclose()
+        response = await proxy_storage_file(request, url, content_type, headers)
+        return response or PlainTextResponse("Document not available", 404)
+
+    if upstream is None:
+        upstream = await async_storage.request('get', 'GET', url, stream=True, headers={'Accept-Encoding': 'identity'})
+        if upstream.status_code != 200:
+            await upstream.aclose()
+            return PlainTextResponse("Document not available", 404)
+
+    etag = upstream.headers.get('ETag')
+    length = int(upstream.headers.get('Content-Length') or -1)
+    writer = None
+    if etag and 0 <= length <= cache.max_file_bytes:
+        writer = await run_in_threadpool(cache.writer, url, etag, upstream.headers.get('Content-Type'),
+                                         upstream.headers.get('Last-Modified'), upstream.headers.get('Cache-Control'))
+    return relay_response(upstream, relay(upstream, writer, length), content_type, headers)
+
+
+def published_document(doc_id):
+    """(file_url, filename) of a published document, or None"""
+    document = main.db.session.get(main.Document, doc_id)
+    if document is None or not document.is_published:
+        return None
+    return document.file_url, document.filename
+
+
+async def view_document(request):
+    """View a single document inline (see main.view_document)"""
+    if request.method == 'HEAD':
+        return None
+    try:
+        document = await call(published_document, request.path_params['doc_id'])
+        if document is None:
+            return PlainTextResponse("Document not found", 404)
+        file_url, filename = document
+
+        # Stream the file from storage (filling the disk cache), or leave a cached copy to Flask
+        return await cached_storage_file(request, file_url, main.document_content_type(filename),
+                                         headers={'Content-Disposition': f'inline; filename="{filename}"'})
+    except Exception as e:
+        log.exception('view_document_error', error=str(e))
+        return PlainTextResponse("Document not found", 404)
+
+
+class UploadTooLarge(Exception):
+    """The request body grew past MAX_CONTENT_LENGTH"""
+
+
+async def limited_stream(request, limit):
+    """request.stream(), raising UploadTooLarge once more than limit bytes have arrived
+
+    Chunked uploads carry no Content-Length, so the body itself is counted.
+    """
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLarge()
+        yield chunk
+
+
+class SpoolingMultiPartParser(MultiPartParser):
+    """Starlette's multipart parser, writing file parts straight to named spool files
+
+    The asyncio counterpart of main.SpoolingRequest: each file part goes to a
+    file in JOB_SPOOL_DIR, hashed as it is written (main.HashingSpool), so an
+    upload is written to disk once and can be handed to a job in place. The
+    paths are appended to spooled_paths for the caller to remove.
+    """
+
+    def __init__(self, headers, stream, spooled_paths):
+        super().__init__(headers, stream)
+        self.spooled_paths = spooled_paths
+
+    def on_headers_finished(self):
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is None:
+            return
+        # Replace the in-memory spool Starlette made for this part
+        upload.file.close()
+        os.makedirs(main.JOB_SPOOL_DIR, exist_ok=True)
+        suffix = os.path.splitext(secure_filename(upload.filename or ''))[1]
+        spool = tempfile.NamedTemporaryFile('w+b', dir=main.JOB_SPOOL_DIR, suffix=suffix, delete=False)
+        self.spooled_paths.append(spool.name)
+        upload.file = main.HashingSpool(spool)
+        self._files_to_close_on_error.append(upload.file)
+
+
+def find_blob(sha256, size):
+    """(url, filename, content_type) of stored content with this hash, or None"""
+    blob = main.reusable_blob(sha256, size)
+    if blob is None:
+        return None
+    return blob.url, blob.filename, blob.content_type
+
+
+def duplicate_thumbnail(video_url, spool_path, filename):
+    """Thumbnail of stored content, queueing a job from this copy if it has none
+
+    Returns (thumbnail, adopted): adopted is True when the job took over spool_path.
+    """
+    thumbnail = main.existing_thumbnail(video_url)
+    if not (thumbnail[0] or thumbnail[2]) and main.job_queue.enabled:
+        return (None, [], main.queue_thumbnail_job(spool_path, filename, video_url)), True
+    return thumbnail, False
+
+
+def upload_resumable(spool_path, filename, content_type, sha256):
+    with open(spool_path, 'rb') as f:
+        return main.upload_resumable_http(f, filename, content_type, sha256)
+
+
+async def read_chunks(path):
+    async with await anyio.open_file(path, 'rb') as f:
+        while True:
+            chunk = await f.read(main.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def upload_to_supabase(spool_path, filename, content_type, size):
+    """main.upload_to_supabase_http, streaming the spool file on the event loop"""
+    if not main.storage_health.available:
+        log.warning('storage_unavailable', filename=filename)
+        return None
+
+    try:
+        upload_url = f"{main.SUPABASE_URL}/storage/v1/object/{main.SUPABASE_BUCKET}/{filename}"
+        headers = main.upload_headers(content_type)
+        headers['Content-Length'] = str(size)
+        response = await async_storage.request('upload', 'POST', upload_url, content=read_chunks(spool_path),
+                                               headers=headers)
+
+        if response.status_code == 200:
+            public_url = main.storage_public_url(filename)
+            log.info('storage_upload', filename=filename, size=size, content_type=content_type, method='async')
+            await call(main.index_storage_objects, [{'name': filename, 'size': size, 'content_type': content_type}])
+            return public_url
+        log.error('storage_upload_failed', filename=filename, status=response.status_code,
+                  response=response.text[:500])
+        return None
+
+    except (httpx.HTTPError, OSError) as e:
+        log.exception('storage_upload_error', filename=filename, method='async', error=str(e))
+        return None
+
+
+async def upload_file(request):
+    """POST /api/upload (see main.upload_file)"""
+    spool_path = None
+    spooled_paths = []
+    adopted = False
+    form = None
+    limit = main.app.config['MAX_CONTENT_LENGTH']
+    try:
+        if int(request.headers.get('Content-Length') or 0) > limit:
+            return FastJSONResponse({'error': 'File is too large. Maximum size is 500MB.'}, 413)
+        if not request.headers.get('Content-Type', '').startswith('multipart/form-data'):
+            return FastJSONResponse({'error': 'No file provided'}, 400)
+        parser = SpoolingMultiPartParser(request.headers, limited_stream(request, limit), spooled_paths)
+        form = await parser.parse()
+        file = form.get('file')
+        if file is None or isinstance(file, str):
+            return FastJSONResponse({'error': 'No file provided'}, 400)
+        file_type = form.get('type', 'video')
+
+        if not file.filename:
+            return FastJSONResponse({'error': 'No file selected'}, 400)
+
+        if not main.allowed_file(file.filename, file_type):
+            return FastJSONResponse({'error': f'File type not allowed for {file_type}'}, 400)
+
+        spool_path, file_size, sha256 = file.file.name, file.size, file.file.sha256
+
+        # Identical content already in storage: reuse its file, URL and thumbnail
+        blob = await call(find_blob, sha256, file_size)
+        if blob:
+            blob_url, blob_filename, blob_content_type = blob
+            log.info('upload_deduplicated', filename=blob_filename, size=file_size, sha256=sha256)
+            thumbnail = (None, [], None)
+            if file_type == 'video':
+                thumbnail, adopted = await call(duplicate_thumbnail, blob_url, spool_path, blob_filename)
+            return FastJSONResponse(main.upload_result(blob_url, blob_filename, file.filename, file_size,
+                                                       blob_content_type, sha256, thumbnail, 'deduplicated'))
+
+        filename = main.generate_unique_filename(file.filename)
+        content_type = file.content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        # Resumable uploads send their parts from their own threads (see resumable_upload.py)
+        upload_stats = None
+        if file_size >= main.RESUMABLE_UPLOAD_THRESHOLD:
+            file_url, upload_stats = await call(upload_resumable, spool_path, filename, content_type, sha256)
+            if upload_stats:
+                filename = upload_stats['object_name']
+        else:
+            file_url = await upload_to_supabase(spool_path, filename, content_type, file_size)
+
+        if not file_url:
+            return FastJSONResponse({
+                'error': 'Failed to upload to Supabase',
+                'supabase_available': main.storage_health.available,
+                'method': 'async_http'
+            }, 500)
+
+        await call(main.record_blob, sha256, filename, file_url, file_size, content_type)
+
+        thumbnail = (None, [], None)
+        if file_type == 'video':
+            if main.job_queue.enabled:
+                adopted = True
+                thumbnail = (None, [], await call(main.queue_thumbnail_job, spool_path, filename, file_url))
+            else:
+                thumbnail = (*await call(main.generate_thumbnail_http, spool_path, filename), None)
+
+        response_data = main.upload_result(file_url, filename, file.filename, file_size, content_type, sha256,
+                                           thumbnail, 'resumable_upload' if upload_stats else 'async_http_upload',
+                                           upload_stats)
+        log.info('upload_complete', original_name=file.filename, filename=filename, size=file_size,
+                 method=response_data['method'], thumbnail_job_id=thumbnail[2])
+        return FastJSONResponse(response_data)
+
+    except UploadTooLarge:
+        return FastJSONResponse({'error': 'File is too large. Maximum size is 500MB.'}, 413)
+    except MultiPartException as e:
+        return FastJSONResponse({'error': str(e)}, 400)
+    except Exception as e:
+        log.exception('upload_error', error=str(e))
+        return FastJSONResponse({'error': 'Upload failed', 'details': str(e)}, 500)
+    finally:
+        if form is not None:
+            await form.close()
+        # A queued thumbnail job deletes the spool file when it is done
+        for path in spooled_paths:
+            if adopted and path == spool_path:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+async def startup():
+    await call(main.start_background_workers)
+
+
+app = Starlette(
+    routes=[
+        Route('/document/{doc_id:int}', AsyncRoute(view_document, '/document/<int:doc_id>'), methods=['GET', 'HEAD']),
+        Route('/api/upload', AsyncRoute(upload_file, '/api/upload'), methods=['POST']),
+        Mount('/', flask_app),
+    ],
+    on_startup=[startup]
+)
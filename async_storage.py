@@ -0,0 +1,83 @@
+"""
+Async HTTP client for Supabase Storage, used by the ASGI entry point (asgi.py)
+
+The asyncio counterpart of storage_client.py: one httpx.AsyncClient per
+process keeps connections to storage alive, every call names an operation
+that picks its timeout, and idempotent calls are retried with the same
+jittered backoff on connection errors and 429/5xx responses. A request
+waiting on storage holds a coroutine, not a worker thread. Calls are
+recorded in metrics.py like the sync client's.
+"""
+
+import os
+import time
+import asyncio
+
+import httpx
+
+from storage_client import (STORAGE_POOL_SIZE, STORAGE_CONNECT_TIMEOUT, STORAGE_MAX_RETRIES,
+                            IDEMPOTENT_METHODS, RETRY_STATUSES, TIMEOUTS, backoff_delay, record_call)
+
+# The event loop serves many more concurrent requests than a sync worker
+ASYNC_STORAGE_POOL_SIZE = int(os.environ.get('ASYNC_STORAGE_POOL_SIZE', STORAGE_POOL_SIZE * 10))
+
+_stats = {'requests': 0, 'retries': 0, 'errors': 0}
+_client = None
+_client_owner = None
+
+
+def get_client():
+    """The keep-alive client for this process and event loop (recreated after fork)"""
+    global _client, _client_owner
+    owner = (os.getpid(), asyncio.get_running_loop())
+    if _client is None or _client_owner != owner:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=ASYNC_STORAGE_POOL_SIZE,
+                                max_keepalive_connections=ASYNC_STORAGE_POOL_SIZE),
+            follow_redirects=False
+        )
+        _client_owner = owner
+    return _client
+
+
+def timeout_for(operation):
+    return httpx.Timeout(TIMEOUTS.get(operation, TIMEOUTS['get']), connect=STORAGE_CONNECT_TIMEOUT)
+
+
+async def request(operation, method, url, idempotent=None, stream=False, **kwargs):
+    """Send a storage request; with stream=True the body is left unread (close it with aclose())
+
+    idempotent defaults to the HTTP method's semantics. Requests with a
+    streaming body (content that is not bytes or str) are sent once.
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    if kwargs.get('content') is not None and not isinstance(kwargs['content'], (bytes, str)):
+        idempotent = False
+    kwargs.setdefault('timeout', timeout_for(operation))
+    attempts = STORAGE_MAX_RETRIES + 1 if idempotent else 1
+
+    client = get_client()
+    for attempt in range(attempts):
+        _stats['requests'] += 1
+        started = time.perf_counter()
+        try:
+            response = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+        except httpx.TransportError:
+            record_call(operation, method, 'error', time.perf_counter() - started, kwargs)
+            if attempt == attempts - 1:
+                _stats['errors'] += 1
+                raise
+        else:
+            record_call(operation, method, response.status_code, time.perf_counter() - started, kwargs, response.headers)
+            if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                return response
+            await response.aclose()
+        _stats['retries'] += 1
+        await asyncio.sleep(backoff_delay(attempt))
+
+
+def stats():
+    """Request, retry and error counters for this process"""
+    return dict(_stats)
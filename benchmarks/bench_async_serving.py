@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Requests one gunicorn worker serves concurrently while storage is slow
+
+Starts the fake storage with --latency seconds of delay per request, then
+runs one worker of each server in turn and sends it --requests requests
+from --clients concurrent clients:
+
+    sync      gunicorn main:app (one request at a time)
+    gthread   gunicorn main:app -k gthread --threads N
+    asgi      gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+
+for document views (/document/<id>, disk cache off so every view goes to
+storage) and small uploads (/api/upload). Reports throughput, p50/p95
+latency and how many requests the worker overlapped: throughput x storage
+latency, so 1.0 means it waited on storage for one request at a time.
+
+    python benchmarks/bench_async_serving.py --clients 50 --latency 0.2
+    python benchmarks/bench_async_serving.py --servers sync asgi --endpoints document
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fake_storage import start_fake_storage
+
+
+def server_command(server, port, threads):
+    command = [sys.executable, '-m', 'gunicorn', '-w', '1', '-b', f'127.0.0.1:{port}', '--timeout', '300']
+    if server == 'sync':
+        return command + ['main:app']
+    if server == 'gthread':
+        return command + ['-k', 'gthread', '--threads', str(threads), 'main:app']
+    return command + ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:app']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(base_url, process, timeout=60):
+    import requests
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            if requests.get(base_url + '/health', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def run_load(send, clients, total):
+    """(wall seconds, latencies, failures) for total calls of send(session) from clients threads"""
+    import requests
+
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    per_client = total // clients
+
+    def client():
+        session = requests.Session()
+        for _ in range(per_client):
+            started = time.perf_counter()
+            try:
+                ok = send(session)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                (latencies if ok else failures).append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=50, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=200, help='requests per run')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds of storage delay per request')
+    parser.add_argument('--size', type=int, default=256, help='document and upload size in KiB')
+    parser.add_argument('--threads', type=int, default=4, help='threads of the gthread worker')
+    parser.add_argument('--servers', nargs='+', default=['sync', 'gthread', 'asgi'], choices=['sync', 'gthread', 'asgi'])
+    parser.add_argument('--endpoints', nargs='+', default=['document', 'upload'], choices=['document', 'upload'])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_async_')
+    _, storage_url = start_fake_storage(latency=args.latency)
+    env = dict(
+        os.environ,
+        SUPABASE_URL=storage_url,
+        SUPABASE_KEY='bench',
+        DATABASE_URL=os.environ.get('DATABASE_URL') or f'sqlite:///{os.path.join(workdir, "bench.db")}',
+        JOB_WORKERS='0',
+        DOCUMENT_CACHE_MAX_MB='0',
+        RESPONSE_CACHE_PATH=os.path.join(workdir, 'cache.sqlite3'),
+        SNAPSHOT_DIR=os.path.join(workdir, 'snapshots'),
+        PYTHONUNBUFFERED='1',
+    )
+    os.environ.update(env)
+
+    import main as app_main
+
+    app_main.create_schema()
+    body = os.urandom(args.size * 1024)
+    with app_main.app.app_context():
+        url = app_main.upload_to_supabase_http(body, 'bench_document.pdf', 'application/pdf')
+        document = app_main.Document(title='Bench', file_url=url, filename='bench_document.pdf',
+                                     file_type='pdf', file_size=len(body), is_published=True)
+        app_main.db.session.add(document)
+        app_main.db.session.commit()
+        doc_id = document.id
+
+    def view(base_url):
+        def send(session):
+            response = session.get(f'{base_url}/document/{doc_id}')
+            return response.status_code == 200 and len(response.content) == len(body)
+        return send
+
+    def upload(base_url):
+        def send(session):
+            # Different content every time, so nothing is deduplicated
+            data = os.urandom(16) + body[16:]
+            response = session.post(f'{base_url}/api/upload', data={'type': 'document'},
+                                    files={'file': ('bench.pdf', data, 'application/pdf')})
+            return response.status_code == 200
+        return send
+
+    endpoints = {'document': view, 'upload': upload}
+    print(f"\nstorage latency {args.latency * 1000:.0f} ms, {args.clients} clients, {args.requests} requests, "
+          f"{args.size} KiB")
+    print(f"{'server':<9} {'endpoint':<9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'concurrent':>11} {'failed':>7}")
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    for server in args.servers:
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        process = subprocess.Popen(server_command(server, port, args.threads), cwd=ROOT, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        try:
+            wait_until_ready(base_url, process)
+            for endpoint in args.endpoints:
+                send = endpoints[endpoint](base_url)
+                run_load(send, min(args.clients, 4), min(args.clients, 4))
+                wall, latencies, failures = run_load(send, args.clients, args.requests)
+                done = len(latencies)
+                rate = done / wall
+                if latencies:
+                    ordered = sorted(latencies)
+                    p50 = statistics.median(ordered) * 1000
+                    p95 = ordered[int(len(ordered) * 0.95) - 1] * 1000
+                else:
+                    p50 = p95 = 0
+                print(f"{server:<9} {endpoint:<9} {rate:>8.1f} {p50:>8.0f} {p95:>8.0f} {rate * args.latency:>11.1f}"
+                      f" {len(failures):>7}")
+        finally:
+            process.terminate()
+            process.wait()
+    log.close()
+    print(f"\nserver output: {log.name}")
+
+
+if __name__ == '__main__':
+    main()
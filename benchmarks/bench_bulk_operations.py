@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Admin bulk endpoints vs one request per item
+
+Reorders --items videos with one PUT /api/videos/<id> each (what the admin
+panel does today) and with a single POST /api/videos/reorder, then deletes
+--files storage files with one DELETE /api/files/<name> each and with a
+single POST /api/files/bulk. Storage is benchmarks/fake_storage.py with
+--latency seconds added to every call; requests go through the Flask test
+client, so the timings are server-side cost plus storage round trips.
+
+    python benchmarks/bench_bulk_operations.py --items 500 --files 200 --latency 0.02
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+from fake_storage import start_fake_storage
+
+
+def timed(fn):
+    started = time.perf_counter()
+    requests_sent = fn()
+    return (time.perf_counter() - started) * 1000, requests_sent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=500, help='videos to reorder')
+    parser.add_argument('--files', type=int, default=200, help='storage files to delete')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to each storage request')
+    args = parser.parse_args()
+
+    server, base_url = start_fake_storage()
+    workdir = tempfile.mkdtemp(prefix='bench_bulk_')
+    os.environ.update(SUPABASE_URL=base_url, SUPABASE_KEY='bench', JOB_WORKERS='0',
+                      DATABASE_URL=f'sqlite:///{os.path.join(workdir, "bench.db")}')
+    os.environ.setdefault('RESPONSE_CACHE_PATH', os.path.join(workdir, 'cache.sqlite3'))
+
+    import main as app_main
+
+    app_main.create_schema()
+    client = app_main.app.test_client()
+    response = client.post('/api/videos/bulk', json={'create': [
+        {'title': f'Video {i}', 'video_url': f'https://example.com/{i}.mp4', 'thumbnail_url': 'none',
+         'order_index': i} for i in range(args.items)
+    ]})
+    ids = response.json['created']
+
+    bucket_dir = os.path.join(server.storage.root, 'videos')
+    os.makedirs(bucket_dir, exist_ok=True)
+
+    def make_files(tag):
+        names = [f'{tag}_{i:05d}.bin' for i in range(args.files)]
+        for name in names:
+            with open(os.path.join(bucket_dir, name), 'wb') as f:
+                f.write(b'x')
+        return names
+
+    def reorder_one_by_one():
+        for position, video_id in enumerate(reversed(ids)):
+            assert client.put(f'/api/videos/{video_id}', json={'order_index': position}).status_code == 200
+        return len(ids)
+
+    def reorder_bulk():
+        assert client.post('/api/videos/reorder', json={'ids': ids}).status_code == 200
+        return 1
+
+    single_names, bulk_names = make_files('single'), make_files('bulk')
+    server.storage.latency = args.latency
+
+    def delete_one_by_one():
+        for name in single_names:
+            assert client.delete(f'/api/files/{name}').status_code == 200
+        return len(single_names)
+
+    def delete_bulk():
+        response = client.post('/api/files/bulk', json={'delete': bulk_names})
+        assert len(response.json['deleted']) == len(bulk_names)
+        return 1
+
+    print(f"\n{'operation':<34} {'ms':>9} {'requests':>9}")
+    for label, fn in ((f'reorder {args.items}, one PUT each', reorder_one_by_one),
+                      (f'reorder {args.items}, /reorder', reorder_bulk),
+                      (f'delete {args.files} files, one each', delete_one_by_one),
+                      (f'delete {args.files} files, /bulk', delete_bulk)):
+        ms, sent = timed(fn)
+        print(f"{label:<34} {ms:>9.1f} {sent:>9}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
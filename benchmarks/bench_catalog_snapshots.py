@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Public video catalog: paged /api/videos vs the precompressed snapshot
+
+Seeds --videos published videos and loads the whole catalog the way
+static/index.html does, through the Flask test client: every page of
+/api/videos (response cache cleared first, then cached), then
+/catalog/videos.json as plain and gzip-encoded JSON and as a 304
+revalidation. Reports the median time per full load, the requests it took
+and the bytes sent, plus the time to publish one category's snapshot
+after a write.
+
+    python benchmarks/bench_catalog_snapshots.py --videos 5000
+    DATABASE_URL=postgresql://... python benchmarks/bench_catalog_snapshots.py
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+CATEGORIES = ['Culture', 'History', 'Politics', 'Religion', 'Language', 'Music', 'Sports', 'Miscellaneous']
+
+
+def seed(main, count):
+    if main.db.session.query(main.VideoContent.id).limit(1).first():
+        return
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1)
+    rows = [{
+        'title': f'Video {i}',
+        'description': 'A short description of the video. ' * 3,
+        'video_url': f'https://example.com/{i}.mp4',
+        'thumbnail_url': f'https://example.com/{i}_thumb.jpg',
+        'category': rng.choice(CATEGORIES),
+        'is_published': True,
+        'order_index': i,
+        'created_at': start + timedelta(minutes=i),
+    } for i in range(count)]
+    main.db.session.execute(main.VideoContent.__table__.insert(), rows)
+    main.db.session.commit()
+    print(f"Seeded {count} videos")
+
+
+def load_all_pages(client, url, headers=None):
+    """(requests, bytes) for one full load, following X-Next-Cursor like fetchAllPages()"""
+    requests, size, cursor = 0, 0, None
+    while True:
+        response = client.get(f"{url}&cursor={cursor}" if cursor else url, headers=headers or {})
+        assert response.status_code in (200, 304), response.status_code
+        requests += 1
+        size += len(response.get_data())
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return requests, size
+
+
+def measure(load, repeat, before=None):
+    timings = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        requests, size = load()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), requests, size / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--videos', type=int, default=5000, help='published videos to seed')
+    parser.add_argument('--repeat', type=int, default=10, help='timed loads per case')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_snapshots_')
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ.setdefault('JOB_WORKERS', '0')
+    os.environ.setdefault('RESPONSE_CACHE_PATH', os.path.join(workdir, 'cache.sqlite3'))
+    os.environ.setdefault('SNAPSHOT_DIR', os.path.join(workdir, 'snapshots'))
+
+    import main as app_main
+
+    app_main.create_schema()
+    app = app_main.app
+    with app.app_context():
+        seed(app_main, args.videos)
+
+    client = app.test_client()
+    invalidate = lambda: app_main.response_cache.clear()
+    etag = client.get('/catalog/videos.json').headers['ETag']
+    cases = [
+        ('/api/videos, uncached', lambda: load_all_pages(client, '/api/videos?thumb_format=webp'), invalidate),
+        ('/api/videos, cached', lambda: load_all_pages(client, '/api/videos?thumb_format=webp'), None),
+        ('snapshot, identity', lambda: load_all_pages(client, '/catalog/videos.json?'), None),
+        ('snapshot, gzip', lambda: load_all_pages(client, '/catalog/videos.json?',
+                                                  {'Accept-Encoding': 'br, gzip'}), None),
+        ('snapshot, 304', lambda: load_all_pages(client, '/catalog/videos.json?',
+                                                 {'If-None-Match': etag}), None),
+    ]
+    print(f"\n{'full catalog load':<24} {'ms':>8} {'requests':>9} {'KiB sent':>9}")
+    for label, load, before in cases:
+        ms, requests, size = measure(load, args.repeat, before)
+        print(f"{label:<24} {ms:>8.2f} {requests:>9} {size:>9.0f}")
+
+    timings = []
+    with app.app_context():
+        for _ in range(args.repeat):
+            app_main.mark_changed('videos', 'Culture')
+            app_main.db.session.commit()
+            started = time.perf_counter()
+            app_main.build_snapshot('videos', 'Culture')
+            timings.append((time.perf_counter() - started) * 1000)
+    print(f"\npublish one category after a write: {statistics.median(timings):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
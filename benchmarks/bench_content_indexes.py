@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Listing queries on a seeded catalog, without and with the composite indexes
+
+Seeds --rows rows into each content table, drops the listing indexes,
+times the public list queries (first page, filtered by category, and a
+deep page reached by cursor) and records their query plans, then builds
+the indexes with add_content_indexes.py and measures again.
+
+    python benchmarks/bench_content_indexes.py --rows 100000
+    DATABASE_URL=postgresql://... python benchmarks/bench_content_indexes.py --keep-database
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+CATEGORIES = ['Culture', 'History', 'Politics', 'Religion', 'Language', 'Music', 'Sports', 'Miscellaneous']
+
+
+def seed(main, rows):
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1)
+
+    def common(i):
+        return {
+            'title': f'Item {i}',
+            'is_published': rng.random() < 0.9,
+            'created_at': start + timedelta(minutes=i + rng.random()),
+        }
+
+    tables = {
+        main.VideoContent: lambda i: {**common(i), 'description': 'Description ' * 5,
+                                      'video_url': f'https://example.com/{i}.mp4',
+                                      'category': rng.choice(CATEGORIES), 'order_index': rng.randint(0, 1000)},
+        main.TextContent: lambda i: {**common(i), 'content': 'Body text. ' * 50, 'excerpt': 'Excerpt',
+                                     'order_index': rng.randint(0, 1000)},
+        main.Document: lambda i: {**common(i), 'file_url': f'https://example.com/{i}.pdf',
+                                  'filename': f'{i}.pdf', 'category': rng.choice(CATEGORIES),
+                                  'download_count': 0},
+    }
+    for model, make_row in tables.items():
+        if main.db.session.query(model.id).limit(1).first():
+            continue
+        for offset in range(0, rows, 10000):
+            main.db.session.execute(model.__table__.insert(),
+                                    [make_row(i) for i in range(offset, min(rows, offset + 10000))])
+        main.db.session.commit()
+        print(f"Seeded {rows} rows into {model.__tablename__}")
+
+
+def query_shapes(main):
+    """(label, fields, order, where, args) for each public listing query"""
+    from pagination import fetch_page
+
+    videos = main.video_list_fields()
+    published = main.VideoContent.is_published == True
+    deep_videos = {'cursor': deep_cursor(main, main.VIDEO_ORDER, [published])}
+    shapes = [
+        ('videos', videos, main.VIDEO_ORDER, [published], {}),
+        ('videos ?category', videos, main.VIDEO_ORDER,
+         [published, main.VideoContent.category == 'Culture'], {}),
+        ('videos deep cursor', videos, main.VIDEO_ORDER, [published], deep_videos),
+        ('texts ?fields', main.TEXT_FIELDS, main.TEXT_ORDER,
+         [main.TextContent.is_published == True], {'fields': 'id,title,excerpt'}),
+        ('documents', main.DOCUMENT_FIELDS, main.DOCUMENT_ORDER, [main.Document.is_published == True], {}),
+        ('documents ?category', main.DOCUMENT_FIELDS, main.DOCUMENT_ORDER,
+         [main.Document.is_published == True, main.Document.category == 'Culture'], {}),
+    ]
+    return fetch_page, shapes
+
+
+def deep_cursor(main, order, where):
+    """Cursor for roughly the middle of the listing"""
+    from sqlalchemy import select, func
+    from pagination import encode_cursor
+
+    total = main.db.session.execute(select(func.count()).select_from(order[-1].class_).where(*where)).scalar()
+    middle = main.db.session.execute(
+        select(*order).where(*where).order_by(*(c.desc() for c in order)).offset(total // 2).limit(1)
+    ).one()
+    return encode_cursor(list(middle))
+
+
+def capture_sql(engine):
+    """List that receives (statement, parameters) of every executed query"""
+    from sqlalchemy import event
+
+    captured = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+    return captured
+
+
+def explain(main, statement, parameters):
+    prefix = 'EXPLAIN QUERY PLAN ' if main.db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    with main.db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+    return ' | '.join(str(row[-1]) for row in rows)
+
+
+def measure(main, repeat):
+    fetch_page, shapes = query_shapes(main)
+    captured = capture_sql(main.db.engine)
+    results = {}
+    for label, fields, order, where, args in shapes:
+        timings = []
+        for _ in range(repeat):
+            del captured[:]
+            started = time.perf_counter()
+            fetch_page(main.db.session, fields, order, where, args)
+            timings.append((time.perf_counter() - started) * 1000)
+            main.db.session.rollback()
+        results[label] = (statistics.median(timings), explain(main, *captured[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000, help='rows per content table')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per query')
+    parser.add_argument('--keep-database', action='store_true', help='do not delete the SQLite file afterwards')
+    args = parser.parse_args()
+
+    workdir = None
+    if not os.environ.get('DATABASE_URL'):
+        workdir = tempfile.mkdtemp(prefix='bench_indexes_')
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ.setdefault('JOB_WORKERS', '0')
+
+    import main as app_main
+    from sqlalchemy import text
+    from add_content_indexes import CONTENT_INDEXES, create_content_indexes
+
+    app_main.create_schema()
+    with app_main.app.app_context():
+        seed(app_main, args.rows)
+        with app_main.db.engine.connect() as conn:
+            for name, _, _ in CONTENT_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.commit()
+        before = measure(app_main, args.repeat)
+        create_content_indexes(app_main.db.engine)
+        after = measure(app_main, args.repeat)
+
+    print(f"\n{'query':<22} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for label in before:
+        print(f"{label:<22} {before[label][0]:>10.2f} {after[label][0]:>10.2f} "
+              f"{before[label][0] / after[label][0]:>7.1f}x")
+    print("\nQuery plans")
+    for label in before:
+        print(f"  {label}\n    before: {before[label][1]}\n    after:  {after[label][1]}")
+
+    if workdir and not args.keep_database:
+        os.unlink(os.path.join(workdir, 'bench.db'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Render time and memory of the /documents page at 10k documents
+
+Seeds --documents published documents and requests the page through the
+Flask test client: first a copy of the old handler (f-string concatenation
+over every document), then /documents uncached (the fragment cache is
+cleared before each request), cached, and a deep page reached by
+cursor. Reports the median time per request, the peak memory allocated
+while serving it (tracemalloc) and the response size.
+
+    python benchmarks/bench_documents_page.py --documents 10000
+    DATABASE_URL=postgresql://... python benchmarks/bench_documents_page.py
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+CATEGORIES = ['Culture', 'History', 'Politics', 'Religion', 'Language', 'Music', 'Sports', 'Miscellaneous']
+
+
+def legacy_documents_page(Document):
+    """The /documents handler before templates and paging"""
+    documents = Document.query.filter_by(is_published=True).order_by(Document.created_at.desc()).all()
+    doc_list = ""
+    for doc in documents:
+        size_mb = round(doc.file_size / (1024*1024), 2) if doc.file_size else 0
+        view_url = f"{doc.file_url}?inline=true"
+        doc_list += f'''
+        <div style="border: 1px solid #ddd; padding: 20px; margin: 15px 0; border-radius: 8px; background: white;">
+            <h3>
+                <a href="{view_url}" target="_blank" style="color: #007cba; text-decoration: none; cursor: pointer;">
+                    📄 {doc.title}
+                </a>
+            </h3>
+            <p style="color: #666; margin: 10px 0;">{doc.description or 'No description available'}</p>
+            <p style="color: #888; font-size: 14px;">
+                Size: {size_mb if size_mb > 0 else 'Unknown'} MB |
+                Views: {doc.download_count} |
+                Added: {doc.created_at.strftime('%Y-%m-%d')}
+            </p>
+            <div style="margin-top: 15px;">
+                <a href="{view_url}" target="_blank"
+                   style="background: #007cba; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">
+                    Read More
+                </a>
+            </div>
+        </div>
+        '''
+    return f'''<!DOCTYPE html>
+    <html><head><title>Documents - Mehr Open Mind</title></head>
+    <body><h1>📋 Documents</h1><hr>{doc_list}</body></html>'''
+
+
+def seed(main, count):
+    if main.db.session.query(main.Document.id).limit(1).first():
+        return
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1)
+    rows = [{
+        'title': f'Document {i}',
+        'description': 'A short description of the document. ' * 3,
+        'file_url': f'https://example.com/{i}.pdf',
+        'filename': f'{i}.pdf',
+        'file_size': rng.randint(10_000, 50_000_000),
+        'category': rng.choice(CATEGORIES),
+        'download_count': rng.randint(0, 5000),
+        'is_published': True,
+        'created_at': start + timedelta(minutes=i),
+    } for i in range(count)]
+    main.db.session.execute(main.Document.__table__.insert(), rows)
+    main.db.session.commit()
+    print(f"Seeded {count} documents")
+
+
+def measure(client, path, repeat, before=None):
+    timings, peaks = [], []
+    size = 0
+    for _ in range(repeat):
+        if before:
+            before()
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = client.get(path)
+        size = len(response.get_data())
+        timings.append((time.perf_counter() - started) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert response.status_code == 200, response.status_code
+    return statistics.median(timings), statistics.median(peaks) / 1024, size / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=10000, help='published documents to seed')
+    parser.add_argument('--repeat', type=int, default=10, help='timed requests per case')
+    args = parser.parse_args()
+
+    workdir = None
+    if not os.environ.get('DATABASE_URL'):
+        workdir = tempfile.mkdtemp(prefix='bench_documents_')
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ.setdefault('JOB_WORKERS', '0')
+    os.environ.setdefault('RESPONSE_CACHE_PATH', os.path.join(tempfile.mkdtemp(prefix='bench_cache_'), 'cache.sqlite3'))
+
+    import main as app_main
+    from pagination import encode_cursor
+    from sqlalchemy import select
+
+    app_main.create_schema()
+    app, Document = app_main.app, app_main.Document
+    app.add_url_rule('/bench/legacy-documents', 'legacy_documents', lambda: legacy_documents_page(Document))
+
+    with app.app_context():
+        seed(app_main, args.documents)
+        middle = app_main.db.session.execute(
+            select(Document.created_at, Document.id).order_by(Document.created_at.desc(), Document.id.desc())
+            .offset(args.documents // 2).limit(1)
+        ).one()
+    deep_cursor = encode_cursor(list(middle))
+
+    client = app.test_client()
+    invalidate = lambda: app_main.response_cache.clear()
+    cases = [
+        ('legacy (all documents)', '/bench/legacy-documents', None),
+        ('template, uncached', '/documents', invalidate),
+        ('template, cached', '/documents', None),
+        ('template, deep cursor', f'/documents?cursor={deep_cursor}', invalidate),
+    ]
+    client.get('/documents')
+    print(f"\n{'case':<24} {'ms':>8} {'peak KiB':>10} {'body KiB':>10}")
+    for label, path, before in cases:
+        ms, peak, size = measure(client, path, args.repeat, before)
+        print(f"{label:<24} {ms:>8.2f} {peak:>10.0f} {size:>10.0f}")
+
+    if workdir:
+        os.unlink(os.path.join(workdir, 'bench.db'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Hot-document download clicks: per-click ORM increment (old) vs buffered counters
+
+Runs the app in a threaded local server and sends --clicks requests for a
+single document from --clients concurrent clients, first to a copy of the
+old handler (load row, download_count += 1, commit) and then to
+/download/<id>. Reports throughput, failed requests and how many clicks
+the stored count lost.
+
+    python benchmarks/bench_download_counters.py --clients 16 --clicks 4000
+    DATABASE_URL=postgresql://... python benchmarks/bench_download_counters.py
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def run_load(base_url, path, clients, clicks):
+    import requests
+
+    failures = []
+    per_client = clicks // clients
+
+    def client():
+        session = requests.Session()
+        for _ in range(per_client):
+            response = session.get(base_url + path, allow_redirects=False)
+            if response.status_code != 302:
+                failures.append(response.status_code)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return per_client * clients, time.perf_counter() - started, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--clicks', type=int, default=4000, help='requests per run')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        workdir = tempfile.mkdtemp(prefix='bench_counters_')
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ.setdefault('JOB_WORKERS', '0')
+
+    import main as app_main
+    from flask import redirect
+    from werkzeug.serving import make_server
+
+    app_main.create_schema()
+    app, db, Document = app_main.app, app_main.db, app_main.Document
+
+    @app.route('/bench/legacy-download/<int:doc_id>')
+    def legacy_download(doc_id):
+        try:
+            document = Document.query.get_or_404(doc_id)
+            document.download_count += 1
+            db.session.commit()
+            return redirect(document.file_url)
+        except Exception as e:
+            return str(e), 500
+
+    with app.app_context():
+        documents = [Document(title=f'Hot {mode}', file_url='https://example.com/hot.pdf',
+                              filename='hot.pdf', download_count=0) for mode in ('legacy', 'buffered')]
+        db.session.add_all(documents)
+        db.session.commit()
+        legacy_id, buffered_id = [d.id for d in documents]
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.port}'
+
+    results = {}
+    for mode, path, doc_id in (('per-click commit', f'/bench/legacy-download/{legacy_id}', legacy_id),
+                               ('buffered', f'/download/{buffered_id}', buffered_id)):
+        sent, seconds, failed = run_load(base_url, path, args.clients, args.clicks)
+        app_main.download_counters.flush()
+        with app.app_context():
+            stored = db.session.get(Document, doc_id).download_count
+        results[mode] = (sent, seconds, failed, stored)
+    server.shutdown()
+
+    print(f"{'handler':<18} {'clicks/s':>9} {'failed':>7} {'stored':>7} {'lost':>6}")
+    for mode, (sent, seconds, failed, stored) in results.items():
+        print(f"{mode:<18} {sent / seconds:>9.0f} {failed:>7} {stored:>7} {sent - failed - stored:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Cost of the metrics instrumentation and of /metrics (see metrics.py)
+
+    per sample         metrics.inc() and metrics.observe() from --threads threads at once
+    per request        a cached GET /api/texts through the Flask test client with the
+                       request and SQL hooks installed vs removed
+    /metrics           flush + merge + render with --workers worker snapshots on disk,
+                       each holding the series a busy worker ends up with
+
+    python benchmarks/bench_metrics.py --requests 2000 --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def time_samples(metrics, threads, samples):
+    """Nanoseconds per inc() + observe() pair with threads recording at once"""
+    def record():
+        for i in range(samples):
+            metrics.inc('http_requests_total', route='/api/texts', method='GET', status=200)
+            metrics.observe('http_request_duration_seconds', 0.003, route='/api/texts', method='GET')
+
+    workers = [threading.Thread(target=record) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (threads * samples) * 1e9
+
+
+def time_requests(client, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        client.get('/api/texts').close()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def fake_snapshot(metrics, routes=40):
+    """Series of one worker that has served every route and query kind"""
+    metrics._forget_parent_samples()
+    for r in range(routes):
+        route = f'/api/route{r}'
+        for status in (200, 304, 404, 500):
+            metrics.inc('http_requests_total', random.randint(1, 10000), route=route, method='GET', status=status)
+        for _ in range(20):
+            metrics.observe('http_request_duration_seconds', random.random(), route=route, method='GET')
+        metrics.inc('http_response_bytes_total', random.randint(1, 10 ** 9), route=route)
+    for operation in ('select', 'insert', 'update', 'delete', 'other'):
+        metrics.observe('db_query_duration_seconds', random.random() / 100, operation=operation)
+    for operation in ('upload', 'list', 'delete', 'get', 'probe'):
+        metrics.observe('storage_request_duration_seconds', random.random(), operation=operation)
+    return metrics.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000, help='requests per timed run')
+    parser.add_argument('--samples', type=int, default=100000, help='samples per thread')
+    parser.add_argument('--threads', type=int, default=4, help='threads recording samples at once')
+    parser.add_argument('--workers', type=int, default=8, help='worker snapshots merged by /metrics')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_metrics_')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(workdir, "bench.db")}')
+    os.environ['METRICS_DIR'] = os.path.join(workdir, 'metrics')
+    os.environ['LOG_LEVEL'] = 'WARNING'
+
+    import main as app_main
+    import metrics
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    app_main.create_schema()
+    with app_main.app.app_context():
+        app_main.db.session.add_all(app_main.TextContent(title=f'Text {i}', content='x' * 500) for i in range(50))
+        app_main.db.session.commit()
+
+    print(f"{'case':<40} {'median':>12}")
+    for threads in (1, args.threads):
+        ns = statistics.median(time_samples(metrics, threads, args.samples) for _ in range(args.repeat))
+        print(f"{f'inc + observe, {threads} thread(s)':<40} {ns:>9.0f} ns")
+
+    def set_hooks(installed):
+        change = event.listen if installed else event.remove
+        change(Engine, 'before_cursor_execute', app_main.start_query_timer)
+        change(Engine, 'after_cursor_execute', app_main.record_query)
+        hooks = app_main.app.after_request_funcs[None]
+        if installed:
+            hooks.append(app_main.record_request_metrics)
+        else:
+            hooks.remove(app_main.record_request_metrics)
+
+    client = app_main.app.test_client()
+    client.get('/api/texts').close()
+    # Alternate the two cases so drift (caches, allocator) affects both alike
+    runs = {True: [], False: []}
+    for _ in range(args.repeat):
+        set_hooks(False)
+        runs[False].append(time_requests(client, args.requests))
+        set_hooks(True)
+        runs[True].append(time_requests(client, args.requests))
+    bare, instrumented = statistics.median(runs[False]), statistics.median(runs[True])
+    print(f"{'GET /api/texts, hooks removed':<40} {bare:>9.0f} us")
+    print(f"{'GET /api/texts, instrumented':<40} {instrumented:>9.0f} us  (+{instrumented - bare:.0f} us)")
+
+    os.makedirs(metrics.METRICS_DIR, exist_ok=True)
+    for worker in range(args.workers):
+        with open(os.path.join(metrics.METRICS_DIR, f'{worker}-bench.json'), 'w') as f:
+            json.dump(fake_snapshot(metrics), f)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        metrics.flush()
+        body = metrics.render()
+        timings.append((time.perf_counter() - started) * 1000)
+    label = f'/metrics, {args.workers + 1} snapshots'
+    print(f"{label:<40} {statistics.median(timings):>9.1f} ms  ({len(body) // 1024} KB, "
+          f"{body.count(chr(10))} lines)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Serializing video rows to JSON: ORM objects + hand-built dicts vs serializers.py
+
+For each --rows count, seeds that many videos and turns all of them into a
+JSON body with the admin video fields, timing query plus serialization:
+
+    orm + jsonify     ORM objects, a dict per object with created_at.isoformat(),
+                      encoded by Flask's default provider (the old handlers)
+    core + json       Core row tuples through Serializer, encoded by the json module
+    core + orjson     the same, encoded by orjson (skipped if it isn't installed)
+    core + streamed   the same, encoded in batches by iter_json_array()
+
+Reports the median time and the peak memory allocated (tracemalloc, measured
+in a separate run so it doesn't slow the timed ones).
+
+    python benchmarks/bench_serialization.py --rows 10000 100000
+    DATABASE_URL=postgresql://... python benchmarks/bench_serialization.py
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def seed(main, count):
+    table = main.VideoContent.__table__
+    main.db.session.execute(table.delete())
+    start = datetime(2020, 1, 1)
+    for offset in range(0, count, 10000):
+        main.db.session.execute(table.insert(), [{
+            'title': f'Video {i}',
+            'description': 'A short description of the video. ' * 3,
+            'video_url': f'https://example.com/{i}.mp4',
+            'thumbnail_url': f'https://example.com/{i}_thumb.jpg',
+            'category': 'Culture',
+            'is_published': True,
+            'order_index': i,
+            'created_at': start + timedelta(minutes=i),
+        } for i in range(offset, min(offset + 10000, count))])
+    main.db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help='row counts to serialize')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        workdir = tempfile.mkdtemp(prefix='bench_serialization_')
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ.setdefault('JOB_WORKERS', '0')
+
+    import main as app_main
+    import serializers
+    from flask.json.provider import DefaultJSONProvider
+    from sqlalchemy import select
+
+    app_main.create_schema()
+    app, db, VideoContent = app_main.app, app_main.db, app_main.VideoContent
+    fields = app_main.ADMIN_VIDEO_FIELDS
+    flask_json = DefaultJSONProvider(app)
+    orjson = serializers.orjson
+
+    def orm_jsonify():
+        videos = VideoContent.query.order_by(VideoContent.order_index.desc(), VideoContent.id.desc()).all()
+        body = flask_json.dumps([{
+            'id': video.id,
+            'title': video.title,
+            'description': video.description,
+            'video_url': video.video_url,
+            'thumbnail_url': video.thumbnail_url,
+            'is_published': video.is_published,
+            'order_index': video.order_index,
+            'created_at': video.created_at.isoformat()
+        } for video in videos]).encode()
+        db.session.expunge_all()
+        return body
+
+    def core_rows():
+        serializer = serializers.Serializer(fields)
+        statement = select(*serializer.select_columns()).order_by(VideoContent.order_index.desc(), VideoContent.id.desc())
+        return serializer, db.session.execute(statement)
+
+    def core_dumps(encoder):
+        def run():
+            serializers.orjson = encoder
+            serializer, result = core_rows()
+            return serializers.dumps(serializer.rows(result))
+        return run
+
+    def core_streamed():
+        serializers.orjson = orjson
+        serializer, result = core_rows()
+        return b''.join(serializers.iter_json_array(map(serializer.row, result)))
+
+    cases = [('orm + jsonify', orm_jsonify), ('core + json', core_dumps(None))]
+    if orjson:
+        cases += [('core + orjson', core_dumps(orjson)), ('core + streamed', core_streamed)]
+    else:
+        print("orjson is not installed; skipping the orjson cases")
+
+    with app.app_context():
+        for count in args.rows:
+            seed(app_main, count)
+            print(f"\n{count} rows")
+            print(f"{'case':<18} {'ms':>9} {'rows/s':>10} {'peak MiB':>9} {'body KiB':>9}")
+            baseline = None
+            for label, run in cases:
+                run()
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    body = run()
+                    timings.append((time.perf_counter() - started) * 1000)
+                tracemalloc.start()
+                run()
+                peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+                ms = statistics.median(timings)
+                baseline = baseline or ms
+                print(f"{label:<18} {ms:>9.1f} {count / ms * 1000:>10.0f} {peak:>9.1f} {len(body) / 1024:>9.0f}"
+                      f"  x{baseline / ms:.1f}")
+            serializers.orjson = orjson
+
+
+if __name__ == '__main__':
+    main()
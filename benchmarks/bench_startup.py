@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Worker startup: importing main.py now vs the work its import used to do
+
+Each run is a fresh Python process that times, in order:
+
+    import main        what a worker does at boot now (no network, no schema work)
+    storage probe      one attempt of the bucket probe the import used to block on
+                       (which retried with backoff, so an outage took several times longer)
+    create_schema      the schema work the import used to do (db.create_all, search index)
+    numpy/cv2/PyPDF2   imports paid by a worker's first thumbnail or PDF job, unless
+                       gunicorn.conf.py preloads them in the master
+
+against storage that answers after --latency seconds, and against storage
+that accepts connections but never answers (an outage: the probe waits for
+STORAGE_TIMEOUT_PROBE). "before" is import + probe + schema, what every
+worker paid at boot. Then boots gunicorn with --workers workers against the
+unresponsive storage and reports the time to the first /health response,
+with and without preloading the heavy modules.
+
+    python benchmarks/bench_startup.py --latency 0.5 --repeat 3
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from fake_storage import start_fake_storage
+
+CHILD = """
+import json, time, importlib
+timings = {}
+started = time.perf_counter()
+import main
+timings['import main'] = time.perf_counter() - started
+started = time.perf_counter()
+main.storage_health.check()
+timings['storage probe'] = time.perf_counter() - started
+started = time.perf_counter()
+main.create_schema()
+timings['create_schema'] = time.perf_counter() - started
+for name in ('numpy', 'cv2', 'PyPDF2'):
+    started = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        continue
+    timings[name] = time.perf_counter() - started
+print('TIMINGS ' + json.dumps(timings))
+"""
+
+
+def start_unresponsive_storage():
+    """A server that accepts connections and never answers; returns its base URL"""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(64)
+    held = []
+
+    def accept():
+        while True:
+            held.append(server.accept()[0])
+
+    threading.Thread(target=accept, daemon=True).start()
+    return f'http://127.0.0.1:{server.getsockname()[1]}'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_child(env):
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, capture_output=True, text=True)
+    for line in output.stdout.splitlines():
+        if line.startswith('TIMINGS '):
+            return json.loads(line[len('TIMINGS '):])
+    raise RuntimeError(output.stdout + output.stderr)
+
+
+def boot_to_first_response(env, workers, timeout=120):
+    import requests
+
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+                                'main:app'], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if requests.get(f'http://127.0.0.1:{port}/health', timeout=timeout).status_code == 200:
+                    return time.perf_counter() - started
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        raise RuntimeError("gunicorn did not answer")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds before the healthy storage answers')
+    parser.add_argument('--repeat', type=int, default=3, help='processes per case')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for the boot test')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    _, healthy_url = start_fake_storage(latency=args.latency)
+    scenarios = [(f'storage answering in {args.latency * 1000:.0f} ms', healthy_url),
+                 ('storage not answering', start_unresponsive_storage())]
+
+    base_env = dict(
+        os.environ,
+        SUPABASE_KEY='bench',
+        DATABASE_URL=os.environ.get('DATABASE_URL') or f'sqlite:///{os.path.join(workdir, "bench.db")}',
+        RESPONSE_CACHE_PATH=os.path.join(workdir, 'cache.sqlite3'),
+        SNAPSHOT_DIR=os.path.join(workdir, 'snapshots'),
+    )
+    run_child(dict(base_env, SUPABASE_URL=healthy_url))
+
+    for label, storage_url in scenarios:
+        env = dict(base_env, SUPABASE_URL=storage_url)
+        runs = [run_child(env) for _ in range(args.repeat)]
+        print(f"\n{label}")
+        print(f"{'step':<16} {'ms':>9}")
+        medians = {name: statistics.median(run[name] for run in runs) * 1000 for name in runs[0]}
+        for name, ms in medians.items():
+            print(f"{name:<16} {ms:>9.1f}")
+        before = medians['import main'] + medians['storage probe'] + medians['create_schema']
+        print(f"{'before (boot)':<16} {before:>9.1f}")
+        print(f"{'now (boot)':<16} {medians['import main']:>9.1f}  x{before / medians['import main']:.1f}")
+
+    env = dict(base_env, SUPABASE_URL=scenarios[1][1])
+    print(f"\ngunicorn -w {args.workers}, storage not answering: boot to first /health response")
+    for label, preload in [('no preload', ''), ('preload numpy,cv2,PyPDF2', 'numpy,cv2,PyPDF2')]:
+        seconds = statistics.median(boot_to_first_response(dict(env, GUNICORN_PRELOAD=preload), args.workers)
+                                    for _ in range(args.repeat))
+        print(f"{label:<28} {seconds * 1000:>9.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Bucket listing: single list call (old /api/files) vs paginated walks vs the index
+
+Fills benchmarks/fake_storage.py with --objects files (a tenth of them in
+a subfolder) and adds --latency seconds to every storage request. Then
+times the old listing (one list POST with an empty body, then a sort),
+full BucketLister walks sequentially and with several pages in flight,
+and /api/files served from the StorageObject index once it is filled.
+
+    python benchmarks/bench_storage_listing.py --objects 5000 --latency 0.05
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+from fake_storage import start_fake_storage
+
+
+def legacy_list(base_url, bucket):
+    """The old list_supabase_files_http + sort: one request, default page only"""
+    import requests
+
+    response = requests.post(f"{base_url}/storage/v1/object/list/{bucket}",
+                             headers={"Authorization": "Bearer bench"}, json={})
+    files = [{
+        'name': info['name'],
+        'url': f"{base_url}/storage/v1/object/public/{bucket}/{info['name']}",
+        'size': (info.get('metadata') or {}).get('size', 0),
+        'created': info.get('created_at', ''),
+    } for info in response.json()]
+    files.sort(key=lambda x: x.get('created', ''), reverse=True)
+    return files
+
+
+def timed(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--objects', type=int, default=5000, help='files in the bucket')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to each storage request')
+    parser.add_argument('--page-size', type=int, default=100, help='objects per list request')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    args = parser.parse_args()
+
+    server, base_url = start_fake_storage()
+    bucket_dir = os.path.join(server.storage.root, 'videos')
+    os.makedirs(os.path.join(bucket_dir, 'archive'), exist_ok=True)
+    for i in range(args.objects):
+        folder = 'archive' if i % 10 == 0 else ''
+        with open(os.path.join(bucket_dir, folder, f'file_{i:06d}.pdf'), 'wb') as f:
+            f.write(b'x' * (i % 1000))
+    server.storage.latency = args.latency
+
+    workdir = tempfile.mkdtemp(prefix='bench_listing_')
+    os.environ.update(SUPABASE_URL=base_url, SUPABASE_KEY='bench', JOB_WORKERS='0',
+                      DATABASE_URL=f'sqlite:///{os.path.join(workdir, "bench.db")}')
+    os.environ.setdefault('RESPONSE_CACHE_PATH', os.path.join(workdir, 'cache.sqlite3'))
+
+    import main as app_main
+    from storage_index import BucketLister
+
+    app_main.create_schema()
+    print(f"\n{'case':<34} {'ms':>9} {'objects':>8} {'requests':>9}")
+    ms, files = timed(lambda: legacy_list(base_url, 'videos'), args.repeat)
+    print(f"{'old: one list call + sort':<34} {ms:>9.1f} {len(files):>8} {1:>9}")
+    for concurrency in (1, 4, 8):
+        lister = BucketLister(app_main.list_storage_page, page_size=args.page_size, concurrency=concurrency)
+        ms, objects = timed(lister.walk, args.repeat)
+        print(f"{f'walk, {concurrency} in flight':<34} {ms:>9.1f} {len(objects):>8} {lister.pages:>9}")
+
+    client = app_main.app.test_client()
+    started = time.perf_counter()
+    client.post('/api/files/reconcile')
+    print(f"{'reconcile into index':<34} {(time.perf_counter() - started) * 1000:>9.1f}")
+    for label, path in (('/api/files (index, first page)', '/api/files'),
+                        ('/api/files?limit=500 (index)', '/api/files?limit=500'),
+                        ('/api/files?prefix=archive/', '/api/files?prefix=archive/&limit=500')):
+        ms, response = timed(lambda: client.get(path), args.repeat * 10)
+        print(f"{label:<34} {ms:>9.2f} {len(response.json):>8} {0:>9}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Thumbnail decode path: copy-to-temp-file (old) vs decoding the spooled upload in place
+
+The old path held the upload in memory as bytes and wrote it to a second
+temporary file before OpenCV could open it. Each measurement runs in a
+fresh subprocess so peak RSS covers only that path.
+
+    python benchmarks/bench_thumbnail_decode.py --sizes 50 200 500
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_video(path, size_mb):
+    """Write an MJPEG AVI of roughly size_mb made of noisy 1080p frames"""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    frame = (rng.random((1080, 1920, 3)) * 255).astype(np.uint8)
+    frame_bytes = len(cv2.imencode('.jpg', frame)[1])
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (1920, 1080))
+    for i in range(max(1, size_mb * 1024 * 1024 // frame_bytes)):
+        writer.write(np.roll(frame, 7 * i, axis=1))
+    writer.release()
+
+
+def run_worker(mode, path):
+    from thumbnails import extract_thumbnail_variants
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    if mode == 'copy':
+        with open(path, 'rb') as f:
+            video_data = f.read()
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.avi') as temp_video:
+            temp_video.write(video_data)
+            temp_path = temp_video.name
+        try:
+            variants = extract_thumbnail_variants(temp_path)
+        finally:
+            os.unlink(temp_path)
+    else:
+        variants = extract_thumbnail_variants(path)
+    seconds = time.perf_counter() - started
+    print(json.dumps({'variants': len(variants), 'seconds': seconds, 'rss_mb': peak_rss_mb() - baseline}))
+
+
+def measure(mode, path):
+    output = subprocess.run([sys.executable, __file__, '--worker', mode, path],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 500], help='video sizes in MB')
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(*args.worker)
+
+    workdir = tempfile.mkdtemp(prefix='bench_decode_')
+    print(f"{'size MB':>8} {'copy s':>8} {'copy ΔRSS MB':>13} {'in-place s':>11} {'in-place ΔRSS MB':>17}")
+    for size in args.sizes:
+        path = os.path.join(workdir, f'video_{size}mb.avi')
+        make_video(path, size)
+        copy = measure('copy', path)
+        in_place = measure('in_place', path)
+        print(f"{size:>8} {copy['seconds']:>8.2f} {copy['rss_mb']:>13.1f} "
+              f"{in_place['seconds']:>11.2f} {in_place['rss_mb']:>17.1f}")
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
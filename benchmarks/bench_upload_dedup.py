@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Upload of new content vs a re-upload of identical content
+
+Starts benchmarks/fake_storage.py and the app in a threaded local server,
+then posts the same --size MB file to /api/upload --repeat times (as a
+document, so no thumbnail work is involved) followed by one file with
+different content. Reports each upload's time and how many bytes reached
+storage, plus the SHA-256 throughput that hashing the spool costs.
+
+    python benchmarks/bench_upload_dedup.py --size 100 --repeat 3
+"""
+
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+from fake_storage import start_fake_storage
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=100, help='file size in MB')
+    parser.add_argument('--repeat', type=int, default=3, help='uploads of the same content')
+    args = parser.parse_args()
+
+    storage_server, storage_url = start_fake_storage(discard=True)
+    workdir = tempfile.mkdtemp(prefix='bench_dedup_')
+    os.environ.update(SUPABASE_URL=storage_url, SUPABASE_KEY='bench', JOB_WORKERS='0',
+                      DATABASE_URL=f'sqlite:///{os.path.join(workdir, "bench.db")}')
+    os.environ.setdefault('RESPONSE_CACHE_PATH', os.path.join(workdir, 'cache.sqlite3'))
+
+    import requests
+    import main as app_main
+    from werkzeug.serving import make_server
+
+    app_main.create_schema()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app_main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.port}'
+
+    def write_file(path, seed):
+        block = hashlib.sha256(seed).digest() * (1024 * 1024 // 32)
+        with open(path, 'wb') as f:
+            for _ in range(args.size):
+                f.write(block)
+
+    same_path = os.path.join(workdir, 'same.pdf')
+    other_path = os.path.join(workdir, 'other.pdf')
+    write_file(same_path, b'same')
+    write_file(other_path, b'other')
+
+    print(f"\n{'upload':<22} {'ms':>9} {'MB to storage':>14} {'method':>14}")
+    for label, path in [(f'same content #{i + 1}', same_path) for i in range(args.repeat)] + \
+                       [('different content', other_path)]:
+        received = storage_server.storage.bytes_received
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            response = requests.post(f'{base_url}/api/upload', data={'type': 'document'},
+                                     files={'file': (os.path.basename(path), f, 'application/pdf')})
+        ms = (time.perf_counter() - started) * 1000
+        sent = (storage_server.storage.bytes_received - received) / (1024 * 1024)
+        print(f"{label:<22} {ms:>9.0f} {sent:>14.1f} {response.json().get('method'):>14}")
+
+    data = os.urandom(64 * 1024 * 1024)
+    started = time.perf_counter()
+    hashlib.sha256(data).hexdigest()
+    print(f"\nSHA-256 throughput: {64 / (time.perf_counter() - started):.0f} MB/s")
+
+    server.shutdown()
+    storage_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
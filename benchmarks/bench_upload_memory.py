@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Peak RSS of an upload to storage: buffered (file.read()) vs streamed
+
+Each measurement runs in a fresh subprocess against the local storage
+stand-in, so ru_maxrss reflects only that upload.
+
+    python benchmarks/bench_upload_memory.py --sizes 50 100 200
+"""
+
+import os
+import sys
+import json
+import argparse
+import resource
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(mode, path):
+    import main
+    main.create_schema()
+    baseline = peak_rss_mb()
+    with open(path, 'rb') as f:
+        data = f.read() if mode == 'buffered' else f
+        url = main.upload_to_supabase_http(data, os.path.basename(path), 'video/mp4')
+    print(json.dumps({'ok': bool(url), 'baseline_mb': baseline, 'peak_mb': peak_rss_mb()}))
+
+
+def measure(mode, path, env):
+    output = subprocess.run(
+        [sys.executable, __file__, '--worker', mode, path],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 200], help='upload sizes in MB')
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(*args.worker)
+
+    from fake_storage import start_fake_storage
+    server, base_url = start_fake_storage(discard=True)
+    workdir = tempfile.mkdtemp(prefix='bench_upload_')
+    env = dict(os.environ, SUPABASE_URL=base_url, SUPABASE_KEY='bench',
+               DATABASE_URL=f'sqlite:///{os.path.join(workdir, "bench.db")}')
+
+    print(f"{'size MB':>8} {'buffered ΔRSS MB':>18} {'streamed ΔRSS MB':>18}")
+    for size in args.sizes:
+        path = os.path.join(workdir, f'upload_{size}mb.bin')
+        with open(path, 'wb') as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(size):
+                f.write(block)
+        results = {}
+        for mode in ('buffered', 'streamed'):
+            result = measure(mode, path, env)
+            if not result['ok']:
+                raise SystemExit(f"{mode} upload of {size} MB failed")
+            results[mode] = result['peak_mb'] - result['baseline_mb']
+        print(f"{size:>8} {results['buffered']:>18.1f} {results['streamed']:>18.1f}")
+        os.unlink(path)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the subset of the Supabase Storage HTTP API used by main.py
+
+Objects are written to a directory on disk. Run it directly to get a server
+for manual testing, or use start_fake_storage() from a benchmark:
+
+    python benchmarks/fake_storage.py --port 54321
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=dev python main.py
+"""
+
+import os
+import re
+import json
+import uuid
+import base64
+import shutil
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CHUNK_SIZE = 64 * 1024
+
+
+class FakeStorageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def storage(self):
+        return self.server.storage
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def iter_body(self):
+        """Yield the request body in chunks, handling chunked transfer encoding"""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().strip().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return
+                remaining = size
+                while remaining:
+                    chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                    remaining -= len(chunk)
+                    yield chunk
+                self.rfile.readline()
+        remaining = int(self.headers.get('Content-Length') or 0)
+        while remaining:
+            chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+    def object_path(self, bucket, name):
+        return os.path.join(self.storage.root, bucket, name)
+
+    def route(self):
+        """Split the request path into (kind, bucket, object name)"""
+        path = urlparse(self.path).path
+        prefix = '/storage/v1/'
+        if not path.startswith(prefix):
+            return None, None, None
+        parts = path[len(prefix):].split('/')
+        if parts[:2] == ['upload', 'resumable']:
+            return 'resumable', None, '/'.join(parts[2:])
+        if parts[0] == 'bucket':
+            return 'bucket', None, None
+        if parts[0] == 'object' and len(parts) >= 3 and parts[1] in ('public', 'list'):
+            return parts[1], parts[2], '/'.join(parts[3:])
+        if parts[0] == 'object' and len(parts) >= 2:
+            return 'object', parts[1], '/'.join(parts[2:])
+        return None, None, None
+
+    # TUS resumable uploads (creation, concatenation)
+
+    def send_tus(self, status, **headers):
+        self.send_response(status)
+        self.send_header('Tus-Resumable', '1.0.0')
+        for name, value in headers.items():
+            self.send_header(name.replace('_', '-'), str(value))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_OPTIONS(self):
+        extensions = 'creation,concatenation' if self.storage.concatenation else 'creation'
+        self.send_tus(204, Tus_Version='1.0.0', Tus_Extension=extensions)
+
+    def do_HEAD(self):
+        self.storage.delay()
+        kind, _, upload_id = self.route()
+        upload = self.storage.uploads.get(upload_id) if kind == 'resumable' else None
+        if upload is None:
+            return self.send_tus(404)
+        self.send_tus(200, Upload_Offset=upload['offset'], Upload_Length=upload['length'], Cache_Control='no-store')
+
+    def do_PATCH(self):
+        self.storage.delay()
+        kind, _, upload_id = self.route()
+        upload = self.storage.uploads.get(upload_id) if kind == 'resumable' else None
+        if upload is None:
+            return self.send_tus(404)
+        if int(self.headers['Upload-Offset']) != upload['offset']:
+            return self.send_tus(409)
+        drop = self.storage.should_fail()
+        with open(upload['path'], 'ab') as f:
+            for chunk in self.iter_body():
+                f.write(chunk)
+                upload['offset'] += len(chunk)
+                self.storage.bytes_received += len(chunk)
+                if drop and upload['offset'] % (2 * CHUNK_SIZE) == 0:
+                    # Simulate a dropped connection part-way through the body
+                    self.close_connection = True
+                    return
+        if upload['offset'] == upload['length'] and not upload['partial']:
+            self.storage.finish_upload(upload, [upload['path']])
+        self.send_tus(204, Upload_Offset=upload['offset'])
+
+    def create_upload(self):
+        metadata = {}
+        for item in self.headers.get('Upload-Metadata', '').split(','):
+            if item.strip():
+                key, _, value = item.strip().partition(' ')
+                metadata[key] = base64.b64decode(value).decode()
+        concat = self.headers.get('Upload-Concat', '')
+        upload_id = uuid.uuid4().hex
+        location = f"http://{self.headers['Host']}/storage/v1/upload/resumable/{upload_id}"
+        upload = {
+            'path': os.path.join(self.storage.root, '.uploads', upload_id),
+            'length': int(self.headers.get('Upload-Length', 0)),
+            'offset': 0,
+            'metadata': metadata,
+            'partial': concat == 'partial'
+        }
+        os.makedirs(os.path.dirname(upload['path']), exist_ok=True)
+        open(upload['path'], 'wb').close()
+        if concat.startswith('final;'):
+            # The length of a final upload is the sum of its parts; the client must not send one
+            if 'Upload-Length' in self.headers:
+                return self.send_tus(400)
+            part_ids = [url.rstrip('/').rsplit('/', 1)[-1] for url in concat[len('final;'):].split()]
+            parts = [self.storage.uploads.get(part_id) for part_id in part_ids]
+            if any(p is None or p['offset'] != p['length'] for p in parts):
+                return self.send_tus(400)
+            self.storage.finish_upload(upload, [p['path'] for p in parts])
+            upload['length'] = upload['offset'] = sum(p['length'] for p in parts)
+            self.storage.uploads[upload_id] = upload
+            return self.send_tus(201, Location=location)
+        self.storage.uploads[upload_id] = upload
+        if upload['length'] == 0 and not upload['partial']:
+            self.storage.finish_upload(upload, [])
+        self.send_tus(201, Location=location)
+
+    def do_GET(self):
+        self.storage.delay()
+        kind, bucket, name = self.route()
+        if kind == 'bucket':
+            return self.send_json(200, [])
+        if kind != 'public':
+            return self.send_json(404, {'error': 'not_found'})
+        path = self.object_path(bucket, name)
+        if not os.path.isfile(path):
+            return self.send_json(404, {'error': 'not_found'})
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        # Single byte ranges, honoured only while If-Range (if sent) still matches
+        start, end, status = 0, size - 1, 200
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', self.headers.get('Range', ''))
+        if match and self.headers.get('If-Range', etag) == etag and any(match.groups()):
+            first, last = match.groups()
+            if first:
+                start, end = int(first), min(int(last), size - 1) if last else size - 1
+            else:
+                start = max(0, size - int(last))
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', self.storage.content_types.get((bucket, name), 'application/octet-stream'))
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def do_POST(self):
+        self.storage.delay()
+        kind, bucket, name = self.route()
+        if kind == 'resumable':
+            return self.create_upload()
+        if kind == 'list':
+            body = b''.join(self.iter_body())
+            return self.send_json(200, self.storage.list_objects(bucket, json.loads(body or b'{}')))
+        if kind != 'object' or not name:
+            return self.send_json(404, {'error': 'not_found'})
+        path = self.object_path(bucket, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        received = 0
+        with open(path, 'wb') as f:
+            for chunk in self.iter_body():
+                received += len(chunk)
+                if not self.storage.discard:
+                    f.write(chunk)
+        self.storage.content_types[(bucket, name)] = self.headers.get('Content-Type', 'application/octet-stream')
+        self.storage.bytes_received += received
+        self.send_json(200, {'Key': f'{bucket}/{name}'})
+
+    do_PUT = do_POST
+
+    def do_DELETE(self):
+        self.storage.delay()
+        kind, bucket, name = self.route()
+        if kind == 'object' and not name:
+            # Multi-object remove: {"prefixes": [names]} -> the objects that existed
+            body = b''.join(self.iter_body())
+            removed = []
+            for key in json.loads(body or b'{}').get('prefixes', []):
+                path = self.object_path(bucket, key)
+                if os.path.isfile(path):
+                    os.unlink(path)
+                    removed.append({'name': key, 'bucket_id': bucket})
+            return self.send_json(200, removed)
+        path = self.object_path(bucket, name or '')
+        if kind != 'object' or not os.path.isfile(path):
+            return self.send_json(404, {'error': 'not_found'})
+        os.unlink(path)
+        self.send_json(200, {'message': 'Successfully deleted'})
+
+
+class FakeStorage:
+    def __init__(self, root=None, discard=False, latency=0.0, concatenation=True, fail_every=0):
+        self.root = root or tempfile.mkdtemp(prefix='fake_storage_')
+        self.discard = discard
+        self.latency = latency
+        self.concatenation = concatenation
+        self.fail_every = fail_every
+        self.bytes_received = 0
+        self.content_types = {}
+        self.uploads = {}
+        self.patches = 0
+        self.lock = threading.Lock()
+
+    def should_fail(self):
+        """True for every fail_every-th PATCH, to exercise client retries"""
+        with self.lock:
+            self.patches += 1
+            return bool(self.fail_every) and self.patches % self.fail_every == 0
+
+    def finish_upload(self, upload, part_paths):
+        """Assemble part files into the object named in the upload metadata"""
+        metadata = upload['metadata']
+        bucket, name = metadata['bucketName'], metadata['objectName']
+        path = os.path.join(self.root, bucket, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out:
+            for part_path in part_paths:
+                with open(part_path, 'rb') as f:
+                    shutil.copyfileobj(f, out, CHUNK_SIZE)
+        self.content_types[(bucket, name)] = metadata.get('contentType', 'application/octet-stream')
+
+    def delay(self):
+        if self.latency:
+            threading.Event().wait(self.latency)
+
+    def list_objects(self, bucket, options):
+        directory = os.path.join(self.root, bucket, options.get('prefix', ''))
+        if not os.path.isdir(directory):
+            return []
+        names = sorted(os.listdir(directory))
+        offset = int(options.get('offset', 0))
+        limit = int(options.get('limit', 100))
+        entries = []
+        for name in names[offset:offset + limit]:
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                entries.append({'name': name, 'id': None, 'metadata': None})
+                continue
+            stat = os.stat(path)
+            key = os.path.relpath(path, os.path.join(self.root, bucket))
+            modified = datetime.utcfromtimestamp(stat.st_mtime).isoformat() + 'Z'
+            entries.append({
+                'name': name,
+                'id': key,
+                'created_at': modified,
+                'updated_at': modified,
+                'metadata': {
+                    'size': stat.st_size,
+                    'mimetype': self.content_types.get((bucket, key), 'application/octet-stream'),
+                    'eTag': f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+                }
+            })
+        return entries
+
+
+def start_fake_storage(port=0, **options):
+    """Start the stand-in on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeStorageHandler)
+    server.daemon_threads = True
+    server.storage = FakeStorage(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Supabase Storage stand-in')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--root', help='directory for stored objects')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of delay per request')
+    parser.add_argument('--fail-every', type=int, default=0, help='drop every Nth resumable PATCH')
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), FakeStorageHandler)
+    server.storage = FakeStorage(root=args.root, latency=args.latency, fail_every=args.fail_every)
+    print(f"Fake storage on http://127.0.0.1:{args.port} (root: {server.storage.root})")
+    server.serve_forever()
@@ -0,0 +1,119 @@
+"""
+Buffered counters for hot columns such as Document.download_count
+
+Incrementing a counter only adds to a dict in this worker's memory. A
+background thread flushes the totals every COUNTER_FLUSH_INTERVAL seconds
+as one transaction of UPDATE ... SET column = column + n statements, so
+concurrent increments can't overwrite each other and no row lock is
+held per click. Pending counts are flushed again at interpreter exit
+(gunicorn's graceful worker shutdown), and a failed flush puts its counts
+back for the next attempt. With an interval of 0 every increment is
+written immediately (still as an atomic UPDATE).
+
+A flush touches nothing but the counter columns: listings that are cached
+by revision leave counters out (main.py serves download counts on their
+own), so clicks never invalidate them.
+"""
+
+import os
+import atexit
+import threading
+from collections import defaultdict
+
+from sqlalchemy import bindparam, func
+
+from logs import get_logger
+
+COUNTER_FLUSH_INTERVAL = float(os.environ.get('COUNTER_FLUSH_INTERVAL', 5))
+
+log = get_logger('counters')
+
+
+class CounterBuffer:
+    def __init__(self, app, db, interval=COUNTER_FLUSH_INTERVAL):
+        self.app = app
+        self.db = db
+        self.interval = interval
+        self.pending = defaultdict(int)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.started_pid = None
+        self.stats_counters = {'increments': 0, 'flushes': 0, 'rows_updated': 0, 'errors': 0}
+
+    def increment(self, column, row_id, amount=1):
+        """Add amount to column (e.g. Document.download_count) of the row with primary key row_id"""
+        self.start()
+        with self.lock:
+            self.pending[(column, row_id)] += amount
+            self.stats_counters['increments'] += amount
+        if self.interval <= 0:
+            self.flush()
+
+    def start(self):
+        """Start this process's flush thread once (cheap to call on every increment)"""
+        if self.started_pid == os.getpid() or self.interval <= 0:
+            return
+        with self.lock:
+            if self.started_pid == os.getpid():
+                return
+            self.started_pid = os.getpid()
+            # Inherited counts belong to the parent process, which flushes them itself
+            self.pending = defaultdict(int)
+            threading.Thread(target=self.flush_loop, name='counter-flush', daemon=True).start()
+            atexit.register(self.flush)
+
+    def flush_loop(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def take_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(int)
+        return pending
+
+    def restore(self, pending):
+        with self.lock:
+            for key, amount in pending.items():
+                self.pending[key] += amount
+
+    def flush(self):
+        """Write pending increments in one transaction; returns the number of rows updated"""
+        with self.flush_lock:
+            pending = self.take_pending()
+            if not pending:
+                return 0
+            by_column = defaultdict(list)
+            for (column, row_id), amount in pending.items():
+                by_column[column].append({'row_id': row_id, 'amount': amount})
+            try:
+                with self.app.app_context():
+                    session = self.db.session
+                    for column, params in by_column.items():
+                        table = column.class_.__table__
+                        statement = (
+                            table.update()
+                            .where(table.c.id == bindparam('row_id'))
+                            .values({column.key: func.coalesce(table.c[column.key], 0) + bindparam('amount')})
+                        )
+                        session.connection().execute(statement, params)
+                    session.commit()
+            except Exception as e:
+                log.exception('counter_flush_failed', error=str(e))
+                self.restore(pending)
+                with self.lock:
+                    self.stats_counters['errors'] += 1
+                return 0
+            with self.lock:
+                self.stats_counters['flushes'] += 1
+                self.stats_counters['rows_updated'] += len(pending)
+            return len(pending)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.stats_counters)
+            stats['pending'] = sum(self.pending.values())
+        stats['flush_interval'] = self.interval
+        return stats
@@ -0,0 +1,208 @@
+"""
+Bounded on-disk cache for files fetched from storage
+
+Each cached object is stored under a name derived from its URL and ETag,
+so a changed object never overwrites the bytes another request may still
+be reading; it gets a new file and the old one is deleted. Files are
+written to a temporary name and renamed into place once complete. An
+SQLite index (shared by all workers on the host) records each URL's
+current entry and last access; when the cache grows beyond its size cap
+the least recently used entries are evicted.
+
+Deciding when to revalidate with storage and how to serve the file is up
+to the caller (see cached_storage_file in main.py).
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from collections import namedtuple
+
+DOCUMENT_CACHE_DIR = os.environ.get(
+    'DOCUMENT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'document_cache')
+)
+DOCUMENT_CACHE_MAX_MB = int(os.environ.get('DOCUMENT_CACHE_MAX_MB', 1024))
+# Entries validated with storage this recently are served without asking again
+DOCUMENT_CACHE_FRESH_SECONDS = int(os.environ.get('DOCUMENT_CACHE_FRESH_SECONDS', 60))
+
+CacheEntry = namedtuple('CacheEntry', [
+    'url', 'etag', 'path', 'size', 'content_type', 'last_modified', 'cache_control', 'validated_at'
+])
+
+
+class CacheWriter:
+    """Writes one object to a temporary file; commit() moves it into the cache"""
+
+    def __init__(self, cache, url, etag, content_type, last_modified, cache_control):
+        self.cache = cache
+        self.entry = dict(url=url, etag=etag, content_type=content_type,
+                          last_modified=last_modified, cache_control=cache_control)
+        self.path = cache.path_for(url, etag)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self.file = open(self.temp_path, 'wb')
+        self.size = 0
+        self.done = False
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+        self.done = True
+        return self.cache.add(path=self.path, size=self.size, **self.entry)
+
+    def discard(self):
+        """Drop a partial file (no-op after commit)"""
+        if self.done:
+            return
+        self.done = True
+        self.file.close()
+        try:
+            os.unlink(self.temp_path)
+        except OSError:
+            pass
+        self.cache.count('fill_aborts')
+
+
+class FileCache:
+    # Refresh an entry's LRU timestamp at most this often, to keep hits read-only
+    TOUCH_INTERVAL = 10
+
+    def __init__(self, directory=DOCUMENT_CACHE_DIR, max_bytes=DOCUMENT_CACHE_MAX_MB * 1024 * 1024,
+                 fresh_seconds=DOCUMENT_CACHE_FRESH_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.local = threading.local()
+        self.initialized_pid = None
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'revalidated': 0, 'refreshed': 0, 'stale': 0,
+                         'fills': 0, 'fill_aborts': 0, 'evictions': 0, 'bytes_served': 0, 'errors': 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @property
+    def max_file_bytes(self):
+        """Larger objects are not cached, so one file cannot flush the whole cache"""
+        return self.max_bytes // 4
+
+    def connection(self):
+        """One index connection per thread and process (sqlite3 connections cannot be shared)"""
+        pid = os.getpid()
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != pid:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), timeout=5,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if self.initialized_pid != pid:
+                conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                             'url TEXT PRIMARY KEY, etag TEXT, path TEXT, size INTEGER, content_type TEXT, '
+                             'last_modified TEXT, cache_control TEXT, validated_at REAL, accessed_at REAL)')
+                conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+                self.initialized_pid = pid
+            self.local.conn, self.local.pid = conn, pid
+        return conn
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def path_for(self, url, etag):
+        key = hashlib.sha256(f"{url}\0{etag}".encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def is_fresh(self, entry):
+        return time.time() - entry.validated_at < self.fresh_seconds
+
+    def lookup(self, url):
+        """Current entry for url, or None (entries whose file has gone are dropped)"""
+        conn = self.connection()
+        row = conn.execute('SELECT url, etag, path, size, content_type, last_modified, cache_control, '
+                           'validated_at, accessed_at FROM entries WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row[:-1])
+        if not os.path.exists(entry.path):
+            conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            return None
+        now = time.time()
+        if now - row[-1] > self.TOUCH_INTERVAL:
+            conn.execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (now, url))
+        return entry
+
+    def mark_validated(self, url):
+        now = time.time()
+        self.connection().execute('UPDATE entries SET validated_at = ?, accessed_at = ? WHERE url = ?',
+                                  (now, now, url))
+
+    def writer(self, url, etag, content_type=None, last_modified=None, cache_control=None):
+        return CacheWriter(self, url, etag, content_type, last_modified, cache_control)
+
+    def add(self, url, etag, path, size, content_type, last_modified, cache_control):
+        """Record a completed file as url's entry, replacing (and deleting) any older version"""
+        now = time.time()
+        conn = self.connection()
+        previous = conn.execute('SELECT path FROM entries WHERE url = ?', (url,)).fetchone()
+        conn.execute('INSERT OR REPLACE INTO entries (url, etag, path, size, content_type, last_modified, '
+                     'cache_control, validated_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (url, etag, path, size, content_type, last_modified, cache_control, now, now))
+        if previous and previous[0] != path:
+            self.unlink(previous[0])
+        self.count('fills')
+        self.evict()
+        return CacheEntry(url, etag, path, size, content_type, last_modified, cache_control, now)
+
+    def remove(self, url):
+        conn = self.connection()
+        row = conn.execute('SELECT path FROM entries WHERE url = ?', (url,)).fetchone()
+        if row:
+            conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            self.unlink(row[0])
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        conn = self.connection()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, path, size in conn.execute('SELECT url, path, size FROM entries ORDER BY accessed_at').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            self.unlink(path)
+            total -= size
+            self.count('evictions')
+
+    @staticmethod
+    def unlink(path):
+        # On POSIX, requests still streaming the old file keep reading it
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        try:
+            entries, size = self.connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+            stats.update(entries=entries, size_bytes=size)
+        except sqlite3.Error as e:
+            stats['index_error'] = str(e)
+        stats['max_bytes'] = self.max_bytes
+        return stats
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Find files in the storage bucket that no video, document or article uses
+
+Prints a dry-run report by default. With --delete the orphans are queued
+in the storage deletion outbox and removed before the script exits.
+Objects younger than STORAGE_GC_MIN_AGE_HOURS are never touched. Suitable
+for Heroku Scheduler (e.g. daily: python gc_storage.py --delete).
+"""
+import sys
+import json
+
+def gc_storage(delete=False):
+    from main import app, collect_storage_garbage, storage_outbox, storage_health
+
+    if not storage_health.check():
+        print("❌ Supabase not available")
+        return 1
+
+    with app.app_context():
+        report = collect_storage_garbage(dry_run=not delete)
+    print(json.dumps(report, indent=2))
+    if delete and report['orphans']:
+        deleted = storage_outbox.process()
+        print(f"✅ Deleted {deleted} orphaned files")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(gc_storage('--delete' in sys.argv[1:]))
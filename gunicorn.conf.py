@@ -0,0 +1,37 @@
+"""
+gunicorn settings (read from the working directory by default)
+
+GUNICORN_PRELOAD lists modules to import in the master before workers fork
+(missing ones are skipped). It is empty by default: thumbnail and PDF work
+runs in the job CPU pool, whose fork server imports OpenCV, NumPy and PyPDF2
+itself (JOB_CPU_PRELOAD in jobs.py), so importing them in the master would
+only add their memory to every worker. GUNICORN_PRELOAD_APP=1 also imports
+the app in the master (like --preload); main.py does no network or database
+work at import, so this is safe.
+
+The master also clears the metrics snapshots left by the previous run, so
+/metrics only merges this run's workers (see metrics.py).
+"""
+
+import os
+import time
+import importlib
+
+import metrics
+
+GUNICORN_PRELOAD = [name.strip() for name in os.environ.get('GUNICORN_PRELOAD', '').split(',')
+                    if name.strip()]
+
+preload_app = os.environ.get('GUNICORN_PRELOAD_APP', '0') == '1'
+
+
+def on_starting(server):
+    metrics.clear()
+    for name in GUNICORN_PRELOAD:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"⚠️ Not preloading {name}: {e}")
+            continue
+        print(f"📦 Preloaded {name} in {(time.perf_counter() - started) * 1000:.0f} ms")
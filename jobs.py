@@ -0,0 +1,312 @@
+"""
+Background job queue backed by a database table
+
+Jobs are rows in the table of the model passed to JobQueue (see Job in
+main.py), so they survive worker restarts and every gunicorn worker can
+see their state. Each worker process runs one dispatcher thread that claims
+queued jobs with a conditional UPDATE (only one worker wins a row) and runs
+the registered handler on a small thread pool. Handlers push CPU-heavy
+steps onto the shared process pool via JobQueue.run_cpu().
+
+Jobs that depend on files in the local filesystem are put on this host's
+queue so they are only claimed by workers that can read those files.
+
+The dispatcher also touches heartbeat_at of the jobs its process is running
+every JOB_HEARTBEAT_SECONDS; a running job whose heartbeat is older than
+JOB_STALE_SECONDS lost its worker and is marked failed, however long it
+has been running.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+import traceback
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy import update, or_, func
+
+import metrics
+from logs import get_logger
+
+log = get_logger('jobs')
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_CPU_WORKERS = int(os.environ.get('JOB_CPU_WORKERS', 2))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 900))
+JOB_HEARTBEAT_SECONDS = int(os.environ.get('JOB_HEARTBEAT_SECONDS', 30))
+# Imported once by the CPU pool's fork server, so its children start with them loaded
+JOB_CPU_PRELOAD = [name.strip() for name in
+                   os.environ.get('JOB_CPU_PRELOAD', 'numpy,cv2,PyPDF2,thumbnails,pdf_text').split(',')
+                   if name.strip()]
+
+DEFAULT_QUEUE = 'default'
+LOCAL_QUEUE = f'local:{socket.gethostname()}'
+
+
+def cpu_context():
+    """forkserver preloading JOB_CPU_PRELOAD, or spawn where there are no fork servers
+
+    Children are forked from a fresh server process, not from the threaded
+    web worker, so they inherit no held locks, and they don't import the heavy
+    modules again as spawned children do. Modules that fail to import are skipped.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(JOB_CPU_PRELOAD)
+    return context
+
+
+class JobQueue:
+    def __init__(self, app, db, model, spool_dir, workers=JOB_WORKERS, cpu_workers=JOB_CPU_WORKERS):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.cpu_workers = cpu_workers
+        self.handlers = {}
+        self.wakeup = threading.Event()
+        self.slots = threading.Semaphore(max(workers, 1))
+        self.started_pid = None
+        self.start_lock = threading.Lock()
+        self._cpu_pool = None
+        # Ids of the jobs this process is executing, kept alive by heartbeat()
+        self.running = set()
+        self.last_heartbeat = 0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def handler(self, kind):
+        """Register fn(job, payload) -> result dict as the handler for kind"""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    @property
+    def cpu_pool(self):
+        """Process pool for CPU-bound job steps (see cpu_context)"""
+        if self._cpu_pool is None:
+            self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=cpu_context())
+        return self._cpu_pool
+
+    def run_cpu(self, fn, *args):
+        """Run fn(*args) in the process pool and wait for the result"""
+        try:
+            return self.cpu_pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A crashed child poisons the pool; start a fresh one for later jobs
+            self._cpu_pool = None
+            raise
+
+    def map_cpu(self, fn, arg_tuples, on_progress=None):
+        """Run fn(*args) for every args tuple in the process pool; results in input order
+
+        on_progress(done, total) is called as calls finish. The first failure
+        cancels the calls that have not started yet and is raised.
+        """
+        futures = []
+        try:
+            futures = [self.cpu_pool.submit(fn, *args) for args in arg_tuples]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                if on_progress:
+                    on_progress(done, len(futures))
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            self._cpu_pool = None
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def enqueue(self, kind, payload, reference=None, local=False):
+        """Add a job to the current session and commit it; returns the job id"""
+        job = self.model(
+            kind=kind,
+            queue=LOCAL_QUEUE if local else DEFAULT_QUEUE,
+            payload=json.dumps(payload),
+            reference=reference,
+            status='queued'
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+        self.wakeup.set()
+        return job.id
+
+    def start(self):
+        """Start this process's dispatcher thread once (safe to call per request)"""
+        if not self.enabled or self.started_pid == os.getpid():
+            return
+        with self.start_lock:
+            if self.started_pid == os.getpid():
+                return
+            self.started_pid = os.getpid()
+            self._cpu_pool = None
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            threading.Thread(target=self.dispatch_loop, name='job-dispatcher', daemon=True).start()
+
+    def dispatch_loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.heartbeat()
+                    self.fail_stale()
+                    while self.slots.acquire(blocking=False):
+                        job_id = self.claim_next()
+                        if job_id is None:
+                            self.slots.release()
+                            break
+                        self.pool.submit(self.run, job_id)
+            except Exception as e:
+                log.exception('job_dispatcher_error', error=str(e))
+            self.wakeup.wait(JOB_POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def claim_next(self):
+        """Atomically mark the oldest queued job as running; returns its id or None"""
+        Job = self.model
+        session = self.db.session
+        candidates = session.query(Job.id).filter(
+            Job.status == 'queued', Job.queue.in_([DEFAULT_QUEUE, LOCAL_QUEUE])
+        ).order_by(Job.created_at).limit(5).all()
+        for (job_id,) in candidates:
+            claimed = session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == 'queued')
+                .values(status='running', started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow(),
+                        attempts=Job.attempts + 1)
+            ).rowcount
+            session.commit()
+            if claimed:
+                return job_id
+        session.rollback()
+        return None
+
+    def spool_path(self, suffix=''):
+        """A fresh path in the spool directory for files handed to local jobs"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        return os.path.join(self.spool_dir, f"{uuid.uuid4().hex}{suffix}")
+
+    def heartbeat(self):
+        """Show that this process is still running its jobs (at most every JOB_HEARTBEAT_SECONDS)"""
+        running = list(self.running)
+        if not running or time.monotonic() - self.last_heartbeat < JOB_HEARTBEAT_SECONDS:
+            return
+        self.last_heartbeat = time.monotonic()
+        Job = self.model
+        self.db.session.execute(
+            update(Job).where(Job.id.in_(running), Job.status == 'running').values(heartbeat_at=datetime.utcnow())
+        )
+        self.db.session.commit()
+
+    def fail_stale(self):
+        """Fail jobs whose worker died mid-run (no heartbeat) and drop spool files nobody will read"""
+        Job = self.model
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+        if os.path.isdir(self.spool_dir):
+            for entry in os.scandir(self.spool_dir):
+                try:
+                    if entry.stat().st_mtime < time.time() - 2 * JOB_STALE_SECONDS:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+        self.db.session.execute(
+            update(Job)
+            .where(Job.status == 'running', func.coalesce(Job.heartbeat_at, Job.started_at) < cutoff,
+                   or_(Job.queue == DEFAULT_QUEUE, Job.queue == LOCAL_QUEUE))
+            .values(status='failed', error='Worker stopped before the job finished',
+                    finished_at=datetime.utcnow())
+        )
+        self.db.session.commit()
+
+    def run_inline(self, kind, payload, reference=None):
+        """Record a job and run it in the calling thread; returns the finished job's id
+
+        For work that must not wait for a worker (or when JOB_WORKERS is 0)
+        but should still leave a job row with its result behind.
+        """
+        job = self.model(
+            kind=kind,
+            queue=DEFAULT_QUEUE,
+            payload=json.dumps(payload),
+            reference=reference,
+            status='running',
+            started_at=datetime.utcnow(),
+            heartbeat_at=datetime.utcnow(),
+            attempts=1
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+        self.execute(job.id)
+        return job.id
+
+    def run(self, job_id):
+        try:
+            self.execute(job_id)
+        finally:
+            self.slots.release()
+            self.wakeup.set()
+
+    def execute(self, job_id):
+        """Run a claimed job's handler and store its result or error"""
+        self.running.add(job_id)
+        try:
+            self.execute_claimed(job_id)
+        finally:
+            self.running.discard(job_id)
+
+    def execute_claimed(self, job_id):
+        with self.app.app_context():
+            job = self.db.session.get(self.model, job_id)
+            kind = job.kind
+            started = time.perf_counter()
+            try:
+                handler = self.handlers[kind]
+                result = handler(job, json.loads(job.payload or '{}'))
+                job.status = 'done'
+                job.progress = 100
+                job.result = json.dumps(result)
+            except Exception as e:
+                log.exception('job_failed', job_id=job_id, kind=kind, error=str(e))
+                self.db.session.rollback()
+                job = self.db.session.get(self.model, job_id)
+                job.status = 'failed'
+                job.error = f"{str(e)[:500]}\n{traceback.format_exc()[-3000:]}"
+            seconds = time.perf_counter() - started
+            metrics.inc('jobs_total', kind=kind, status=job.status)
+            metrics.observe('job_duration_seconds', seconds, kind=kind)
+            job.finished_at = datetime.utcnow()
+            self.db.session.commit()
+
+    def set_progress(self, job, percent):
+        """Record progress (0-100) for a running job"""
+        self.db.session.execute(
+            update(self.model).where(self.model.id == job.id)
+            .values(progress=int(percent), heartbeat_at=datetime.utcnow())
+        )
+        self.db.session.commit()
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error.splitlines()[0] if job.error else None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
@@ -0,0 +1,74 @@
+"""
+Structured logging for the request and job hot paths
+
+get_logger(name) returns a logger that takes an event name as the message
+and its context as keyword arguments:
+
+    log = get_logger('upload')
+    log.info('upload_complete', url=url, size=size)
+
+LOG_FORMAT=json (the default) writes one JSON object per line to stdout,
+which log drains and aggregators parse without patterns; LOG_FORMAT=text
+writes `event key=value ...` for reading locally. LOG_LEVEL sets the
+level (INFO). Startup and maintenance messages are still printed.
+"""
+
+import os
+import sys
+import json
+import logging
+from datetime import datetime, timezone
+
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+# Keyword arguments logging itself accepts; everything else is a field
+LOGGING_ARGUMENTS = {'exc_info', 'stack_info', 'stacklevel', 'extra'}
+
+
+class EventLogger(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        fields = {name: kwargs.pop(name) for name in list(kwargs) if name not in LOGGING_ARGUMENTS}
+        kwargs['extra'] = {'fields': fields}
+        return msg, kwargs
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        parts = [record.levelname.lower(), record.name, record.getMessage()]
+        parts += [f"{name}={value}" for name, value in getattr(record, 'fields', {}).items()]
+        line = ' '.join(parts)
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def configure():
+    logger = logging.getLogger('app')
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JSONFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    # gunicorn configures the root logger; our lines are written once, here
+    logger.propagate = False
+
+
+def get_logger(name):
+    configure()
+    return EventLogger(logging.getLogger(f'app.{name}'), {})
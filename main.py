@@ -1,53 +1,159 @@
 import os
+import re
 import uuid
 import mimetypes
 import tempfile
-import requests
 import json
-from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory, redirect, Response
+import time
+import sqlite3
+import zlib
+import hashlib
+import itertools
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+import requests
+from flask import Flask, Request, request, g, jsonify, send_from_directory, send_file, redirect, Response, url_for, stream_template
+from markupsafe import escape
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, select, bindparam, or_
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
+from werkzeug.http import parse_date
+from resumable_upload import ResumableUpload
+import storage_client
+from jobs import JobQueue, job_to_dict, JOB_STALE_SECONDS
+from thumbnails import extract_thumbnail_variants, variant_filename, pick_variant
+from pdf_text import page_count, extract_pages, page_ranges
+from response_cache import ResponseCache
+from file_cache import FileCache
+from counters import CounterBuffer
+from pagination import PaginationError, fetch_page, MAX_PAGE_SIZE
+from serializers import Field, Serializer, FastJSONProvider, column, dumps, iter_json_array
+from search import (create_search_index, entry_values, index_exists, indexed_attributes, result_to_dict,
+                    SearchError, SEARCH_MAX_RESULTS)
+from storage_index import BucketLister, STORAGE_RECONCILE_SECONDS
+from storage_outbox import DeletionOutbox
+from storage_health import StorageHealth
+from snapshots import SnapshotStore, SnapshotPublisher, parse_snapshot_name, snapshot_key
+import metrics
+from logs import get_logger
+
+class HashingSpool:
+    """Spool file that computes the SHA-256 of everything written to it
+
+    Werkzeug writes each uploaded file's body into its spool as it is
+    parsed, so the hash is ready when the request handler runs, without
+    reading the file again. Everything else is passed to the file.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.hasher = hashlib.sha256()
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.file.write(data)
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+class SpoolingRequest(Request):
+    """Request that spools uploaded files to named files in JOB_SPOOL_DIR
+
+    Werkzeug's default spool is an anonymous temporary file, so anything that
+    needs a path (OpenCV, a background job) had to copy the whole upload
+    again. Named spool files can be opened in place and handed to a job with
+    adopt_upload(). Files nobody adopted are removed when the request closes,
+    even if the handler raised. Spooled files are hashed as they are written
+    (see HashingSpool and Blob).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+        suffix = os.path.splitext(secure_filename(filename or ''))[1]
+        spool = tempfile.NamedTemporaryFile('w+b', dir=JOB_SPOOL_DIR, suffix=suffix, delete=False)
+        self.__dict__.setdefault('spooled_paths', []).append(spool.name)
+        return HashingSpool(spool)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for path in self.__dict__.pop('spooled_paths', []):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+# Request, job and storage events are logged as structured lines (see logs.py)
+log = get_logger('main')
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='static', static_url_path='/static')
+app.request_class = SpoolingRequest
+# jsonify() and request.get_json() use orjson when it is installed (see serializers.py)
+app.json = FastJSONProvider(app)
 
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'fallback-secret-key')
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024
 
+# Uploads are forwarded to storage in chunks of this size instead of being read into memory
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+# Uploads at least this large go through the resumable multipart path
+RESUMABLE_UPLOAD_THRESHOLD = int(os.environ.get('RESUMABLE_UPLOAD_THRESHOLD', 50 * 1024 * 1024))
+# Uploads are spooled here; videos stay until their background thumbnail job has read them
+JOB_SPOOL_DIR = os.environ.get('JOB_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'job_spool'))
+# Total time allowed for downloading a PDF to be turned into an article
+PDF_DOWNLOAD_TIMEOUT = int(os.environ.get('PDF_DOWNLOAD_TIMEOUT', 600))
+# Documents viewed through /document/<id> are relayed to the client in chunks of this size
+PROXY_CHUNK_SIZE = int(os.environ.get('PROXY_CHUNK_SIZE', 64 * 1024))
+
 # Supabase configuration
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY') 
 SUPABASE_BUCKET = os.environ.get('SUPABASE_BUCKET', 'videos')
 
+def storage_public_url(name):
+    return f"{SUPABASE_URL}/storage/v1/object/public/{SUPABASE_BUCKET}/{name}"
+
+def storage_key(url):
+    """Object name of a public URL in our bucket (None for anything else)"""
+    prefix = storage_public_url('')
+    if not url or not SUPABASE_URL or not url.startswith(prefix):
+        return None
+    return url[len(prefix):] or None
+
 print("=== SUPABASE CONFIG ===")
 print(f"URL: {'SET' if SUPABASE_URL else 'MISSING'}")
 print(f"KEY: {'SET' if SUPABASE_KEY else 'MISSING'}")
 print(f"BUCKET: {SUPABASE_BUCKET}")
 
-# Test if we can reach Supabase
-supabase_available = False
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        # Test connection with simple HTTP request
-        test_url = f"{SUPABASE_URL}/storage/v1/bucket"
-        headers = {
-            "Authorization": f"Bearer {SUPABASE_KEY}",
-            "Content-Type": "application/json"
-        }
-        response = requests.get(test_url, headers=headers, timeout=10)
-        if response.status_code in [200, 401, 403]:  # Any response means connection works
-            supabase_available = True
-            print("✅ Supabase HTTP connection successful")
-        else:
-            print(f"❌ Supabase HTTP test failed: {response.status_code}")
-    except Exception as e:
-        print(f"❌ Supabase HTTP test error: {e}")
-else:
-    print("❌ Missing Supabase credentials")
+def probe_storage():
+    """None if the storage API answers, else what went wrong (see storage_health.py)"""
+    test_url = f"{SUPABASE_URL}/storage/v1/bucket"
+    headers = {
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Content-Type": "application/json"
+    }
+    # One attempt: the probe thread tries again soon anyway (STORAGE_PROBE_RETRY)
+    response = storage_client.request('probe', 'GET', test_url, headers=headers, idempotent=False)
+    if response.status_code in [200, 401, 403]:  # Any response means connection works
+        return None
+    return f"HTTP {response.status_code}"
 
-print(f"Supabase available: {supabase_available}")
+# Reachability is probed in the background, not while this module is imported
+storage_health = StorageHealth(probe_storage, configured=bool(SUPABASE_URL and SUPABASE_KEY))
+if not storage_health.configured:
+    print("❌ Missing Supabase credentials")
 
 # Database configuration
 database_url = os.environ.get('DATABASE_URL')
@@ -63,6 +169,25 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # Initialize database
 db = SQLAlchemy(app)
 
+# Every SQL statement is counted and timed by its kind (see metrics.py)
+SQL_OPERATIONS = ('select', 'insert', 'update', 'delete')
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_started', None)
+    if started is None:
+        return
+    operation = statement.lstrip()[:6].lower()
+    if operation not in SQL_OPERATIONS:
+        operation = 'other'
+    metrics.inc('db_queries_total', operation=operation)
+    metrics.observe('db_query_duration_seconds', time.perf_counter() - started, operation=operation)
+
 # Database Models
 class VideoContent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -70,10 +195,16 @@ class VideoContent(db.Model):
     description = db.Column(db.Text)
     video_url = db.Column(db.String(500), nullable=False)
     thumbnail_url = db.Column(db.String(500))
+    thumbnail_variants = db.Column(db.Text)  # JSON list of {width, height, format, url}
     category = db.Column(db.String(100), default='Miscellaneous')
     is_published = db.Column(db.Boolean, default=True)
     order_index = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Serve the public listings (see add_content_indexes.py for existing databases)
+    __table_args__ = (
+        db.Index('ix_video_content_published_order', 'is_published', 'order_index', 'id'),
+        db.Index('ix_video_content_published_category_order', 'is_published', 'category', 'order_index', 'id'),
+    )
 
 class TextContent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -83,6 +214,9 @@ class TextContent(db.Model):
     is_published = db.Column(db.Boolean, default=True)
     order_index = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_text_content_published_order', 'is_published', 'order_index', 'id'),
+    )
 
 class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -96,8 +230,484 @@ class Document(db.Model):
     download_count = db.Column(db.Integer, default=0)
     is_published = db.Column(db.Boolean, default=True)
     is_published = db.Column(db.Boolean, default=True)
+    # Part of the keyset sort key, so never NULL (add_content_indexes.py backfills old rows)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_document_published_created', 'is_published', 'created_at', 'id'),
+        db.Index('ix_document_published_category_created', 'is_published', 'category', 'created_at', 'id'),
+    )
+
+class Job(db.Model):
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = db.Column(db.String(50), nullable=False)
+    queue = db.Column(db.String(100), default='default', index=True)
+    status = db.Column(db.String(20), default='queued', index=True)
+    payload = db.Column(db.Text)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    reference = db.Column(db.String(500), index=True)
+    progress = db.Column(db.Integer, default=0)
+    attempts = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    # Touched by the executing process while it runs the job (see jobs.py)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class ContentRevision(db.Model):
+    """Revision counter per listing namespace (e.g. "videos:*", "documents:Culture")"""
+    namespace = db.Column(db.String(200), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class StorageObject(db.Model):
+    """Index of the objects in the storage bucket, served by /api/files (see storage_index.py)"""
+    name = db.Column(db.String(1024), primary_key=True)
+    size = db.Column(db.BigInteger)
+    content_type = db.Column(db.String(200))
+    etag = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Last time a reconcile saw the object or we wrote it ourselves
+    indexed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_storage_object_created', 'created_at', 'name'),
+    )
+
+class Blob(db.Model):
+    """One stored copy of each uploaded file content, found by its SHA-256
+
+    ref_count is the number of videos and documents whose URL is this
+    blob's url (kept by count_blob_references); a file is only deleted
+    from storage once nothing refers to it.
+    """
+    sha256 = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(500), nullable=False, unique=True)
+    url = db.Column(db.String(500), nullable=False, index=True)
+    size = db.Column(db.BigInteger)
+    content_type = db.Column(db.String(200))
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class StorageDeletion(db.Model):
+    """A storage key waiting to be deleted by the outbox worker (see storage_outbox.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(1024), nullable=False)
+    reason = db.Column(db.String(100))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    claimed_by = db.Column(db.String(36))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+job_queue = JobQueue(app, db, Job, JOB_SPOOL_DIR)
+
+# Public listing responses, cached per collection and category (see response_cache.py)
+response_cache = ResponseCache()
+CACHED_COLLECTIONS = {VideoContent: 'videos', TextContent: 'texts', Document: 'documents'}
+
+def cache_namespace(collection, category=None):
+    return f"{collection}:{category or '*'}"
+
+def upsert_statement(conn, table):
+    """INSERT for table that supports .on_conflict_do_update() on this database"""
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def bump_revisions(conn, namespaces):
+    """Increment the revision of each namespace in conn's transaction"""
+    now = datetime.utcnow()
+    table = ContentRevision.__table__
+    statement = upsert_statement(conn, table).values([
+        {'namespace': namespace, 'revision': 1, 'updated_at': now} for namespace in sorted(namespaces)
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.namespace],
+        set_={'revision': table.c.revision + 1, 'updated_at': now}
+    )
+    conn.execute(statement)
+
+def record_changed_namespaces(session, namespaces):
+    """Bump the revisions of namespaces in the current transaction and queue their snapshots"""
+    if not namespaces:
+        return
+    bump_revisions(session.connection(), namespaces)
+    session.info.setdefault('changed_namespaces', set()).update(namespaces)
+
+def mark_changed(collection, *categories):
+    """Record a change to collection that bypassed the ORM session
+
+    Row changes made through the ORM are picked up automatically; call this
+    for bulk UPDATE/DELETE statements, before committing.
+    """
+    namespaces = {cache_namespace(collection)}
+    namespaces.update(cache_namespace(collection, category) for category in categories if category)
+    record_changed_namespaces(db.session, namespaces)
+
+@event.listens_for(db.session, 'after_flush')
+def collect_changed_namespaces(session, flush_context):
+    namespaces = set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        collection = CACHED_COLLECTIONS.get(type(obj))
+        if collection is None:
+            continue
+        categories = set()
+        if hasattr(obj, 'category'):
+            # Both the old and the new category listing are affected by a move
+            history = inspect(obj).attrs.category.history
+            categories.update(history.added or ())
+            categories.update(history.deleted or ())
+            categories.add(obj.category)
+        namespaces.add(cache_namespace(collection))
+        namespaces.update(cache_namespace(collection, category) for category in categories if category)
+    record_changed_namespaces(session, namespaces)
+
+# Full-text search over articles and documents (see search.py); the index
+# table is created by migrate.py and filled for existing rows by rebuild_search_index.py
+SEARCHABLE = {TextContent: 'text', Document: 'document'}
+search_index = create_search_index(make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name())
+# A missing index is looked up again after this many seconds, so the index
+# created by a release-phase migrate.py is picked up without a restart
+SEARCH_RECHECK_SECONDS = int(os.environ.get('SEARCH_RECHECK_SECONDS', 60))
+search_table_exists = False
+search_checked_at = None
+
+def search_available(conn=None):
+    """Whether the search index table exists (cached once found, re-checked while missing)"""
+    global search_table_exists, search_checked_at
+    if search_table_exists:
+        return True
+    if search_checked_at is not None and time.monotonic() - search_checked_at < SEARCH_RECHECK_SECONDS:
+        return False
+    if conn is None:
+        with db.engine.connect() as conn:
+            search_table_exists = index_exists(search_index, conn)
+    else:
+        search_table_exists = index_exists(search_index, conn)
+    search_checked_at = time.monotonic()
+    if not search_table_exists:
+        log.warning('search_index_missing', backend=search_index.name, hint='run python migrate.py')
+    return search_table_exists
+
+@event.listens_for(db.session, 'after_flush')
+def update_search_index(session, flush_context):
+    """Write index entries for changed articles/documents in the same transaction"""
+    if not any(type(obj) in SEARCHABLE for obj in itertools.chain(session.new, session.dirty, session.deleted)):
+        return
+    if not search_available(session.connection()):
+        return
+    for obj in itertools.chain(session.new, session.dirty):
+        kind = SEARCHABLE.get(type(obj))
+        if kind is None:
+            continue
+        if obj not in session.new:
+            state = inspect(obj)
+            # Skip updates that only touch unindexed columns such as download_count
+            if not any(state.attrs[name].history.has_changes() for name in indexed_attributes(kind)):
+                continue
+        search_index.upsert(session.connection(), kind, obj.id, entry_values(kind, obj))
+    for obj in session.deleted:
+        kind = SEARCHABLE.get(type(obj))
+        if kind is not None:
+            search_index.delete(session.connection(), kind, obj.id)
+
+# Columns holding an uploaded file's URL, counted in Blob.ref_count
+BLOB_REFERENCES = {VideoContent: 'video_url', Document: 'file_url'}
+
+@event.listens_for(db.session, 'before_flush')
+def count_blob_references(session, flush_context, instances):
+    """Adjust Blob.ref_count for rows that start or stop using a file, in the same transaction"""
+    deltas = {}
+    def add(url, amount):
+        if url:
+            deltas[url] = deltas.get(url, 0) + amount
+    for obj in session.new:
+        if type(obj) in BLOB_REFERENCES:
+            add(getattr(obj, BLOB_REFERENCES[type(obj)]), 1)
+    for obj in session.deleted:
+        if type(obj) in BLOB_REFERENCES:
+            history = inspect(obj).attrs[BLOB_REFERENCES[type(obj)]].history
+            # The value the row holds in the database, not a pending change
+            add(history.deleted[0] if history.deleted else getattr(obj, BLOB_REFERENCES[type(obj)]), -1)
+    for obj in session.dirty:
+        if type(obj) in BLOB_REFERENCES and obj not in session.deleted:
+            history = inspect(obj).attrs[BLOB_REFERENCES[type(obj)]].history
+            if history.has_changes():
+                for url in history.deleted or ():
+                    add(url, -1)
+                for url in history.added or ():
+                    add(url, 1)
+    changes = [{'blob_url': url, 'amount': amount} for url, amount in deltas.items() if amount]
+    if changes:
+        table = Blob.__table__
+        session.connection().execute(
+            table.update().where(table.c.url == bindparam('blob_url'))
+            .values(ref_count=table.c.ref_count + bindparam('amount')),
+            changes
+        )
+
+# Columns holding URLs of files in our bucket; their files are deleted with the row
+STORAGE_URL_COLUMNS = {VideoContent: ('video_url', 'thumbnail_url'), Document: ('file_url',)}
+
+def file_keys(model, values):
+    """Storage keys of the files a row with these column values uses"""
+    keys = [storage_key(values.get(name)) for name in STORAGE_URL_COLUMNS[model]]
+    if model is VideoContent and values.get('thumbnail_variants'):
+        keys.extend(storage_key(v.get('url')) for v in json.loads(values['thumbnail_variants']))
+    return [key for key in keys if key]
+
+def stored_files(obj, values=None):
+    """Storage keys of obj's files (values overrides column values, e.g. the ones in the database)"""
+    names = storage_columns(obj)
+    return file_keys(type(obj), {name: getattr(obj, name) for name in names} | (values or {}))
+
+def storage_columns(obj):
+    names = STORAGE_URL_COLUMNS[type(obj)]
+    return names + ('thumbnail_variants',) if isinstance(obj, VideoContent) else names
+
+def committed_values(obj, names):
+    """Database values of names for a loaded row that may have pending changes"""
+    values = {}
+    for name in names:
+        history = inspect(obj).attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+    return values
+
+@event.listens_for(db.session, 'before_flush')
+def queue_storage_deletions(session, flush_context, instances):
+    """Queue the files of deleted rows, and files a row stopped using, in the same transaction"""
+    deleted, replaced = [], []
+    for obj in session.deleted:
+        if type(obj) in STORAGE_URL_COLUMNS:
+            deleted.extend(stored_files(obj, committed_values(obj, storage_columns(obj))))
+    for obj in session.dirty:
+        if type(obj) in STORAGE_URL_COLUMNS and obj not in session.deleted:
+            before = committed_values(obj, storage_columns(obj))
+            if before:
+                replaced.extend(set(stored_files(obj, before)) - set(stored_files(obj)))
+    # Keys something else still uses are skipped when the worker gets to them
+    if deleted:
+        storage_outbox.enqueue(session.connection(), deleted, 'content_deleted')
+    if replaced:
+        storage_outbox.enqueue(session.connection(), replaced, 'content_replaced')
+
+@event.listens_for(db.session, 'after_commit')
+def publish_changed_snapshots(session):
+    changed = session.info.pop('changed_namespaces', None)
+    if changed:
+        snapshot_publisher.request(ns for ns in changed if ns.split(':')[0] in SNAPSHOT_COLLECTIONS)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def forget_changed_namespaces(session, previous_transaction):
+    session.info.pop('changed_namespaces', None)
+
+def namespace_revision(namespace):
+    """(revision, updated_at) of a listing namespace; (0, None) before its first change"""
+    row = db.session.execute(
+        select(ContentRevision.revision, ContentRevision.updated_at)
+        .where(ContentRevision.namespace == namespace)
+    ).first()
+    return tuple(row) if row else (0, None)
+
+def conditional_get(namespace, build):
+    """Return 304 if the client's copy of namespace is current, else build(revision)'s response
+
+    Only the namespace's revision row is read before deciding, so a
+    revalidation costs one primary-key lookup and no listing query. build
+    gets the revision the ETag names, to look cached bodies up under.
+    """
+    revision, updated_at = namespace_revision(namespace)
+    variant = zlib.crc32(f"{namespace} {request.full_path}".encode())
+    etag = f"{namespace.split(':')[0]}-{revision}-{variant:08x}"
+    last_modified = updated_at.replace(microsecond=0, tzinfo=timezone.utc) if updated_at else None
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = bool(last_modified and request.if_modified_since
+                            and last_modified <= request.if_modified_since)
+    if not_modified:
+        response = Response(status=304)
+    else:
+        response = app.make_response(build(revision))
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Let browsers keep the body but revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def cached_json_list(collection, build):
+    """Serve build()'s JSON from the response cache, keyed by the query string
+
+    The namespace is per category, so a change to one category only rebuilds
+    that category's listings and the unfiltered one.
+    """
+    namespace = cache_namespace(collection, request.args.get('category'))
+    # Entries are "<next cursor>\n<body>"; the prefix keeps older entry formats from matching
+    key = 'page:' + '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    def compute():
+        items, next_cursor = build()
+        return (next_cursor or '').encode() + b'\n' + dumps(items)
+    def respond(revision):
+        next_cursor, body = response_cache.get_or_set(namespace, revision, key, compute).split(b'\n', 1)
+        return page_response(body, next_cursor.decode())
+    return conditional_get(namespace, respond)
+
+def fetch_item(fields, *where):
+    """JSON response with one row's fields, read without loading an ORM object (404 if missing)"""
+    serializer = Serializer(fields)
+    row = db.session.execute(select(*serializer.select_columns()).where(*where)).first()
+    if row is None:
+        return jsonify({'error': 'Not found'}), 404
+    return Response(dumps(serializer.row(row)), mimetype='application/json')
+
+def page_response(body, next_cursor):
+    """JSON array response with X-Next-Cursor/Link headers when another page exists"""
+    if not isinstance(body, bytes):
+        body = dumps(body)
+    response = Response(body, mimetype='application/json')
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
+
+# Output fields of the list endpoints; ?fields= selects a subset (see pagination.py)
+VIDEO_ORDER = (VideoContent.order_index, VideoContent.id)
+TEXT_ORDER = (TextContent.order_index, TextContent.id)
+DOCUMENT_ORDER = (Document.created_at, Document.id)
+
+def video_list_fields(thumb_width=None, thumb_format=None):
+    thumbnail_columns = (VideoContent.thumbnail_url, VideoContent.thumbnail_variants)
+    return {
+        'id': column(VideoContent.id),
+        'title': column(VideoContent.title),
+        'description': column(VideoContent.description),
+        'video_url': column(VideoContent.video_url),
+        'thumbnail_url': Field(thumbnail_columns,
+                               lambda row: thumbnail_fields(row, thumb_width, thumb_format)['thumbnail_url']),
+        'thumbnail_srcset': Field(thumbnail_columns,
+                                  lambda row: thumbnail_fields(row, thumb_width, thumb_format)['thumbnail_srcset']),
+        'category': column(VideoContent.category),  # ADD THIS LINE
+        'created_at': column(VideoContent.created_at)
+    }
+
+ADMIN_VIDEO_FIELDS = {
+    'id': column(VideoContent.id),
+    'title': column(VideoContent.title),
+    'description': column(VideoContent.description),
+    'video_url': column(VideoContent.video_url),
+    'thumbnail_url': column(VideoContent.thumbnail_url),
+    'is_published': column(VideoContent.is_published),
+    'order_index': column(VideoContent.order_index),
+    'created_at': column(VideoContent.created_at)
+}
+
+TEXT_FIELDS = {
+    'id': column(TextContent.id),
+    'title': column(TextContent.title),
+    'content': column(TextContent.content),
+    'excerpt': column(TextContent.excerpt),
+    'created_at': column(TextContent.created_at)
+}
+
+ADMIN_TEXT_FIELDS = {
+    **TEXT_FIELDS,
+    'is_published': column(TextContent.is_published),
+    'order_index': column(TextContent.order_index)
+}
+
+DOCUMENT_FIELDS = {
+    'id': column(Document.id),
+    'title': column(Document.title),
+    'description': column(Document.description),
+    'file_url': column(Document.file_url),
+    'filename': column(Document.filename),
+    'category': column(Document.category),  # ADD THIS LINE
+    'created_at': column(Document.created_at)
+}
+
+# Values rendered by templates/document_list.html for the /documents page
+DOCUMENT_PAGE_FIELDS = {
+    'id': column(Document.id),
+    'title': column(Document.title),
+    'description': column(Document.description),
+    'view_url': Field((Document.id,), lambda row: url_for('view_document', doc_id=row.id)),
+    'size_mb': column(Document.file_size, lambda size: round(size / (1024*1024), 2) if size else 0),
+    'created_at': column(Document.created_at)
+}
+
+# download_count is served by /api/admin/documents/downloads (see download_counters)
+ADMIN_DOCUMENT_FIELDS = {
+    **DOCUMENT_FIELDS,
+    'file_type': column(Document.file_type),
+    'file_size': column(Document.file_size),
+    'is_published': column(Document.is_published)
+}
+
+# Public catalog snapshots (see snapshots.py): model, fields and order of each
+# snapshotted listing. Thumbnails prefer WebP, as requested by static/index.html.
+# The fields must not include counters, whose flushes don't bump revisions.
+SNAPSHOT_COLLECTIONS = {
+    'videos': (VideoContent, video_list_fields(thumb_format='webp'), VIDEO_ORDER),
+    'documents': (Document, DOCUMENT_FIELDS, DOCUMENT_ORDER)
+}
+
+snapshot_store = SnapshotStore()
+
+def build_snapshot(collection, category):
+    """Make sure the snapshot of collection/category at its current revision exists
+
+    Returns (revision, path, built). The revision is read before the
+    listing, so a change committed in between can only make the file newer
+    than its name says, never older.
+    """
+    model, fields, order = SNAPSHOT_COLLECTIONS[collection]
+    revision, _ = namespace_revision(cache_namespace(collection, category))
+    path = snapshot_store.find(collection, category, revision)
+    if path:
+        return revision, path, False
+    where = [model.is_published == True]
+    if category:
+        where.append(model.category == category)
+    def items():
+        args = {'limit': MAX_PAGE_SIZE}
+        while True:
+            page, next_cursor = fetch_page(db.session, fields, order, where, args)
+            yield from page
+            if not next_cursor:
+                return
+            args['cursor'] = next_cursor
+    return revision, snapshot_store.write(collection, category, revision, iter_json_array(items())), True
+
+def publish_snapshot(namespace):
+    collection, category = namespace.split(':', 1)
+    with app.app_context():
+        _, _, built = build_snapshot(collection, None if category == '*' else category)
+    if built:
+        snapshot_store.count('published')
+
+# Rebuilds the snapshots a commit changed, off the request thread
+snapshot_publisher = SnapshotPublisher(publish_snapshot)
+
+FILE_ORDER = (StorageObject.created_at, StorageObject.name)
+
+FILE_FIELDS = {
+    'name': column(StorageObject.name),
+    'url': column(StorageObject.name, storage_public_url),
+    'size': column(StorageObject.size, lambda size: size or 0),
+    'type': column(StorageObject.content_type, lambda content_type: content_type or 'application/octet-stream'),
+    'created': column(StorageObject.created_at)
+}
+
 # File configuration
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'wmv', 'flv', 'mkv', 'webm', 'm4v'}
 ALLOWED_IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'svg'}
@@ -121,137 +731,755 @@ def generate_unique_filename(filename):
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     return f"{name}_{timestamp}_{unique_id}{ext}"
 
+class FileChunkStream:
+    """Iterate a file object in fixed-size chunks with a known total length.
+
+    requests sends iterables that report a length with a Content-Length
+    header (no chunked encoding), so storage sees a normal upload while at
+    most one chunk is held in memory.
+    """
+
+    def __init__(self, fileobj, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.length = stream_remaining_size(fileobj)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        remaining = self.length
+        while remaining > 0:
+            chunk = self.fileobj.read(min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def stream_remaining_size(fileobj):
+    """Bytes left between the current position and the end of a seekable file"""
+    position = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(position)
+    return size - position
+
+def upload_headers(content_type):
+    """Headers for uploading an object to the bucket"""
+    headers = {
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Content-Type": content_type,
+        "x-upsert": "true"  # Add this to allow updates
+    }
+    # For PDFs, add cache control to force inline viewing
+    if content_type == "application/pdf":
+        headers["Cache-Control"] = "public, max-age=3600"
+    return headers
+
 def upload_to_supabase_http(file_data, filename, content_type):
-    """Upload file to Supabase using direct HTTP requests"""
-    if not supabase_available:
-        print("❌ Supabase not available")
+    """Upload file to Supabase using direct HTTP requests
+
+    file_data may be bytes or a seekable file object; file objects are
+    streamed from their current position in UPLOAD_CHUNK_SIZE chunks.
+    """
+    if not storage_health.available:
+        log.warning('storage_unavailable', filename=filename)
         return None
     
     try:
-        print(f"📤 Uploading {filename} via HTTP...")
         
         upload_url = f"{SUPABASE_URL}/storage/v1/object/{SUPABASE_BUCKET}/{filename}"
+        headers = upload_headers(content_type)
         
-        headers = {
-            "Authorization": f"Bearer {SUPABASE_KEY}",
-            "Content-Type": content_type,
-            "x-upsert": "true"  # Add this to allow updates
-        }
-        
-        # For PDFs, add cache control to force inline viewing
-        if content_type == "application/pdf":
-            headers["Cache-Control"] = "public, max-age=3600"
+        if hasattr(file_data, 'read'):
+            file_data = FileChunkStream(file_data)
+        size = len(file_data)
         
-        response = requests.post(upload_url, data=file_data, headers=headers, timeout=300)
-        
-        print(f"📊 Upload response: {response.status_code}")
+        # x-upsert makes re-sending a buffered body safe; streamed bodies are sent once
+        response = storage_client.request('upload', 'POST', upload_url, data=file_data, headers=headers, idempotent=True)
         
         if response.status_code == 200:
             public_url = f"{SUPABASE_URL}/storage/v1/object/public/{SUPABASE_BUCKET}/{filename}"
-            print(f"✅ Upload successful: {public_url}")
+            log.info('storage_upload', filename=filename, size=size, content_type=content_type)
+            index_storage_objects([{'name': filename, 'size': size, 'content_type': content_type}])
             return public_url
         else:
-            print(f"❌ Upload failed: {response.status_code} - {response.text}")
+            log.error('storage_upload_failed', filename=filename, status=response.status_code,
+                      response=response.text[:500])
             return None
             
     except Exception as e:
-        print(f"❌ HTTP upload error: {e}")
+        log.exception('storage_upload_error', filename=filename, error=str(e))
         return None
 
-def generate_thumbnail_http(video_data, original_filename):
-    """Generate thumbnail and upload via HTTP"""
-    if not supabase_available:
-        return None
+def upload_resumable_http(file_stream, filename, content_type, sha256=None):
+    """Upload a large file as resumable parallel parts; returns (public_url, stats)
+
+    An earlier failed upload of the same content (sha256) is resumed, and
+    finishes under that upload's name: stats['object_name'] is the name
+    the file was stored under.
+    """
+    if not storage_health.available:
+        log.warning('storage_unavailable', filename=filename)
+        return None, None
     
     try:
-        import cv2
-        import numpy as np
-        
-        print(f"🖼️ Generating thumbnail for {original_filename}...")
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_video:
-            temp_video.write(video_data)
-            temp_video_path = temp_video.name
+        upload = ResumableUpload(
+            SUPABASE_URL, SUPABASE_KEY, SUPABASE_BUCKET, filename, file_stream, content_type,
+            cache_control="public, max-age=3600" if content_type == "application/pdf" else None,
+            session=storage_client.get_session(), content_key=sha256
+        )
+        stats = upload.run()
+        filename = stats['object_name']
+        log.info('storage_upload', filename=filename, size=stats['bytes'], content_type=content_type,
+                 method='resumable', throughput_mb_s=stats['throughput_mb_s'], retries=stats['retries'],
+                 resumed_parts=stats['resumed_parts'])
+        public_url = f"{SUPABASE_URL}/storage/v1/object/public/{SUPABASE_BUCKET}/{filename}"
+        index_storage_objects([{'name': filename, 'size': stats['bytes'], 'content_type': content_type}])
+        return public_url, stats
+    except Exception as e:
+        log.exception('storage_upload_error', filename=filename, method='resumable', error=str(e))
+        return None, None
 
-        # Extract first frame
-        vidcap = cv2.VideoCapture(temp_video_path)
-        success, image = vidcap.read()
-        
-        if success:
-            base_name = os.path.splitext(original_filename)[0]
-            thumbnail_filename = f"{base_name}_thumb.jpg"
-            
-            # Convert to JPEG
-            _, buffer = cv2.imencode('.jpg', image)
-            thumbnail_data = buffer.tobytes()
-            
-            # Upload thumbnail via HTTP
-            thumbnail_url = upload_to_supabase_http(thumbnail_data, thumbnail_filename, "image/jpeg")
-            
-            # Cleanup
-            vidcap.release()
-            os.unlink(temp_video_path)
-            return thumbnail_url
-        
-        vidcap.release()
-        os.unlink(temp_video_path)
-        return None
+def upload_thumbnail_variants(variants, video_filename):
+    """Upload encoded thumbnail variants; returns [{width, height, format, url}]"""
+    uploaded = []
+    for width, height, fmt, data in variants:
+        content_type = "image/webp" if fmt == 'webp' else "image/jpeg"
+        url = upload_to_supabase_http(data, variant_filename(video_filename, width, fmt), content_type)
+        if url:
+            uploaded.append({'width': width, 'height': height, 'format': fmt, 'url': url})
+    return uploaded
+
+def generate_thumbnail_http(video_path, original_filename):
+    """Generate thumbnail variants and upload via HTTP; returns (thumbnail_url, variants)
+
+    video_path is the spooled upload on disk, decoded in place.
+    """
+    if not storage_health.available:
+        return None, []
+    
+    try:
+        with metrics.timer('job_stage_duration_seconds', stage='thumbnail_decode'):
+            variants = extract_thumbnail_variants(video_path)
+        with metrics.timer('job_stage_duration_seconds', stage='thumbnail_upload'):
+            uploaded = upload_thumbnail_variants(variants, original_filename)
+        default = pick_variant(uploaded)
+        log.info('thumbnail_ready', filename=original_filename, variants=len(uploaded))
+        return (default['url'] if default else None), uploaded
         
     except ImportError:
-        print("❌ OpenCV not available for thumbnails")
-        return None
+        log.error('thumbnail_unavailable', reason='OpenCV not installed')
+        return None, []
     except Exception as e:
-        print(f"❌ Thumbnail error: {e}")
+        log.exception('thumbnail_error', filename=original_filename, error=str(e))
+        return None, []
+
+def adopt_upload(file_storage):
+    """Take ownership of an uploaded file's spool file and return its path
+
+    The file is no longer removed when the request closes; whoever adopts
+    it must delete it.
+    """
+    file_storage.stream.flush()
+    path = file_storage.stream.name
+    request.spooled_paths.remove(path)
+    return path
+
+def enqueue_thumbnail_job(file_storage, filename, video_url):
+    """Hand the uploaded video to a background thumbnail job; returns the job id"""
+    return queue_thumbnail_job(adopt_upload(file_storage), filename, video_url)
+
+def queue_thumbnail_job(spool_path, filename, video_url):
+    """Queue a thumbnail job that reads (and then deletes) the video at spool_path"""
+    payload = {'spool_path': spool_path, 'filename': filename, 'video_url': video_url}
+    try:
+        return job_queue.enqueue('thumbnail', payload, reference=video_url, local=True)
+    except Exception:
+        os.unlink(spool_path)
+        raise
+
+@job_queue.handler('thumbnail')
+def thumbnail_job(job, payload):
+    """Build and upload thumbnail variants, then attach them to videos using that file"""
+    try:
+        with metrics.timer('job_stage_duration_seconds', stage='thumbnail_decode'):
+            variants = job_queue.run_cpu(extract_thumbnail_variants, payload['spool_path'])
+    finally:
+        if os.path.exists(payload['spool_path']):
+            os.unlink(payload['spool_path'])
+    if not variants:
+        raise RuntimeError('Could not read a frame from the video')
+    
+    with metrics.timer('job_stage_duration_seconds', stage='thumbnail_upload'):
+        uploaded = upload_thumbnail_variants(variants, payload['filename'])
+    if not uploaded:
+        raise RuntimeError('Thumbnail upload failed')
+    thumbnail_url = pick_variant(uploaded)['url']
+    
+    VideoContent.query.filter(
+        VideoContent.video_url == payload['video_url'],
+        (VideoContent.thumbnail_url == None) | (VideoContent.thumbnail_url == '')
+    ).update({'thumbnail_url': thumbnail_url, 'thumbnail_variants': json.dumps(uploaded)},
+             synchronize_session=False)
+    mark_changed('videos', *[category for (category,) in db.session.query(VideoContent.category)
+                             .filter(VideoContent.video_url == payload['video_url']).distinct()])
+    db.session.commit()
+    log.info('thumbnail_ready', filename=payload['filename'], variants=len(uploaded), job_id=job.id)
+    return {'thumbnail_url': thumbnail_url, 'thumbnail_variants': uploaded}
+
+def download_to_spool(url, suffix='', timeout=PDF_DOWNLOAD_TIMEOUT):
+    """Stream url into a new spool file and return its path
+
+    The storage client's read timeout only bounds each socket read, so the
+    download as a whole is also given a deadline.
+    """
+    path = job_queue.spool_path(suffix)
+    deadline = time.monotonic() + timeout
+    try:
+        with storage_client.request('download', 'GET', url, stream=True) as response:
+            response.raise_for_status()
+            with open(path, 'wb') as f:
+                for chunk in response.iter_content(UPLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Download took longer than {timeout}s")
+    except Exception:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+    return path
+
+PROXY_REQUEST_HEADERS = ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+PROXY_RESPONSE_HEADERS = ('Content-Length', 'Content-Range', 'Accept-Ranges', 'ETag', 'Last-Modified', 'Cache-Control')
+
+def proxy_storage_file(url, content_type=None, headers=None):
+    """Stream a storage object to the client, passing Range and conditional requests through
+
+    Bytes are relayed chunk by chunk as they arrive, so memory use does not
+    depend on the file size. Returns None if storage does not have the object.
+    """
+    forwarded = {name: request.headers[name] for name in PROXY_REQUEST_HEADERS if name in request.headers}
+    # Ask for the stored bytes as-is so Content-Length and Content-Range stay valid
+    forwarded['Accept-Encoding'] = 'identity'
+    upstream = storage_client.request('get', 'GET', url, headers=forwarded, stream=True)
+    if upstream.status_code not in (200, 206, 304, 416):
+        upstream.close()
         return None
+    
+    response = Response(
+        upstream.raw.stream(PROXY_CHUNK_SIZE, decode_content=False),
+        status=upstream.status_code,
+        mimetype=content_type or upstream.headers.get('Content-Type', 'application/octet-stream'),
+        direct_passthrough=True
+    )
+    for name in PROXY_RESPONSE_HEADERS:
+        if name in upstream.headers:
+            response.headers[name] = upstream.headers[name]
+    response.headers.update(headers or {})
+    # Also runs when the client disconnects mid-download, returning the connection to the pool
+    response.call_on_close(upstream.close)
+    return response
+
+# Download counts are gathered per worker and written in batches (see counters.py).
+# They are left out of the cached listings and served by /api/documents/downloads,
+# so a flush never changes a listing's revision.
+download_counters = CounterBuffer(app, db)
 
-def list_supabase_files_http():
-    """List files using HTTP requests"""
-    if not supabase_available:
-        return []
+# Popular documents are kept on local disk (see file_cache.py)
+document_cache = FileCache()
+
+def cached_storage_file(url, content_type=None, headers=None):
+    """proxy_storage_file with the local disk cache in front of storage
+
+    Entries validated recently are served straight from disk; older ones are
+    revalidated with If-None-Match first. Hits go through send_file, which
+    answers Range/conditional requests itself and lets the server use
+    sendfile. A plain GET that misses streams the object to the client while
+    writing it to the cache; Range, conditional and HEAD requests that miss
+    are passed through to storage so they don't wait for the whole file.
+    If storage fails to answer a revalidation, the stale copy is served
+    (with a Warning header); it is only dropped when storage says the object
+    is gone (404/410).
+    """
+    if not document_cache.enabled:
+        return proxy_storage_file(url, content_type, headers)
+    passthrough = request.method == 'HEAD' or any(name in request.headers for name in PROXY_REQUEST_HEADERS)
+    try:
+        entry = document_cache.lookup(url)
+        upstream = None
+        if entry and not document_cache.is_fresh(entry):
+            if revalidation_failed():
+                return send_stale_file(entry, content_type, headers)
+            try:
+                upstream = storage_client.request('get', 'GET', url, stream=True,
+                                                  headers={'If-None-Match': entry.etag, 'Accept-Encoding': 'identity'})
+            except requests.RequestException as e:
+                log.warning('document_revalidation_failed', url=url, error=str(e))
+                return send_stale_file(entry, content_type, headers)
+            if upstream.status_code == 304:
+                upstream.close()
+                upstream = None
+                document_cache.mark_validated(url)
+                document_cache.count('revalidated')
+            elif upstream.status_code == 200:
+                entry = None
+                document_cache.count('refreshed')
+            elif upstream.status_code in (404, 410):
+                upstream.close()
+                document_cache.remove(url)
+                return None
+            else:
+                upstream.close()
+                log.warning('document_revalidation_failed', url=url, status=upstream.status_code)
+                return send_stale_file(entry, content_type, headers)
+        if entry:
+            document_cache.count('hits')
+            return send_cached_file(entry, content_type, headers)
+    except sqlite3.Error as e:
+        log.exception('document_cache_error', url=url, error=str(e))
+        document_cache.count('errors')
+        return proxy_storage_file(url, content_type, headers)
+
+    document_cache.count('misses')
+    if passthrough:
+        if upstream is not None:
+            upstream.close()
+        return proxy_storage_file(url, content_type, headers)
+    if upstream is None:
+        upstream = storage_client.request('get', 'GET', url, stream=True, headers={'Accept-Encoding': 'identity'})
+        if upstream.status_code != 200:
+            upstream.close()
+            return None
+    etag = upstream.headers.get('ETag')
+    length = int(upstream.headers.get('Content-Length') or -1)
+    if not etag or not 0 <= length <= document_cache.max_file_bytes:
+        upstream.close()
+        return proxy_storage_file(url, content_type, headers)
+    
+    writer = document_cache.writer(url, etag, upstream.headers.get('Content-Type'),
+                                   upstream.headers.get('Last-Modified'), upstream.headers.get('Cache-Control'))
+    def fill():
+        try:
+            for chunk in upstream.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+                writer.write(chunk)
+                yield chunk
+            if writer.size == length:
+                writer.commit()
+        finally:
+            writer.discard()
+            upstream.close()
     
+    response = Response(fill(), mimetype=content_type or upstream.headers.get('Content-Type', 'application/octet-stream'),
+                        direct_passthrough=True)
+    for name in PROXY_RESPONSE_HEADERS:
+        if name in upstream.headers:
+            response.headers[name] = upstream.headers[name]
+    response.headers.update(headers or {})
+    return response
+
+def revalidation_failed():
+    """Whether asgi.py already failed to revalidate this request's document (serve it stale)"""
+    return request.environ.get('asgi.scope', {}).get('document_revalidation_failed', False)
+
+def send_stale_file(entry, content_type=None, headers=None):
+    """A cached copy storage could not revalidate, marked as stale"""
+    document_cache.count('stale')
+    response = send_cached_file(entry, content_type, headers)
+    response.headers['Warning'] = '111 - "Revalidation Failed"'
+    return response
+
+def send_cached_file(entry, content_type=None, headers=None):
+    response = send_file(
+        entry.path,
+        mimetype=content_type or entry.content_type or 'application/octet-stream',
+        conditional=True,
+        etag=entry.etag.removeprefix('W/').strip('"'),
+        last_modified=parse_date(entry.last_modified) if entry.last_modified else None
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+    if entry.cache_control:
+        response.headers['Cache-Control'] = entry.cache_control
+    response.headers.update(headers or {})
+    document_cache.count('bytes_served', response.content_length or 0)
+    return response
+
+def extract_pdf_text(pdf_url, on_progress=None):
+    """Download a PDF and extract its text with page ranges spread over the process pool
+
+    on_progress(percent) is called after the download and as page ranges
+    finish. Returns (text, page count).
+    """
+    with metrics.timer('job_stage_duration_seconds', stage='pdf_download'):
+        pdf_path = download_to_spool(pdf_url, '.pdf')
     try:
-        list_url = f"{SUPABASE_URL}/storage/v1/object/list/{SUPABASE_BUCKET}"
-        headers = {"Authorization": f"Bearer {SUPABASE_KEY}"}
-        
-        response = requests.post(list_url, headers=headers, json={})
-        
-        if response.status_code == 200:
-            files = []
-            for file_info in response.json():
-                public_url = f"{SUPABASE_URL}/storage/v1/object/public/{SUPABASE_BUCKET}/{file_info['name']}"
-                files.append({
-                    'name': file_info['name'],
-                    'url': public_url,
-                    'size': file_info.get('metadata', {}).get('size', 0),
-                    'type': file_info.get('metadata', {}).get('mimetype', 'application/octet-stream'),
-                    'created': file_info.get('created_at', datetime.utcnow().isoformat())
-                })
-            return files
-        return []
-    except Exception as e:
-        print(f"❌ List files error: {e}")
-        return []
+        if on_progress:
+            on_progress(10)
+        with metrics.timer('job_stage_duration_seconds', stage='pdf_extract'):
+            pages = job_queue.run_cpu(page_count, pdf_path)
+            ranges = page_ranges(pages)
+            def range_done(done, total):
+                if on_progress:
+                    on_progress(10 + 85 * done // total)
+            chunks = job_queue.map_cpu(extract_pages, [(pdf_path, start, stop) for start, stop in ranges],
+                                       range_done)
+    finally:
+        os.unlink(pdf_path)
+    return "\n\n".join(itertools.chain.from_iterable(chunks)).strip(), pages
+
+def create_pdf_article(payload, on_progress=None):
+    """Turn a PDF in storage into a published article; returns {'id', 'pages'}"""
+    text_content, pages = extract_pdf_text(payload['file_url'], on_progress)
+    article = TextContent(
+        title=payload['title'],
+        content=text_content,
+        excerpt=payload.get('description', ''),
+        is_published=True
+    )
+    with metrics.timer('job_stage_duration_seconds', stage='pdf_save'):
+        db.session.add(article)
+        db.session.commit()
+    log.info('pdf_article_ready', article_id=article.id, title=payload['title'], pages=pages)
+    return {'id': article.id, 'pages': pages}
+
+@job_queue.handler('pdf_article')
+def pdf_article_job(job, payload):
+    return create_pdf_article(payload, lambda percent: job_queue.set_progress(job, percent))
+
+def finished_thumbnail(video_url):
+    """Result of a completed thumbnail job for video_url ({} if there is none)"""
+    job = Job.query.filter_by(kind='thumbnail', status='done', reference=video_url)\
+        .order_by(Job.finished_at.desc()).first()
+    return json.loads(job.result) if job else {}
+
+def record_blob(sha256, filename, url, size, content_type):
+    """Remember an uploaded file by content hash so identical uploads reuse it"""
+    try:
+        db.session.add(Blob(sha256=sha256, filename=filename, url=url, size=size, content_type=content_type))
+        db.session.commit()
+    except IntegrityError:
+        # The same content finished uploading concurrently; this copy stays unshared
+        db.session.rollback()
+
+def reusable_blob(sha256, size):
+    """The stored Blob an upload of this content can reuse, or None
+
+    A blob nothing refers to any more may already be queued for deletion
+    (see storage_outbox.py): its pending deletions are cancelled in the
+    same transaction, and if a worker has already claimed one the file may
+    be gone, so the content is uploaded again instead.
+    """
+    blob = db.session.get(Blob, sha256) if sha256 else None
+    if blob is None or blob.size != size:
+        return None
+    if blob.ref_count > 0:
+        return blob
+    table = StorageDeletion.__table__
+    db.session.execute(table.delete().where(table.c.filename == blob.filename, table.c.claimed_by == None))
+    if db.session.scalar(select(table.c.id).where(table.c.filename == blob.filename).limit(1)):
+        db.session.rollback()
+        return None
+    db.session.commit()
+    return blob
+
+def forget_blobs(filenames):
+    """Drop the blobs of files removed from storage, so no upload is deduplicated against them"""
+    if filenames:
+        with db.engine.begin() as conn:
+            conn.execute(Blob.__table__.delete().where(Blob.filename.in_(list(filenames))))
+
+def files_in_use(filenames):
+    """Names among filenames whose blob is still referenced by a video or document"""
+    if not filenames:
+        return set()
+    return set(db.session.scalars(
+        select(Blob.filename).where(Blob.filename.in_(list(filenames)), Blob.ref_count > 0)
+    ))
+
+def storage_keys_in_use(keys):
+    """Keys among keys that a video, document, referenced blob or article body still uses"""
+    keys = set(keys)
+    if not keys:
+        return set()
+    urls = {storage_public_url(key): key for key in keys}
+    in_use = set(files_in_use(keys))
+    for model, names in STORAGE_URL_COLUMNS.items():
+        for name in names:
+            column = getattr(model, name)
+            in_use.update(urls[url] for url in db.session.scalars(select(column).where(column.in_(list(urls)))))
+    # Variant URLs only live inside the thumbnail_variants JSON
+    for key in keys - in_use:
+        if '_thumb_' in key and db.session.scalar(
+            select(VideoContent.id).where(VideoContent.thumbnail_variants.contains(storage_public_url(key))).limit(1)
+        ):
+            in_use.add(key)
+    unclaimed = keys - in_use
+    if unclaimed:
+        in_use.update(embedded_storage_keys([storage_public_url(key) for key in unclaimed]) & unclaimed)
+    return in_use
+
+def embedded_storage_keys(urls=None):
+    """Keys of our files that article bodies embed (only articles containing one of urls, if given)"""
+    prefix = storage_public_url('')
+    embedded = re.compile(re.escape(prefix) + r'''([^\s"'<>()]+)''')
+    needles = urls or [prefix]
+    keys = set()
+    for content, excerpt in db.session.execute(
+        select(TextContent.content, TextContent.excerpt)
+        .where(or_(*(TextContent.content.contains(url) | TextContent.excerpt.contains(url) for url in needles)))
+    ):
+        keys.update(embedded.findall(f"{content or ''}\n{excerpt or ''}"))
+    return keys
+
+def existing_thumbnail(video_url):
+    """Thumbnail of an already stored video: (thumbnail_url, variants, pending job id)"""
+    job = Job.query.filter_by(kind='thumbnail', reference=video_url).order_by(Job.created_at.desc()).first()
+    if job and job.status in ('queued', 'running'):
+        return None, [], job.id
+    if job and job.status == 'done':
+        result = json.loads(job.result)
+        return result.get('thumbnail_url'), result.get('thumbnail_variants') or [], None
+    video = VideoContent.query.filter(VideoContent.video_url == video_url,
+                                      VideoContent.thumbnail_url.isnot(None)).first()
+    if video:
+        return video.thumbnail_url, json.loads(video.thumbnail_variants) if video.thumbnail_variants else [], None
+    return None, [], None
+
+def thumbnail_fields(video, width=None, fmt=None):
+    """thumbnail_url sized for the request, plus a srcset when variants exist"""
+    variants = json.loads(video.thumbnail_variants) if video.thumbnail_variants else []
+    chosen = pick_variant(variants, width, fmt)
+    if not chosen:
+        return {'thumbnail_url': video.thumbnail_url, 'thumbnail_srcset': None}
+    same_format = sorted((v for v in variants if v['format'] == chosen['format']), key=lambda v: v['width'])
+    return {
+        'thumbnail_url': chosen['url'],
+        'thumbnail_srcset': ', '.join(f"{v['url']} {v['width']}w" for v in same_format)
+    }
+
+def list_storage_page(prefix, offset, limit):
+    """One page of the bucket's list endpoint (files and subfolders directly under prefix)"""
+    list_url = f"{SUPABASE_URL}/storage/v1/object/list/{SUPABASE_BUCKET}"
+    headers = {"Authorization": f"Bearer {SUPABASE_KEY}"}
+    body = {'prefix': prefix, 'limit': limit, 'offset': offset, 'sortBy': {'column': 'name', 'order': 'asc'}}
+    response = storage_client.request('list', 'POST', list_url, headers=headers, json=body, idempotent=True)
+    response.raise_for_status()
+    return response.json()
+
+def upsert_storage_objects(conn, rows):
+    table = StorageObject.__table__
+    for start in range(0, len(rows), 1000):
+        statement = upsert_statement(conn, table).values(rows[start:start + 1000])
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={name: statement.excluded[name] for name in
+                  ('size', 'content_type', 'etag', 'created_at', 'indexed_at')}
+        ))
+
+def index_storage_objects(objects=(), removed=()):
+    """Apply our own uploads and deletes to the StorageObject index
+
+    Runs in its own transaction so callers' sessions are untouched. A
+    failure only leaves the index stale until the next reconcile.
+    """
+    try:
+        table = StorageObject.__table__
+        now = datetime.utcnow()
+        with db.engine.begin() as conn:
+            upsert_storage_objects(conn, [{'size': None, 'content_type': None, 'etag': None, 'created_at': now,
+                                           **obj, 'indexed_at': now} for obj in objects])
+            if removed:
+                conn.execute(table.delete().where(table.c.name.in_(list(removed))))
+            bump_revisions(conn, {cache_namespace('files')})
+    except Exception as e:
+        log.exception('storage_index_error', error=str(e))
+
+def reconcile_storage_index(prefix=''):
+    """Walk the bucket and make the StorageObject index match it; returns counts for the job result"""
+    sweep_started = datetime.utcnow()
+    lister = BucketLister(list_storage_page)
+    objects = lister.walk(prefix)
+    table = StorageObject.__table__
+    with db.engine.begin() as conn:
+        upsert_storage_objects(conn, [{**obj, 'indexed_at': sweep_started} for obj in objects])
+        # Rows neither seen by this walk nor written by an upload since it began
+        removed = conn.execute(
+            table.delete().where(table.c.name.startswith(prefix, autoescape=True),
+                                 table.c.indexed_at < sweep_started)
+        ).rowcount
+        if not prefix:
+            # Blobs whose file has disappeared from the bucket can't be reused
+            blobs = Blob.__table__
+            conn.execute(blobs.delete().where(blobs.c.filename.not_in(select(table.c.name))))
+        bump_revisions(conn, {cache_namespace('files')})
+    log.info('storage_index_reconciled', objects=len(objects), removed=removed, pages=lister.pages,
+             seconds=round(lister.seconds, 3), prefix=prefix)
+    return {'objects': len(objects), 'removed': removed, 'pages': lister.pages,
+            'seconds': round(lister.seconds, 3)}
+
+@job_queue.handler('storage_reconcile')
+def storage_reconcile_job(job, payload):
+    return reconcile_storage_index(payload.get('prefix', ''))
+
+def refresh_storage_index():
+    """Queue a reconcile once the last is STORAGE_RECONCILE_SECONDS old; True while one is pending
+
+    The index is never filled inside the request: until the first reconcile
+    finishes, /api/files answers from whatever our own uploads indexed and
+    says so with X-Storage-Reconciling. Without job workers (JOB_WORKERS=0)
+    the reconcile runs inline, as every other job does.
+    """
+    if not storage_health.available:
+        return False
+    now = datetime.utcnow()
+    last = Job.query.filter_by(kind='storage_reconcile').order_by(Job.created_at.desc()).first()
+    if last and last.status in ('queued', 'running') and last.created_at > now - timedelta(seconds=JOB_STALE_SECONDS):
+        return True
+    # A failed reconcile also waits for the next interval (POST /api/files/reconcile forces one)
+    if last and last.finished_at and last.finished_at > now - timedelta(seconds=STORAGE_RECONCILE_SECONDS):
+        return False
+    if not job_queue.enabled:
+        job_queue.run_inline('storage_reconcile', {})
+        return False
+    job_queue.enqueue('storage_reconcile', {})
+    return True
 
 def delete_file_http(filename):
     """Delete file using HTTP requests"""
-    if not supabase_available:
+    if not storage_health.available:
         return False
     
     try:
         delete_url = f"{SUPABASE_URL}/storage/v1/object/{SUPABASE_BUCKET}/{filename}"
         headers = {"Authorization": f"Bearer {SUPABASE_KEY}"}
         
-        response = requests.delete(delete_url, headers=headers)
+        response = storage_client.request('delete', 'DELETE', delete_url, headers=headers)
+        if response.status_code in (200, 404):
+            forget_blobs([filename])
+            index_storage_objects(removed=[filename])
         return response.status_code == 200
     except Exception as e:
-        print(f"❌ Delete error: {e}")
+        log.exception('storage_delete_error', filename=filename, error=str(e))
         return False
 
+STORAGE_DELETE_BATCH = 1000
+
+def delete_files_http(filenames):
+    """Delete many files with the bucket's multi-object remove call; returns the names storage deleted
+
+    Names storage did not report (already gone) are dropped from the file
+    index as well. Raises if a batch fails, after indexing the batches
+    that succeeded.
+    """
+    if not storage_health.available:
+        raise RuntimeError('Supabase not available')
+    delete_url = f"{SUPABASE_URL}/storage/v1/object/{SUPABASE_BUCKET}"
+    headers = {"Authorization": f"Bearer {SUPABASE_KEY}"}
+    deleted = []
+    filenames = list(dict.fromkeys(filenames))
+    for start in range(0, len(filenames), STORAGE_DELETE_BATCH):
+        batch = filenames[start:start + STORAGE_DELETE_BATCH]
+        response = storage_client.request('delete', 'DELETE', delete_url, headers=headers,
+                                          json={'prefixes': batch})
+        response.raise_for_status()
+        deleted.extend(obj['name'] for obj in response.json())
+        forget_blobs(batch)
+        index_storage_objects(removed=batch)
+    return deleted
+
+# Files of deleted videos and documents are removed by this worker (see storage_outbox.py)
+storage_outbox = DeletionOutbox(app, db, StorageDeletion, delete_files_http, storage_keys_in_use)
+
+STORAGE_GC_MIN_AGE_HOURS = int(os.environ.get('STORAGE_GC_MIN_AGE_HOURS', 24))
+
+def referenced_storage_keys():
+    """Every key a video, document, blob or article body refers to"""
+    keys = set()
+    for video in db.session.execute(
+        select(VideoContent.video_url, VideoContent.thumbnail_url, VideoContent.thumbnail_variants)
+    ):
+        keys.update(file_keys(VideoContent, video._asdict()))
+    for (file_url,) in db.session.execute(select(Document.file_url)):
+        keys.update(file_keys(Document, {'file_url': file_url}))
+    keys.update(db.session.scalars(select(Blob.filename).where(Blob.ref_count > 0)))
+    # Articles may embed images uploaded through /api/upload
+    keys.update(embedded_storage_keys())
+    return keys
+
+def find_storage_orphans():
+    """Objects in the bucket that nothing refers to; returns (orphans, objects listed, recent orphans skipped)
+
+    Objects younger than STORAGE_GC_MIN_AGE_HOURS are left alone, since
+    an upload is stored before the video or document that uses it.
+    """
+    objects = BucketLister(list_storage_page).walk()
+    referenced = referenced_storage_keys()
+    cutoff = datetime.utcnow() - timedelta(hours=STORAGE_GC_MIN_AGE_HOURS)
+    unreferenced = [obj for obj in objects if obj['name'] not in referenced]
+    orphans = [obj for obj in unreferenced if obj['created_at'] < cutoff]
+    return orphans, len(objects), len(unreferenced) - len(orphans), len(referenced)
+
+def collect_storage_garbage(dry_run=True):
+    """Find orphaned objects and, unless dry_run, queue them for deletion; returns a report"""
+    orphans, listed, skipped_recent, referenced = find_storage_orphans()
+    if not dry_run and orphans:
+        with db.engine.begin() as conn:
+            storage_outbox.enqueue(conn, [obj['name'] for obj in orphans], 'gc', delay=0)
+        storage_outbox.wakeup.set()
+    report = {
+        'dry_run': dry_run,
+        'objects': listed,
+        'referenced': referenced,
+        'orphans': len(orphans),
+        'orphan_bytes': sum(obj['size'] or 0 for obj in orphans),
+        'skipped_recent': skipped_recent,
+        'sample': sorted(obj['name'] for obj in orphans)[:50]
+    }
+    log.info('storage_gc', dry_run=dry_run, objects=listed, orphans=report['orphans'],
+             orphan_bytes=report['orphan_bytes'], skipped_recent=skipped_recent)
+    return report
+
+@job_queue.handler('storage_gc')
+def storage_gc_job(job, payload):
+    return collect_storage_garbage(payload.get('dry_run', True))
+
+@app.before_request
+def start_background_workers():
+    storage_health.start()
+    job_queue.start()
+    storage_outbox.start()
+    metrics.start()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def request_route():
+    """The URL rule a request matched, so /api/videos/1 and /api/videos/2 share a series"""
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def record_request(route, method, status, started, received, sent):
+    metrics.inc('http_requests_total', route=route, method=method, status=status)
+    metrics.observe('http_request_duration_seconds', time.perf_counter() - started, route=route, method=method)
+    if received:
+        metrics.inc('http_request_bytes_total', received, route=route)
+    if sent:
+        metrics.inc('http_response_bytes_total', sent, route=route)
+
+@app.after_request
+def record_request_metrics(response):
+    """Count and time the request once the server has sent the whole body (streamed ones too)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        args = (request_route(), request.method, response.status_code, started,
+                request.content_length, response.content_length)
+        response.call_on_close(lambda: record_request(*args))
+    return response
+
 # Routes
 @app.route('/')
 def index():
-    status = "Supabase Connected ✅" if supabase_available else "Supabase Disconnected ❌"
+    status = "Supabase Connected ✅" if storage_health.available else "Supabase Disconnected ❌"
     try:
         return send_from_directory(app.static_folder, 'index.html')
     except Exception as e:
@@ -293,7 +1521,7 @@ def admin():
     try:
         return send_from_directory(app.static_folder, 'admin.html')
     except Exception as e:
-        status = "Supabase Connected" if supabase_available else "Supabase Error"
+        status = "Supabase Connected" if storage_health.available else "Supabase Error"
         return f'''
         <!DOCTYPE html>
         <html>
@@ -312,14 +1540,45 @@ def health():
         'timestamp': datetime.utcnow().isoformat(),
         'database': 'connected',
         'supabase': {
-            'available': supabase_available,
+            'available': storage_health.available,
+            'probe': storage_health.stats(),
             'method': 'direct_http',
             'bucket': SUPABASE_BUCKET,
             'url_configured': bool(SUPABASE_URL),
-            'key_configured': bool(SUPABASE_KEY)
-        }
+            'key_configured': bool(SUPABASE_KEY),
+            'client': storage_client.stats()
+        },
+        'response_cache': response_cache.stats(),
+        'document_cache': document_cache.stats(),
+        'download_counters': download_counters.stats(),
+        'storage_deletions': storage_outbox.stats(),
+        'snapshots': snapshot_store.stats()
     })
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape target: the metrics of every worker on this dyno (see metrics.py)"""
+    metrics.flush()
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def upload_result(url, filename, original_name, size, content_type, sha256, thumbnail, method, upload_stats=None):
+    """Response body of /api/upload; thumbnail is (url, variants, job id)"""
+    thumbnail_url, thumbnail_variants, thumbnail_job_id = thumbnail
+    return {
+        'url': url,
+        'filename': filename,
+        'original_name': original_name,
+        'size': size,
+        'type': content_type,
+        'sha256': sha256,
+        'thumbnail_url': thumbnail_url,
+        'thumbnail_variants': thumbnail_variants,
+        'thumbnail_job_id': thumbnail_job_id,
+        'thumbnail_status_url': f'/api/jobs/{thumbnail_job_id}' if thumbnail_job_id else None,
+        'method': method,
+        'upload_stats': upload_stats
+    }
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     try:
@@ -335,184 +1594,323 @@ def upload_file():
         if not allowed_file(file.filename, file_type):
             return jsonify({'error': f'File type not allowed for {file_type}'}), 400
         
-        # Read file data
-        file_data = file.read()
+        # The body has already been spooled to a file in JOB_SPOOL_DIR (see
+        # SpoolingRequest); stream it to storage from there rather than reading
+        # it all into memory
+        file_stream = file.stream
+        file_stream.seek(0)
+        file_size = stream_remaining_size(file_stream)
+        sha256 = getattr(file_stream, 'sha256', None)
+        
+        # Identical content already in storage: reuse its file, URL and thumbnail
+        blob = reusable_blob(sha256, file_size)
+        if blob:
+            log.info('upload_deduplicated', filename=blob.filename, size=file_size, sha256=sha256)
+            thumbnail_url, thumbnail_variants, thumbnail_job_id = None, [], None
+            if file_type == 'video':
+                thumbnail_url, thumbnail_variants, thumbnail_job_id = existing_thumbnail(blob.url)
+                if not (thumbnail_url or thumbnail_job_id) and job_queue.enabled:
+                    thumbnail_job_id = enqueue_thumbnail_job(file, blob.filename, blob.url)
+            return jsonify(upload_result(blob.url, blob.filename, file.filename, file_size, blob.content_type, sha256,
+                                         (thumbnail_url, thumbnail_variants, thumbnail_job_id), 'deduplicated')), 200
+        
         filename = generate_unique_filename(file.filename)
         content_type = file.content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
         
-        print(f"📁 Processing: {file.filename} -> {filename}")
-        print(f"📊 Size: {len(file_data)} bytes")
-        
-        # Upload using HTTP
-        file_url = upload_to_supabase_http(file_data, filename, content_type)
+        # Upload using HTTP; large files go up as resumable parallel parts
+        upload_stats = None
+        if file_size >= RESUMABLE_UPLOAD_THRESHOLD:
+            file_url, upload_stats = upload_resumable_http(file_stream, filename, content_type, sha256)
+            if upload_stats:
+                filename = upload_stats['object_name']
+        else:
+            file_url = upload_to_supabase_http(file_stream, filename, content_type)
         
         if not file_url:
             return jsonify({
                 'error': 'Failed to upload to Supabase',
-                'supabase_available': supabase_available,
+                'supabase_available': storage_health.available,
                 'method': 'direct_http'
             }), 500
         
-        # Generate thumbnail
+        if sha256:
+            record_blob(sha256, filename, file_url, file_size, content_type)
+        
+        # Generate thumbnail in the background unless the job queue is disabled
         thumbnail_url = None
+        thumbnail_variants = []
+        thumbnail_job_id = None
         if file_type == 'video':
-            thumbnail_url = generate_thumbnail_http(file_data, filename)
-
-        response_data = {
-            'url': file_url,
-            'filename': filename,
-            'original_name': file.filename,
-            'size': len(file_data),
-            'type': content_type,
-            'thumbnail_url': thumbnail_url,
-            'method': 'http_upload'
-        }
+            if job_queue.enabled:
+                thumbnail_job_id = enqueue_thumbnail_job(file, filename, file_url)
+            else:
+                file_stream.flush()
+                thumbnail_url, thumbnail_variants = generate_thumbnail_http(file_stream.name, filename)
+
+        response_data = upload_result(file_url, filename, file.filename, file_size, content_type, sha256,
+                                      (thumbnail_url, thumbnail_variants, thumbnail_job_id),
+                                      'resumable_upload' if upload_stats else 'http_upload', upload_stats)
         
-        print(f"✅ Upload complete: {file_url}")
+        log.info('upload_complete', original_name=file.filename, filename=filename, size=file_size,
+                 method=response_data['method'], thumbnail_job_id=thumbnail_job_id)
         return jsonify(response_data), 200
         
     except Exception as e:
-        print(f"❌ Upload error: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        log.exception('upload_error', error=str(e))
         return jsonify({'error': 'Upload failed', 'details': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_to_dict(job))
+
+@app.route('/api/search', methods=['GET'])
+def search_api():
+    """Ranked full-text search: ?q=...&type=text,document&category=...&limit=&offset="""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Missing search query (q)'}), 400
+        if not search_available():
+            return jsonify({'error': 'Search is not available'}), 503
+
+        kinds = [kind.strip() for kind in request.args.get('type', ','.join(SEARCHABLE.values())).split(',')]
+        unknown = [kind for kind in kinds if kind not in SEARCHABLE.values()]
+        if unknown:
+            return jsonify({'error': f"Unknown type: {', '.join(unknown)}"}), 400
+        limit = max(1, min(request.args.get('limit', 20, type=int), SEARCH_MAX_RESULTS))
+        offset = max(0, request.args.get('offset', 0, type=int))
+
+        rows = search_index.search(db.session.connection(), query, kinds, request.args.get('category'),
+                                   limit + 1, offset)
+        return jsonify({
+            'query': query,
+            'results': [result_to_dict(row) for row in rows[:limit]],
+            'next_offset': offset + limit if len(rows) > limit else None
+        })
+    except SearchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log.exception('search_error', error=str(e))
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/files', methods=['GET'])
 def list_files():
+    """Bucket objects from the StorageObject index, newest first (?prefix= filters by name)"""
     try:
-        files = list_supabase_files_http()
-        files.sort(key=lambda x: x.get('created', ''), reverse=True)
-        return jsonify(files), 200
+        reconciling = refresh_storage_index()
+        prefix = request.args.get('prefix')
+        def build():
+            where = [StorageObject.name.startswith(prefix, autoescape=True)] if prefix else []
+            return fetch_page(db.session, FILE_FIELDS, FILE_ORDER, where, request.args)
+        response = cached_json_list('files', build)
+        if reconciling:
+            # The listing may still miss objects the running reconcile will add
+            response.headers['X-Storage-Reconciling'] = 'true'
+        return response
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ List files error: {e}")
+        log.exception('list_files_error', error=str(e))
         return jsonify({'error': 'Failed to list files'}), 500
 
+@app.route('/api/files/bulk', methods=['POST'])
+def bulk_files():
+    """Delete many storage files in one request: {"delete": ["name", ...]}
+
+    Files still used by a video or document are skipped and reported as in_use.
+    """
+    try:
+        names = bulk_items(request.get_json(silent=True) or {}, 'delete')
+        if not all(isinstance(name, str) and name for name in names):
+            raise BulkError('delete must be a list of file names')
+        in_use = files_in_use(names)
+        deleted = delete_files_http([name for name in names if name not in in_use])
+        missing = sorted(set(names) - set(deleted) - in_use)
+        return jsonify({'deleted': deleted, 'missing': missing, 'in_use': sorted(in_use)}), 200
+    except BulkError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log.exception('bulk_delete_error', error=str(e))
+        return jsonify({'error': 'Failed to delete files'}), 500
+
+@app.route('/api/files/reconcile', methods=['POST'])
+def reconcile_files():
+    """Re-list the bucket into the file index now"""
+    try:
+        if not job_queue.enabled:
+            job_id = job_queue.run_inline('storage_reconcile', {})
+            return jsonify(job_to_dict(db.session.get(Job, job_id)))
+        job_id = job_queue.enqueue('storage_reconcile', {})
+        return jsonify({'message': 'Reconcile started', 'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}), 202
+    except Exception as e:
+        log.exception('storage_reconcile_error', error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/files/gc', methods=['POST'])
+def storage_gc():
+    """Report objects nothing refers to; {"dry_run": false} also queues them for deletion"""
+    try:
+        data = request.get_json(silent=True) or {}
+        payload = {'dry_run': data.get('dry_run', True) is not False}
+        if not job_queue.enabled:
+            job_id = job_queue.run_inline('storage_gc', payload)
+            return jsonify(job_to_dict(db.session.get(Job, job_id)))
+        job_id = job_queue.enqueue('storage_gc', payload)
+        return jsonify({'message': 'Storage GC started', 'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}), 202
+    except Exception as e:
+        log.exception('storage_gc_error', error=str(e))
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/files/<filename>', methods=['DELETE'])
 def delete_file(filename):
     try:
-        if delete_file_http(secure_filename(filename)):
+        filename = secure_filename(filename)
+        if files_in_use([filename]):
+            return jsonify({'error': 'File is used by a video or document'}), 409
+        if delete_file_http(filename):
             return jsonify({'message': 'File deleted successfully'}), 200
         else:
             return jsonify({'error': 'File not found'}), 404
     except Exception as e:
-        print(f"❌ Delete error: {e}")
+        log.exception('delete_file_error', filename=filename, error=str(e))
         return jsonify({'error': 'Failed to delete file'}), 500
 
 @app.route('/api/process-pdf-article', methods=['POST'])
 def process_pdf_article():
+    """Queue a PDF for conversion into an article; poll status_url for the article id"""
     try:
-        import PyPDF2
-        import io
-        
         data = request.get_json()
-        pdf_url = data['file_url']
-        title = data['title']
-        
-        # Download PDF from Supabase
-        response = requests.get(pdf_url)
-        pdf_data = io.BytesIO(response.content)
-        
-        # Extract text from PDF
-        pdf_reader = PyPDF2.PdfReader(pdf_data)
-        text_content = ""
-        for page in pdf_reader.pages:
-            text_content += page.extract_text() + "\n\n"
-        
-        # Create article in database
-        article = TextContent(
-            title=title,
-            content=text_content.strip(),
-            excerpt=data.get('description', ''),
-            is_published=True
-        )
-        db.session.add(article)
-        db.session.commit()
+        payload = {
+            'file_url': data['file_url'],
+            'title': data['title'],
+            'description': data.get('description', '')
+        }
         
-        return jsonify({'message': 'Article processed successfully', 'id': article.id})
+        if not job_queue.enabled:
+            result = create_pdf_article(payload)
+            return jsonify({'message': 'Article processed successfully', **result})
+        
+        job_id = job_queue.enqueue('pdf_article', payload, reference=payload['file_url'])
+        return jsonify({
+            'message': 'PDF processing started',
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
     except Exception as e:
-        print(f"PDF processing error: {e}")
+        log.exception('pdf_article_error', error=str(e))
         return jsonify({'error': str(e)}), 500
 
+# Content rows from admin request data (shared by the single-item and bulk endpoints)
+def video_from_data(data):
+    thumbnail = {} if data.get('thumbnail_url') else finished_thumbnail(data['video_url'])
+    thumbnail_variants = data.get('thumbnail_variants') or thumbnail.get('thumbnail_variants')
+    return VideoContent(
+        title=data['title'],
+        description=data.get('description'),
+        video_url=data['video_url'],
+        thumbnail_url=data.get('thumbnail_url') or thumbnail.get('thumbnail_url'),
+        thumbnail_variants=json.dumps(thumbnail_variants) if thumbnail_variants else None,
+        category=data.get('category', 'Miscellaneous'),  # ADD THIS LINE
+        is_published=data.get('is_published', True),
+        order_index=data.get('order_index', 0)
+    )
+
+def update_video(video, data):
+    video.title = data.get('title', video.title)
+    video.description = data.get('description', video.description)
+    video.video_url = data.get('video_url', video.video_url)
+    thumbnail_url = data.get('thumbnail_url', video.thumbnail_url)
+    if thumbnail_url != video.thumbnail_url:
+        # A hand-picked thumbnail replaces the generated size variants
+        video.thumbnail_variants = json.dumps(data['thumbnail_variants']) if data.get('thumbnail_variants') else None
+    video.thumbnail_url = thumbnail_url
+    video.is_published = data.get('is_published', video.is_published)
+    video.order_index = data.get('order_index', video.order_index)
+
+def text_from_data(data):
+    return TextContent(
+        title=data['title'],
+        content=data['content'],
+        excerpt=data.get('excerpt'),
+        is_published=data.get('is_published', True),
+        order_index=data.get('order_index', 0)
+    )
+
+def document_from_data(data):
+    return Document(
+        title=data['title'],
+        description=data.get('description'),
+        file_url=data['file_url'],
+        filename=data.get('filename', data['title']),
+        file_type=data.get('file_type'),
+        file_size=data.get('file_size'),
+        category=data.get('category', 'Miscellaneous'),  # ADD THIS LINE
+        is_published=data.get('is_published', True)
+    )
+
+def update_fields(obj, data, names):
+    for name in names:
+        if name in data:
+            setattr(obj, name, data[name])
+
+TEXT_UPDATE_FIELDS = ('title', 'content', 'excerpt', 'is_published', 'order_index')
+DOCUMENT_UPDATE_FIELDS = ('title', 'description', 'file_url', 'filename', 'file_type', 'file_size',
+                          'category', 'is_published')
+
 @app.route('/api/videos', methods=['GET', 'POST'])
 def videos():
     try:
         if request.method == 'GET':
             category = request.args.get('category')  # ADD THIS LINE
-            if category:  # ADD THIS BLOCK
-                videos = VideoContent.query.filter_by(is_published=True, category=category).order_by(VideoContent.order_index.desc()).all()
-            else:
-                videos = VideoContent.query.filter_by(is_published=True).order_by(VideoContent.order_index.desc()).all()
-            return jsonify([{
-                'id': v.id,
-                'title': v.title,
-                'description': v.description,
-                'video_url': v.video_url,
-                'thumbnail_url': v.thumbnail_url,
-                'category': v.category,  # ADD THIS LINE
-                'created_at': v.created_at.isoformat()
-            } for v in videos])
+            thumb_width = request.args.get('thumb_width', type=int)
+            thumb_format = request.args.get('thumb_format')
+            def build():
+                where = [VideoContent.is_published == True]
+                if category:  # ADD THIS BLOCK
+                    where.append(VideoContent.category == category)
+                return fetch_page(db.session, video_list_fields(thumb_width, thumb_format),
+                                  VIDEO_ORDER, where, request.args)
+            return cached_json_list('videos', build)
         elif request.method == 'POST':
             data = request.get_json()
-            video = VideoContent(
-                title=data['title'],
-                description=data.get('description'),
-                video_url=data['video_url'],
-                thumbnail_url=data.get('thumbnail_url'),
-                category=data.get('category', 'Miscellaneous'),  # ADD THIS LINE
-                is_published=data.get('is_published', True),
-                order_index=data.get('order_index', 0)
-            )
+            video = video_from_data(data)
             db.session.add(video)
             db.session.commit()
             return jsonify({'message': 'Video created successfully'}), 201
             return jsonify({'message': 'Video created successfully'}), 201
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ Videos API error: {e}")
+        log.exception('videos_api_error', error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/admin/videos', methods=['GET'])
 def admin_videos():
     try:
-        videos = VideoContent.query.order_by(VideoContent.order_index.desc()).all()
-        return jsonify([{
-            'id': v.id,
-            'title': v.title,
-            'description': v.description,
-            'video_url': v.video_url,
-            'thumbnail_url': v.thumbnail_url,
-            'is_published': v.is_published,
-            'order_index': v.order_index,
-            'created_at': v.created_at.isoformat()
-        } for v in videos])
-    except Exception as e:
-        print(f"❌ Admin videos error: {e}")
+        return conditional_get(cache_namespace('videos'), lambda revision: page_response(
+            *fetch_page(db.session, ADMIN_VIDEO_FIELDS, VIDEO_ORDER, [], request.args)
+        ))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log.exception('admin_videos_error', error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/videos/<int:video_id>', methods=['GET', 'PUT', 'DELETE'])
 def manage_video(video_id):
     try:
-        video = VideoContent.query.get_or_404(video_id)
-        
         if request.method == 'GET':
-            return jsonify({
-                'id': video.id,
-                'title': video.title,
-                'description': video.description,
-                'video_url': video.video_url,
-                'thumbnail_url': video.thumbnail_url,
-                'is_published': video.is_published,
-                'order_index': video.order_index,
-                'created_at': video.created_at.isoformat()
-            })
-        
-        elif request.method == 'PUT':
+            build = lambda revision: fetch_item(ADMIN_VIDEO_FIELDS, VideoContent.id == video_id)
+            return conditional_get(cache_namespace('videos'), build)
+
+        video = VideoContent.query.get_or_404(video_id)
+
+        if request.method == 'PUT':
             data = request.get_json()
-            video.title = data.get('title', video.title)
-            video.description = data.get('description', video.description)
-            video.video_url = data.get('video_url', video.video_url)
-            video.thumbnail_url = data.get('thumbnail_url', video.thumbnail_url)
-            video.is_published = data.get('is_published', video.is_published)
-            video.order_index = data.get('order_index', video.order_index)
+            update_video(video, data)
             db.session.commit()
             return jsonify({'message': 'Video updated successfully'})
         
@@ -522,74 +1920,52 @@ def manage_video(video_id):
             return jsonify({'message': 'Video deleted successfully'})
             
     except Exception as e:
-        print(f"❌ Manage video error: {e}")
+        log.exception('manage_video_error', video_id=video_id, error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/texts', methods=['GET', 'POST'])
 def texts():
     try:
         if request.method == 'GET':
-            texts = TextContent.query.filter_by(is_published=True).order_by(TextContent.order_index.desc()).all()
-            return jsonify([{
-                'id': t.id,
-                'title': t.title,
-                'content': t.content,
-                'excerpt': t.excerpt,
-                'created_at': t.created_at.isoformat()
-            } for t in texts])
+            def build():
+                return fetch_page(db.session, TEXT_FIELDS, TEXT_ORDER,
+                                  [TextContent.is_published == True], request.args)
+            return cached_json_list('texts', build)
         
         elif request.method == 'POST':
             data = request.get_json()
-            text = TextContent(
-                title=data['title'],
-                content=data['content'],
-                excerpt=data.get('excerpt'),
-                is_published=data.get('is_published', True),
-                order_index=data.get('order_index', 0)
-            )
+            text = text_from_data(data)
             db.session.add(text)
             db.session.commit()
             return jsonify({'message': 'Text created successfully'}), 201
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ Texts API error: {e}")
+        log.exception('texts_api_error', error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/admin/texts', methods=['GET'])
 def admin_texts():
     try:
-        texts = TextContent.query.order_by(TextContent.order_index.desc()).all()
-        return jsonify([{
-            'id': t.id,
-            'title': t.title,
-            'content': t.content,
-            'excerpt': t.excerpt,
-            'file_url': t.file_url,  # ADD THIS LINE
-            'is_published': t.is_published,
-            'order_index': t.order_index,
-            'created_at': t.created_at.isoformat()
-        } for t in texts])
-    except Exception as e:
-        print(f"❌ Admin texts error: {e}")
+        return conditional_get(cache_namespace('texts'), lambda revision: page_response(
+            *fetch_page(db.session, ADMIN_TEXT_FIELDS, TEXT_ORDER, [], request.args)
+        ))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log.exception('admin_texts_error', error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/texts/<int:text_id>', methods=['GET', 'PUT', 'DELETE'])
 def manage_text(text_id):
     try:
-        text = TextContent.query.get_or_404(text_id)
-        
         if request.method == 'GET':
-            return jsonify({
-                'id': text.id,
-                'title': text.title,
-                'content': text.content,
-                'excerpt': text.excerpt,
-                'file_url': text.file_url,  # ADD THIS LINE
-                'is_published': text.is_published,
-                'order_index': text.order_index,
-                'created_at': text.created_at.isoformat()
-            })
-        
-        elif request.method == 'PUT':
+            build = lambda revision: fetch_item(ADMIN_TEXT_FIELDS, TextContent.id == text_id)
+            return conditional_get(cache_namespace('texts'), build)
+
+        text = TextContent.query.get_or_404(text_id)
+
+        if request.method == 'PUT':
             data = request.get_json()
             text.title = data.get('title', text.title)
             text.content = data.get('content', text.content)
@@ -606,7 +1982,148 @@ def manage_text(text_id):
             return jsonify({'message': 'Text deleted successfully'})
             
     except Exception as e:
-        print(f"❌ Manage text error: {e}")
+        log.exception('manage_text_error', text_id=text_id, error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+# Bulk admin operations: many items of one collection per request, in one transaction
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+
+class BulkError(ValueError):
+    """Invalid bulk request (reported as 400; nothing is written)"""
+
+BULK_COLLECTIONS = {
+    'videos': (VideoContent, video_from_data, update_video),
+    'texts': (TextContent, text_from_data, lambda text, data: update_fields(text, data, TEXT_UPDATE_FIELDS)),
+    'documents': (Document, document_from_data,
+                  lambda document, data: update_fields(document, data, DOCUMENT_UPDATE_FIELDS)),
+}
+REORDERABLE = {'videos': VideoContent, 'texts': TextContent}
+
+def bulk_items(data, key):
+    items = data.get(key) or []
+    if not isinstance(items, list):
+        raise BulkError(f'{key} must be a list')
+    if len(items) > BULK_MAX_ITEMS:
+        raise BulkError(f'At most {BULK_MAX_ITEMS} items per request')
+    return items
+
+def bulk_ids(values, what):
+    try:
+        ids = [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise BulkError(f'{what} must be integer ids')
+    if len(set(ids)) != len(ids):
+        raise BulkError(f'{what} contains duplicate ids')
+    return ids
+
+def load_rows(model, ids):
+    """{id: row} for ids, raising BulkError if any are missing"""
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids))} if ids else {}
+    missing = [i for i in ids if i not in rows]
+    if missing:
+        raise BulkError(f"Unknown ids: {', '.join(map(str, missing[:20]))}")
+    return rows
+
+@app.route('/api/<collection>/bulk', methods=['POST'])
+def bulk_content(collection):
+    """Create, update and delete many items in one transaction
+
+    Body: {"create": [{...}], "update": [{"id": 1, ...}], "delete": [2, 3]}.
+    Items use the same fields as the single-item endpoints. Either every
+    change is committed or none is. Files of deleted videos and documents
+    are queued for the storage deletion worker in the same transaction.
+    """
+    if collection not in BULK_COLLECTIONS:
+        return jsonify({'error': 'Not found'}), 404
+    model, create, update = BULK_COLLECTIONS[collection]
+    try:
+        data = request.get_json(silent=True) or {}
+        creates = bulk_items(data, 'create')
+        updates = bulk_items(data, 'update')
+        deletes = bulk_ids(bulk_items(data, 'delete'), 'delete')
+        if len(creates) + len(updates) + len(deletes) > BULK_MAX_ITEMS:
+            raise BulkError(f'At most {BULK_MAX_ITEMS} items per request')
+        if not all(isinstance(item, dict) for item in creates + updates):
+            raise BulkError('create and update items must be objects')
+
+        try:
+            created = [create(item) for item in creates]
+        except KeyError as e:
+            raise BulkError(f'create item is missing {e}')
+        db.session.add_all(created)
+
+        rows = load_rows(model, bulk_ids([item.get('id') for item in updates], 'update'))
+        for item in updates:
+            update(rows[int(item['id'])], item)
+
+        for row in load_rows(model, deletes).values():
+            db.session.delete(row)
+
+        db.session.commit()
+        return jsonify({
+            'message': f'{collection.capitalize()} updated successfully',
+            'created': [row.id for row in created],
+            'updated': len(updates),
+            'deleted': len(deletes)
+        }), 200
+    except BulkError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        log.exception('bulk_content_error', collection=collection, error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/<collection>/reorder', methods=['POST'])
+def reorder_content(collection):
+    """Set order_index of many items in one statement
+
+    Body: {"ids": [5, 2, 9]} in display order (listings show the highest
+    order_index first), or {"order": [{"id": 5, "order_index": 10}, ...]}.
+    """
+    model = REORDERABLE.get(collection)
+    if model is None:
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        data = request.get_json(silent=True) or {}
+        if 'ids' in data:
+            ids = bulk_ids(bulk_items(data, 'ids'), 'ids')
+            positions = [len(ids) - 1 - i for i in range(len(ids))]
+        else:
+            order = bulk_items(data, 'order')
+            if not all(isinstance(item, dict) for item in order):
+                raise BulkError('order items must be objects')
+            ids = bulk_ids([item.get('id') for item in order], 'order')
+            try:
+                positions = [int(item['order_index']) for item in order]
+            except (KeyError, TypeError, ValueError):
+                raise BulkError('order items need an integer order_index')
+        if not ids:
+            raise BulkError('Nothing to reorder')
+
+        existing = set(db.session.scalars(select(model.id).where(model.id.in_(ids))))
+        missing = [i for i in ids if i not in existing]
+        if missing:
+            raise BulkError(f"Unknown ids: {', '.join(map(str, missing[:20]))}")
+
+        table = model.__table__
+        statement = table.update().where(table.c.id == bindparam('row_id')).values(order_index=bindparam('position'))
+        db.session.connection().execute(statement, [
+            {'row_id': row_id, 'position': position} for row_id, position in zip(ids, positions)
+        ])
+        # The UPDATE bypasses the ORM, so listings are invalidated explicitly
+        categories = []
+        if hasattr(model, 'category'):
+            categories = db.session.scalars(select(model.category).where(model.id.in_(ids)).distinct()).all()
+        mark_changed(collection, *categories)
+        db.session.commit()
+        return jsonify({'message': 'Order updated successfully', 'updated': len(ids)}), 200
+    except BulkError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        log.exception('reorder_content_error', collection=collection, error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.errorhandler(413)
@@ -625,60 +2142,63 @@ def documents_api():
     try:
         if request.method == 'GET':
             category = request.args.get('category')  # ADD THIS
-            if category:  # ADD THIS BLOCK
-                documents = Document.query.filter_by(is_published=True, category=category).order_by(Document.created_at.desc()).all()
-            else:
-                documents = Document.query.filter_by(is_published=True).order_by(Document.created_at.desc()).all()
-            return jsonify([{
-                'id': d.id,
-                'title': d.title,
-                'description': d.description,
-                'file_url': d.file_url,
-                'filename': d.filename,
-                'category': d.category,  # ADD THIS LINE
-                'download_count': d.download_count,
-                'created_at': d.created_at.isoformat()
-            } for d in documents])
+            def build():
+                where = [Document.is_published == True]
+                if category:  # ADD THIS BLOCK
+                    where.append(Document.category == category)
+                return fetch_page(db.session, DOCUMENT_FIELDS, DOCUMENT_ORDER, where, request.args)
+            return cached_json_list('documents', build)
         
         elif request.method == 'POST':
             data = request.get_json()
-            document = Document(
-                title=data['title'],
-                description=data.get('description'),
-                file_url=data['file_url'],
-                filename=data.get('filename', data['title']),
-                file_type=data.get('file_type'),
-                file_size=data.get('file_size'),
-                category=data.get('category', 'Miscellaneous'),  # ADD THIS LINE
-                is_published=data.get('is_published', True)
-            )
+            document = document_from_data(data)
             db.session.add(document)
             db.session.commit()
             return jsonify({'message': 'Document created successfully'}), 201
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Documents API error: {e}")
+        log.exception('documents_api_error', error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/admin/documents', methods=['GET'])
 def admin_documents():
     """Get all documents for admin management"""
     try:
-        documents = Document.query.order_by(Document.created_at.desc()).all()
-        return jsonify([{
-            'id': d.id,
-            'title': d.title,
-            'description': d.description,
-            'file_url': d.file_url,
-            'filename': d.filename,
-            'category': d.category,
-            'file_type': d.file_type,
-            'file_size': d.file_size,
-            'is_published': d.is_published,
-            'download_count': d.download_count,
-            'created_at': d.created_at.isoformat()
-        } for d in documents])
-    except Exception as e:
-        print(f"Admin documents error: {e}")
+        return conditional_get(cache_namespace('documents'), lambda revision: page_response(
+            *fetch_page(db.session, ADMIN_DOCUMENT_FIELDS, DOCUMENT_ORDER, [], request.args)
+        ))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log.exception('admin_documents_error', error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+def download_counts(*where):
+    """{document id: download count} of the documents matching where, as JSON"""
+    rows = db.session.execute(select(Document.id, Document.download_count).where(*where))
+    return jsonify({str(doc_id): count or 0 for doc_id, count in rows})
+
+@app.route('/api/documents/downloads', methods=['GET'])
+def document_downloads():
+    """Download counts of the published documents (?category= filters), kept out of the cached listings"""
+    try:
+        category = request.args.get('category')
+        where = [Document.is_published == True]
+        if category:
+            where.append(Document.category == category)
+        return download_counts(*where)
+    except Exception as e:
+        log.exception('document_downloads_error', error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/documents/downloads', methods=['GET'])
+def admin_document_downloads():
+    """Download counts of every document"""
+    try:
+        return download_counts()
+    except Exception as e:
+        log.exception('document_downloads_error', error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/documents/<int:doc_id>', methods=['DELETE'])
@@ -687,73 +2207,129 @@ def delete_document(doc_id):
     try:
         document = Document.query.get_or_404(doc_id)
         
-        # Optionally delete file from Supabase
-        filename = document.filename
-        delete_file_http(filename)
-        
+        # Its file is queued for the storage deletion worker in the same transaction
         db.session.delete(document)
         db.session.commit()
         return jsonify({'message': 'Document deleted successfully'})
         
     except Exception as e:
-        print(f"Delete document error: {e}")
+        log.exception('delete_document_error', doc_id=doc_id, error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+def send_snapshot(path, etag):
+    """Send a snapshot file, precompressed to suit the client's Accept-Encoding
+
+    Each content-coding is a different representation, so it gets its own
+    ETag (e.g. "videos-all-7.json-br"); a cache never answers a gzip
+    request with a revalidated brotli body.
+    """
+    file_path, encoding = snapshot_store.negotiate(path, request.accept_encodings)
+    if encoding:
+        etag = f"{etag}-{encoding}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = send_file(file_path, mimetype='application/json', conditional=False, etag=False)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        snapshot_store.count('served')
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/catalog/<collection>.json')
+def catalog_snapshot(collection):
+    """Every published video or document (?category=) as one precompressed JSON array
+
+    Only the namespace's revision row is read; the body comes from the
+    snapshot file. Content-Location names the immutable copy of this revision.
+    """
+    if collection not in SNAPSHOT_COLLECTIONS:
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        category = request.args.get('category') or None
+        revision, _ = namespace_revision(cache_namespace(collection, category))
+        path = snapshot_store.find(collection, category, revision)
+        if path is None:
+            revision, path, built = build_snapshot(collection, category)
+            if built:
+                snapshot_store.count('built_on_demand')
+        name = os.path.basename(path)
+        response = send_snapshot(path, f"{collection}-{name}")
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Content-Location'] = url_for('catalog_snapshot_file', collection=collection, name=name)
+        return response
+    except Exception as e:
+        log.exception('catalog_snapshot_error', collection=collection, error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/catalog/<collection>/<name>')
+def catalog_snapshot_file(collection, name):
+    """One revision of a snapshot; never changes, so it may be cached for a year"""
+    parsed = parse_snapshot_name(name)
+    if collection not in SNAPSHOT_COLLECTIONS or parsed is None:
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        path = snapshot_store.path(collection, name)
+        if not os.path.exists(path):
+            # Published by another dyno: rebuild it here if it is still the current revision
+            key, revision = parsed
+            model = SNAPSHOT_COLLECTIONS[collection][0]
+            categories = [None] + list(db.session.scalars(select(model.category).distinct()))
+            category = next((c for c in categories if snapshot_key(c) == key), None)
+            if category is None and key != snapshot_key(None):
+                return jsonify({'error': 'Not found'}), 404
+            built_revision, path, _ = build_snapshot(collection, category)
+            if built_revision != revision:
+                return jsonify({'error': 'Snapshot revision not available'}), 404
+        response = send_snapshot(path, f"{collection}-{name}")
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+    except Exception as e:
+        log.exception('catalog_snapshot_error', collection=collection, error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/documents')
 def public_documents():
-    """Public page to view documents"""
-    try:
-        documents = Document.query.filter_by(is_published=True).order_by(Document.created_at.desc()).all()
-        doc_list = ""
-        for doc in documents:
-            size_mb = round(doc.file_size / (1024*1024), 2) if doc.file_size else 0
-            # Add inline parameter to force viewing instead of downloading
-            view_url = f"{doc.file_url}?inline=true"
-            
-            doc_list += f'''
-            <div style="border: 1px solid #ddd; padding: 20px; margin: 15px 0; border-radius: 8px; background: white;">
-                <h3>
-                    <a href="{view_url}" target="_blank" style="color: #007cba; text-decoration: none; cursor: pointer;">
-                        📄 {doc.title}
-                    </a>
-                </h3>
-                <p style="color: #666; margin: 10px 0;">{doc.description or 'No description available'}</p>
-                <p style="color: #888; font-size: 14px;">
-                    Size: {size_mb if size_mb > 0 else 'Unknown'} MB | 
-                    Views: {doc.download_count} | 
-                    Added: {doc.created_at.strftime('%Y-%m-%d')}
-                </p>
-                <div style="margin-top: 15px;">
-                    <a href="{view_url}" target="_blank" 
-                       style="background: #007cba; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">
-                        Read More
-                    </a>
-                </div>
-            </div>
-            '''
-        
-        if not doc_list:
-            doc_list = "<p>No documents available.</p>"
-            
-        return f'''<!DOCTYPE html>
-        <html>
-        <head>
-            <title>Documents - Mehr Open Mind</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; max-width: 900px; margin: 0 auto; padding: 20px; background: #f5f5f5; }}
-                h1 {{ color: #333; text-align: center; }}
-            </style>
-        </head>
-        <body>
-            <h1>📋 Documents</h1>
-            <p style="text-align: center;"><a href="/" style="color: #007cba; text-decoration: none;">← Back to Home</a></p>
-            <hr>
-            {doc_list}
-        </body>
-        </html>'''
+    """Public page to view documents, one page of DOCUMENT_PAGE_FIELDS per request
+
+    The document listing is rendered once per page and category into the
+    response cache; the page around it is streamed from a template.
+    """
+    try:
+        category = request.args.get('category')
+        namespace = cache_namespace('documents', category)
+        key = 'html:' + '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        def render_listing():
+            where = [Document.is_published == True]
+            if category:
+                where.append(Document.category == category)
+            args = {'cursor': request.args.get('cursor'), 'limit': request.args.get('limit')}
+            documents, next_cursor = fetch_page(db.session, DOCUMENT_PAGE_FIELDS, DOCUMENT_ORDER, where, args)
+            page_args = {k: v for k, v in request.args.items() if k != 'cursor'}
+            first_page_url = url_for('public_documents', **page_args) if args['cursor'] else None
+            next_page_url = url_for('public_documents', **page_args, cursor=next_cursor) if next_cursor else None
+            return app.jinja_env.get_template('document_list.html').generate(
+                documents=documents, first_page_url=first_page_url, next_page_url=next_page_url
+            )
+        def respond(revision):
+            listing = response_cache.get_or_stream(namespace, revision, key, render_listing)
+            return Response(stream_template('documents.html', listing=listing, category=category),
+                            mimetype='text/html')
+        return conditional_get(namespace, respond)
+    except PaginationError as e:
+        return f"<h1>Invalid page</h1><p>{escape(str(e))}</p>", 400
     except Exception as e:
-        return f"<h1>Error loading documents</h1><p>{str(e)}</p>"
-@app.route('/download/<int:doc_id>')
+        return f"<h1>Error loading documents</h1><p>{escape(str(e))}</p>", 500
+
+def document_content_type(filename):
+    """Content type to view a document inline with, from its extension (None: use storage's)"""
+    filename = filename.lower()
+    if filename.endswith('.html') or filename.endswith('.htm'):
+        return 'text/html'
+    elif filename.endswith('.pdf'):
+        return 'application/pdf'
+    return None
 
 @app.route('/document/<int:doc_id>')
 def view_document(doc_id):
@@ -763,61 +2339,56 @@ def view_document(doc_id):
         if not document.is_published:
             return "Document not found", 404
         
-        # Fetch the file from Supabase
-        import requests
-        response = requests.get(document.file_url)
-        
-        if response.status_code != 200:
-            return "Document not available", 404
-        
-        # Determine content type based on file extension
-        filename = document.filename.lower()
-        if filename.endswith('.html') or filename.endswith('.htm'):
-            content_type = 'text/html'
-        elif filename.endswith('.pdf'):
-            content_type = 'application/pdf'
-        else:
-            content_type = response.headers.get('content-type', 'application/octet-stream')
-        
-        # Return with inline disposition
-        return Response(
-            response.content,
-            mimetype=content_type,
-            headers={
-                'Content-Disposition': f'inline; filename="{document.filename}"'
-            }
+        # Stream the file from the local cache or Supabase with inline disposition
+        response = cached_storage_file(
+            document.file_url,
+            document_content_type(document.filename),
+            headers={'Content-Disposition': f'inline; filename="{document.filename}"'}
         )
+        if response is None:
+            return "Document not available", 404
+        return response
     except Exception as e:
-        print(f"Error viewing document: {e}")
+        log.exception('view_document_error', error=str(e))
         return "Document not found", 404
 
 @app.route('/download/<int:doc_id>')
 def download_document(doc_id):
     """Handle document downloads and track download count"""
     try:
-        document = Document.query.get_or_404(doc_id)
+        document = db.session.execute(
+            select(Document.file_url, Document.is_published).where(Document.id == doc_id)
+        ).first()
         
-        if not document.is_published:
+        if not document or not document.is_published:
             return "Document not available", 404
         
-        # Increment download count
-        document.download_count += 1
-        db.session.commit()
+        # Counted in memory and written in batches, so clicks never wait on a row lock
+        download_counters.increment(Document.download_count, doc_id)
         
         # Redirect to the actual file URL in Supabase
         return redirect(document.file_url)
         
     except Exception as e:
-        print(f"Download document error: {e}")
+        log.exception('download_document_error', error=str(e))
         return jsonify({'error': str(e)}), 500
-# Initialize database
-with app.app_context():
-    try:
+def create_schema():
+    """Create missing tables and the search index (migrate.py; nothing runs at import)"""
+    global search_table_exists
+    with app.app_context():
         db.create_all()
         print("✅ Database ready")
-    except Exception as e:
-        print(f"❌ Database error: {e}")
+        with db.engine.begin() as conn:
+            search_index.ensure_schema(conn)
+        search_table_exists = True
+        print(f"✅ Search index ready ({search_index.name})")
 
 if __name__ == '__main__':
+    from add_job_heartbeat import add_job_heartbeat
+    create_schema()
+    with app.app_context():
+        add_job_heartbeat(db.engine)
+    # A single process: don't merge in snapshots left by an earlier run
+    metrics.clear()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
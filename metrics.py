@@ -0,0 +1,250 @@
+"""
+Prometheus metrics, aggregated across gunicorn workers
+
+Each process counts into its own in-memory registry (a dict update under a
+lock per sample; labels are sorted and stringified only when a snapshot is
+taken), and a thread writes a snapshot of it to
+METRICS_DIR/<pid>-<token>.json every METRICS_FLUSH_INTERVAL seconds. The
+/metrics route flushes the process serving it, then reads every snapshot
+in the directory and merges them: counters and histogram buckets are
+summed, so the totals cover all workers of the dyno, including workers
+gunicorn has since replaced (their last snapshot stays behind until
+gunicorn.conf.py clears the directory on the next master start).
+render() writes the text exposition format, version 0.0.4.
+
+    metrics.inc('storage_requests_total', operation='get', status='200')
+    metrics.observe('db_query_duration_seconds', 0.004, operation='select')
+    with metrics.timer('job_stage_duration_seconds', stage='thumbnail_decode'):
+        ...
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import bisect
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from logs import get_logger
+
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'app_metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+log = get_logger('metrics')
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by route, method and status', None),
+    'http_request_duration_seconds': ('histogram', 'Time to produce and send a response, streamed bodies included',
+                                      LATENCY_BUCKETS),
+    'http_request_bytes_total': ('counter', 'Request body bytes received', None),
+    'http_response_bytes_total': ('counter', 'Response body bytes sent (from Content-Length)', None),
+    'db_queries_total': ('counter', 'SQL statements executed', None),
+    'db_query_duration_seconds': ('histogram', 'SQL statement execution time', QUERY_BUCKETS),
+    'storage_requests_total': ('counter', 'Storage API calls by operation and status (each retry counts)', None),
+    'storage_request_duration_seconds': ('histogram', 'Storage API call time to response headers', LATENCY_BUCKETS),
+    'storage_bytes_sent_total': ('counter', 'Bytes uploaded to storage', None),
+    'storage_bytes_received_total': ('counter', 'Bytes downloaded from storage (from Content-Length)', None),
+    'jobs_total': ('counter', 'Background jobs finished by kind and status', None),
+    'job_duration_seconds': ('histogram', 'Background job run time', STAGE_BUCKETS),
+    'job_stage_duration_seconds': ('histogram', 'Time spent in thumbnail and PDF processing stages', STAGE_BUCKETS),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_snapshot_path = None
+_snapshot_pid = None
+_started_pid = None
+
+
+def _forget_parent_samples():
+    # A forked worker starts with the master's samples, which the master reports itself
+    global _lock
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+
+
+os.register_at_fork(after_in_child=_forget_parent_samples)
+
+
+def inc(name, amount=1, **labels):
+    key = (name, tuple(labels.items()))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    key = (name, tuple(labels.items()))
+    buckets = METRICS[name][2]
+    index = bisect.bisect_left(buckets, value)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+        series[0][index] += 1
+        series[1] += value
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the time spent in the with block (also when it raises)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels))
+
+
+def snapshot():
+    """This process's series, with the same labels passed in any order merged"""
+    with _lock:
+        counters = list(_counters.items())
+        histograms = [(key, (list(series[0]), series[1])) for key, series in _histograms.items()]
+    merged_counters, merged_histograms = {}, {}
+    for (name, labels), value in counters:
+        key = (name, _labels_key(labels))
+        merged_counters[key] = merged_counters.get(key, 0) + value
+    for (name, labels), (counts, total) in histograms:
+        key = (name, _labels_key(labels))
+        series = merged_histograms.setdefault(key, [[0] * len(counts), 0.0])
+        series[0] = [a + b for a, b in zip(series[0], counts)]
+        series[1] += total
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in merged_counters.items()],
+        'histograms': [[name, list(labels), series[0], series[1]]
+                       for (name, labels), series in merged_histograms.items()],
+    }
+
+
+def flush():
+    """Write this process's snapshot where render() finds it"""
+    global _snapshot_path, _snapshot_pid
+    if _snapshot_pid != os.getpid():
+        _snapshot_pid = os.getpid()
+        _snapshot_path = os.path.join(METRICS_DIR, f"{_snapshot_pid}-{uuid.uuid4().hex[:8]}.json")
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    temp_path = f"{_snapshot_path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(temp_path, _snapshot_path)
+
+
+def start():
+    """Start this process's flush thread once (safe to call per request)"""
+    global _started_pid
+    if _started_pid == os.getpid():
+        return
+    with _lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+    atexit.register(_flush_quietly)
+    if METRICS_FLUSH_INTERVAL > 0:
+        threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        _flush_quietly()
+
+
+def _flush_quietly():
+    try:
+        flush()
+    except OSError as e:
+        log.exception('metrics_flush_failed', error=str(e))
+
+
+def clear():
+    """Remove every process's snapshot (gunicorn.conf.py, when the master starts)"""
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name.endswith('.json') or name.endswith('.tmp'):
+            try:
+                os.unlink(os.path.join(METRICS_DIR, name))
+            except OSError:
+                pass
+
+
+def collect():
+    """Counters and histograms summed over every snapshot in METRICS_DIR"""
+    counters, histograms = {}, {}
+    try:
+        names = [name for name in os.listdir(METRICS_DIR) if name.endswith('.json')]
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric, labels, value in data['counters']:
+            key = (metric, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for metric, labels, buckets, total in data['histograms']:
+            key = (metric, tuple(map(tuple, labels)))
+            series = histograms.setdefault(key, [[0] * len(buckets), 0.0])
+            series[0] = [a + b for a, b in zip(series[0], buckets)]
+            series[1] += total
+    return counters, histograms, len(names)
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All workers' metrics in the Prometheus text exposition format"""
+    counters, histograms, snapshots = collect()
+    lines = [
+        '# HELP app_metrics_snapshots Process snapshots merged into these metrics (running and replaced workers)',
+        '# TYPE app_metrics_snapshots gauge',
+        f'app_metrics_snapshots {snapshots}',
+    ]
+    for name, (kind, help_text, buckets) in METRICS.items():
+        if kind == 'counter':
+            series = sorted((labels, value) for (metric, labels), value in counters.items() if metric == name)
+        else:
+            series = sorted((labels, value) for (metric, labels), value in histograms.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Create the database schema: missing tables, new columns and the search index
+
+main.py does no database work while it is imported, so this runs once per
+deploy instead of in every worker (the Procfile's release phase runs it on
+Heroku) and after pulling model changes locally; `python main.py` runs it
+before serving. Safe to run more than once. Changes to existing tables
+have their own scripts (add_content_indexes.py, ...); the ones every
+deploy needs are run from here.
+"""
+import sys
+
+def migrate():
+    from main import app, db, create_schema
+    from add_job_heartbeat import add_job_heartbeat
+
+    try:
+        create_schema()
+        with app.app_context():
+            add_job_heartbeat(db.engine)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(migrate())
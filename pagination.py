@@ -0,0 +1,103 @@
+"""
+Keyset pagination and column projection for list endpoints
+
+A listing is described by its output fields, each naming the columns it
+needs, and a descending sort key that ends in the primary key, e.g.
+(order_index, id). Pages are fetched with a row-value comparison against
+the last row of the previous page instead of OFFSET, so every page costs
+the same however deep it is, and only the columns behind the requested
+fields are selected and serialized (see serializers.py).
+
+    GET /api/videos?limit=50&fields=id,title,thumbnail_url
+    -> JSON array, plus X-Next-Cursor / Link: rel="next" while more rows exist
+"""
+
+import os
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import select, tuple_, DateTime
+
+from serializers import Serializer
+
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+
+class PaginationError(ValueError):
+    """Bad limit, cursor or fields parameter (reported as 400)"""
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor_value(column, value):
+    """A cursor value as the column's Python type (cursors come from clients, so check them)"""
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, str):
+            raise ValueError(f'{column.key} must be a date')
+        return datetime.fromisoformat(value)
+    expected = column.type.python_type
+    if not isinstance(value, expected) or isinstance(value, bool):
+        raise ValueError(f'{column.key} must be {expected.__name__}')
+    return value
+
+
+def decode_cursor(cursor, order):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(order):
+            raise ValueError('wrong length')
+        return [decode_cursor_value(c, v) for c, v in zip(order, values)]
+    except (ValueError, TypeError, NotImplementedError) as e:
+        raise PaginationError(f"Invalid cursor: {e}")
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(value, fields):
+    """Requested field names in order, defaulting to every field"""
+    if not value:
+        return list(fields)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)} (available: {', '.join(fields)})")
+    return names
+
+
+def fetch_page(session, fields, order, where, args):
+    """One page of a listing as (items, next_cursor)
+
+    fields maps output names to Field; order is the descending sort key
+    (unique overall, so it must end in the primary key); where is a list
+    of filter expressions; args is the request's query args.
+    """
+    serializer = Serializer(fields, parse_fields(args.get('fields'), fields))
+    limit = parse_limit(args.get('limit'))
+
+    statement = select(*serializer.select_columns(extra=order)).where(*where)
+    if args.get('cursor'):
+        statement = statement.where(tuple_(*order) < tuple_(*decode_cursor(args['cursor'], order)))
+    statement = statement.order_by(*(c.desc() for c in order)).limit(limit + 1)
+
+    rows = session.execute(statement).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in order])
+    return serializer.rows(rows), next_cursor
@@ -0,0 +1,30 @@
+"""
+PDF text extraction
+
+Runs inside the job queue's process pool, so it only imports PyPDF2 and
+works on a path to the PDF on local disk. A document is split into page
+ranges that are extracted in parallel; each worker opens the file itself
+and returns one string per page, and the caller joins them once.
+"""
+
+import os
+
+PDF_PAGES_PER_TASK = int(os.environ.get('PDF_PAGES_PER_TASK', 10))
+
+
+def page_count(pdf_path):
+    import PyPDF2
+
+    return len(PyPDF2.PdfReader(pdf_path).pages)
+
+
+def extract_pages(pdf_path, start, stop):
+    """Text of pages [start, stop), one string per page"""
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(pdf_path)
+    return [reader.pages[number].extract_text() or '' for number in range(start, stop)]
+
+
+def page_ranges(count, pages_per_task=PDF_PAGES_PER_TASK):
+    return [(start, min(count, start + pages_per_task)) for start in range(0, count, pages_per_task)]
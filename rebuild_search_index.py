@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Rebuild the full-text search index from the text_content and document tables
+
+Run once after deploying search (or after changing SEARCH_LANGUAGE); new
+and edited content is indexed as it is saved.
+"""
+from sqlalchemy import text
+from search import create_search_index, SOURCES
+
+def rebuild_search_index():
+    # The app's database, whether DATABASE_URL points at PostgreSQL or not (SQLite)
+    from main import app, db
+    with app.app_context():
+        engine = db.engine
+    search_index = create_search_index(engine.dialect.name)
+    
+    print(f"Rebuilding search index ({search_index.name})...")
+    
+    try:
+        with engine.begin() as conn:
+            search_index.ensure_schema(conn)
+            search_index.rebuild(conn)
+            for kind, (table, *_) in SOURCES.items():
+                count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                print(f"✅ Indexed {count} rows from {table}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+if __name__ == '__main__':
+    rebuild_search_index()
@@ -0,0 +1,249 @@
+"""
+Response cache for read-mostly API endpoints
+
+Entries live in a namespace (e.g. "videos:Culture") and are found by a key
+within it (usually the query string) at a revision: the namespace's
+ContentRevision, which the writing transaction bumps in the database (see
+main.py). The caller reads the revision and passes it in, so a write made on
+any dyno is seen by every cache at once and the body always belongs to the
+revision its ETag names. Nothing is ever invalidated; entries of older
+revisions simply stop matching and age out through TTL/LRU eviction.
+
+Backends:
+    MemoryBackend  - per-process OrderedDict LRU with TTL
+    SQLiteBackend  - one SQLite file shared by all gunicorn workers on the host
+    TieredBackend  - memory in front of SQLite
+"""
+
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+
+from logs import get_logger
+
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'tiered')
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+RESPONSE_CACHE_PATH = os.environ.get(
+    'RESPONSE_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'response_cache.sqlite3')
+)
+
+log = get_logger('response_cache')
+
+
+class MemoryBackend:
+    name = 'memory'
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def size(self):
+        return len(self.entries)
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    # Refresh an entry's LRU timestamp at most this often, to keep hits read-only
+    TOUCH_INTERVAL = 10
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.initialized_pid = None
+
+    def connection(self):
+        """One connection per thread and process (sqlite3 connections cannot be shared)"""
+        pid = os.getpid()
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != pid:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if self.initialized_pid != pid:
+                conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                             'key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)')
+                conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+                self.initialized_pid = pid
+            self.local.conn, self.local.pid = conn, pid
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self.connection()
+        row = conn.execute('SELECT value, expires_at, accessed_at FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        if expires_at < now:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            return None
+        if now - accessed_at > self.TOUCH_INTERVAL:
+            conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return value
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        conn = self.connection()
+        conn.execute('INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                     (key, value, now + ttl, now))
+        # Evict expired entries, then the least recently used beyond the cap
+        conn.execute('DELETE FROM entries WHERE expires_at < ?', (now,))
+        conn.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at DESC '
+                     'LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def clear(self):
+        self.connection().execute('DELETE FROM entries')
+
+    def size(self):
+        return self.connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+class TieredBackend:
+    name = 'tiered'
+
+    def __init__(self, local=None, shared=None):
+        self.local = local or MemoryBackend()
+        self.shared = shared or SQLiteBackend()
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value, 'local'
+        value = self.shared.get(key)
+        if value is not None:
+            self.local.set(key, value, RESPONSE_CACHE_TTL)
+            return value, 'shared'
+        return None
+
+    def set(self, key, value, ttl):
+        self.local.set(key, value, ttl)
+        self.shared.set(key, value, ttl)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def size(self):
+        return self.local.size()
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sqlite': SQLiteBackend,
+    'tiered': TieredBackend,
+}
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl=RESPONSE_CACHE_TTL):
+        self.backend = backend or BACKENDS[RESPONSE_CACHE_BACKEND]()
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.counters = {'hits_local': 0, 'hits_shared': 0, 'misses': 0, 'errors': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def get_or_set(self, namespace, revision, key, compute):
+        """Cached value for key in namespace at revision, computing and storing it on a miss"""
+        full_key, found = self.lookup(namespace, revision, key)
+        if found is not None:
+            return found
+        value = compute()
+        self.store(full_key, value)
+        return value
+
+    def get_or_stream(self, namespace, revision, key, generate):
+        """Iterable of the cached value for key, or of generate()'s chunks on a miss
+
+        generate() is called right away (so it can run its queries and raise
+        before a response starts) and returns an iterator of str chunks.
+        They are passed through as they are produced and their concatenation
+        is stored once the iterator is exhausted; an abandoned stream stores
+        nothing.
+        """
+        full_key, found = self.lookup(namespace, revision, key)
+        if found is not None:
+            return [found]
+        chunks = generate()
+        if full_key is None:
+            return chunks
+        def tee():
+            produced = []
+            for chunk in chunks:
+                produced.append(chunk)
+                yield chunk
+            self.store(full_key, ''.join(produced))
+        return tee()
+
+    def lookup(self, namespace, revision, key):
+        """(full key, cached value or None); the full key is None if the backend failed"""
+        full_key = f"{namespace}@{revision}:{key}"
+        try:
+            found = self.backend.get(full_key)
+        except sqlite3.Error as e:
+            log.exception('response_cache_error', backend=self.backend.name, error=str(e))
+            self.count('errors')
+            return None, None
+
+        if found is None:
+            self.count('misses')
+            return full_key, None
+        if isinstance(found, tuple):
+            found, tier = found
+        else:
+            tier = 'local' if self.backend.name == 'memory' else 'shared'
+        self.count(f'hits_{tier}')
+        return full_key, found
+
+    def store(self, full_key, value):
+        if full_key is None:
+            return
+        try:
+            self.backend.set(full_key, value, self.ttl)
+        except sqlite3.Error as e:
+            log.exception('response_cache_error', backend=self.backend.name, error=str(e))
+            self.count('errors')
+
+    def clear(self):
+        """Drop every entry on this host (benchmarks time cold builds with it)"""
+        self.backend.clear()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = stats['hits_local'] + stats['hits_shared'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits_local'] + stats['hits_shared']) / lookups, 4) if lookups else None
+        stats['backend'] = self.backend.name
+        stats['ttl'] = self.ttl
+        return stats
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Resumable, parallel uploads to Supabase Storage over the TUS protocol
+
+The file is split into fixed-size parts. When the server supports the TUS
+concatenation extension every part is a partial upload sent from a bounded
+thread pool, and one final request stitches them into the object. Otherwise
+the parts are PATCHed in order into a single upload. Either way the progress
+is persisted to a small JSON state file after every part, so an interrupted
+upload of the same content resumes from the server-reported offsets instead
+of starting over. State is found by content_key (the SHA-256 of the file,
+when the caller has it) rather than the object name, so a retried upload
+resumes even under a new name; it then finishes under the name its parts
+were created with (upload.object_name). State files left by failed uploads
+are removed after RESUMABLE_STATE_TTL seconds.
+
+    python resumable_upload.py big_video.mp4 big_video.mp4
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import hashlib
+import tempfile
+import threading
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import metrics
+
+TUS_VERSION = '1.0.0'
+# Supabase requires every part except the last to be exactly 6MB
+RESUMABLE_PART_SIZE = int(os.environ.get('RESUMABLE_PART_SIZE', 6 * 1024 * 1024))
+RESUMABLE_WORKERS = int(os.environ.get('RESUMABLE_WORKERS', 4))
+RESUMABLE_MAX_RETRIES = int(os.environ.get('RESUMABLE_MAX_RETRIES', 5))
+RESUMABLE_STATE_DIR = os.environ.get(
+    'RESUMABLE_STATE_DIR', os.path.join(tempfile.gettempdir(), 'resumable_uploads')
+)
+# Supabase expires unfinished TUS uploads after a day, so older state is useless
+RESUMABLE_STATE_TTL = int(os.environ.get('RESUMABLE_STATE_TTL', 24 * 3600))
+
+
+class ResumableUploadError(Exception):
+    pass
+
+
+def prune_state(state_dir, ttl=RESUMABLE_STATE_TTL):
+    """Remove state files of uploads abandoned more than ttl seconds ago"""
+    cutoff = time.time() - ttl
+    try:
+        names = os.listdir(state_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(state_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+        except OSError:
+            pass
+
+
+def encode_metadata(metadata):
+    """Encode a dict as a TUS Upload-Metadata header"""
+    return ','.join(
+        f"{key} {base64.b64encode(str(value).encode()).decode()}"
+        for key, value in metadata.items() if value is not None
+    )
+
+
+class ResumableUpload:
+    def __init__(self, base_url, api_key, bucket, object_name, fileobj, content_type,
+                 part_size=RESUMABLE_PART_SIZE, workers=RESUMABLE_WORKERS,
+                 max_retries=RESUMABLE_MAX_RETRIES, state_dir=RESUMABLE_STATE_DIR,
+                 cache_control=None, session=None, content_key=None):
+        self.endpoint = f"{base_url}/storage/v1/upload/resumable"
+        self.api_key = api_key
+        self.bucket = bucket
+        self.object_name = object_name
+        self.fileobj = fileobj
+        self.content_type = content_type
+        self.part_size = part_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.cache_control = cache_control
+        self.session = session or requests
+        self.size = os.fstat(fileobj.fileno()).st_size
+
+        identity = content_key or object_name
+        key = hashlib.sha256(f"{bucket}/{identity}:{self.size}:{part_size}".encode()).hexdigest()[:32]
+        os.makedirs(state_dir, exist_ok=True)
+        prune_state(state_dir)
+        self.state_path = os.path.join(state_dir, f"{key}.json")
+        self.state_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.retries = 0
+        self.resumed_parts = 0
+
+    # State persistence
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, record=None, **fields):
+        """Apply fields to record (a dict inside the state) and persist atomically"""
+        with self.state_lock:
+            if record is not None:
+                record.update(fields)
+            temp_path = f"{self.state_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(temp_path, self.state_path)
+
+    def clear_state(self):
+        try:
+            os.unlink(self.state_path)
+        except FileNotFoundError:
+            pass
+
+    # Protocol helpers
+
+    def headers(self, **extra):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Tus-Resumable": TUS_VERSION,
+            "x-upsert": "true"
+        }
+        headers.update(extra)
+        return headers
+
+    def metadata(self):
+        return encode_metadata({
+            'bucketName': self.bucket,
+            'objectName': self.object_name,
+            'contentType': self.content_type,
+            'cacheControl': self.cache_control
+        })
+
+    def supports_concatenation(self):
+        response = self.session.options(self.endpoint, headers=self.headers(), timeout=30)
+        extensions = response.headers.get('Tus-Extension', '')
+        return 'concatenation' in [e.strip() for e in extensions.split(',')]
+
+    def create(self, length, concat=None):
+        headers = self.headers(**{'Upload-Length': str(length), 'Upload-Metadata': self.metadata()})
+        if concat:
+            headers['Upload-Concat'] = concat
+        response = self.session.post(self.endpoint, headers=headers, timeout=30)
+        if response.status_code not in (200, 201):
+            raise ResumableUploadError(f"create failed: {response.status_code} {response.text}")
+        return response.headers['Location']
+
+    def concatenate(self, part_urls):
+        """Create the final upload from finished partial uploads; returns its URL
+
+        A final upload's length is the sum of its parts, and the
+        concatenation extension forbids sending Upload-Length with it.
+        """
+        headers = self.headers(**{
+            'Upload-Concat': 'final;' + ' '.join(part_urls),
+            'Upload-Metadata': self.metadata()
+        })
+        response = self.session.post(self.endpoint, headers=headers, timeout=30)
+        if response.status_code not in (200, 201):
+            raise ResumableUploadError(f"concatenate failed: {response.status_code} {response.text}")
+        return response.headers['Location']
+
+    def server_offset(self, upload_url):
+        """Bytes the server already holds for upload_url, or None if it is gone"""
+        response = self.session.head(upload_url, headers=self.headers(), timeout=30)
+        if response.status_code in (404, 410):
+            return None
+        if response.status_code != 200:
+            raise ResumableUploadError(f"offset check failed: {response.status_code}")
+        return int(response.headers['Upload-Offset'])
+
+    def patch(self, upload_url, offset, data):
+        headers = self.headers(**{
+            'Upload-Offset': str(offset),
+            'Content-Type': 'application/offset+octet-stream'
+        })
+        started = time.perf_counter()
+        try:
+            response = self.session.patch(upload_url, data=data, headers=headers, timeout=300)
+        except requests.RequestException:
+            metrics.inc('storage_requests_total', operation='upload_part', status='error')
+            raise
+        finally:
+            metrics.observe('storage_request_duration_seconds', time.perf_counter() - started, operation='upload_part')
+        metrics.inc('storage_requests_total', operation='upload_part', status=response.status_code)
+        metrics.inc('storage_bytes_sent_total', len(data), operation='upload_part')
+        if response.status_code not in (200, 204):
+            raise ResumableUploadError(f"patch failed: {response.status_code} {response.text}")
+        return int(response.headers['Upload-Offset'])
+
+    def read(self, offset, length):
+        return os.pread(self.fileobj.fileno(), length, offset)
+
+    def with_retries(self, operation):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return operation()
+            except (requests.RequestException, ResumableUploadError):
+                if attempt == self.max_retries:
+                    raise
+                with self.stats_lock:
+                    self.retries += 1
+                time.sleep(min(30, 2 ** attempt) * random.uniform(0.5, 1.0))
+
+    # Transfer modes
+
+    def send_range(self, record, start, length, concat=None):
+        """Bring one TUS upload (described by record) up to length bytes"""
+        if record.get('done'):
+            with self.stats_lock:
+                self.resumed_parts += 1
+
+        def attempt():
+            offset = None
+            if record.get('url'):
+                offset = self.server_offset(record['url'])
+            if offset is None:
+                self.save_state(record, url=self.create(length, concat), done=0)
+                offset = 0
+            while offset < length:
+                chunk = self.read(start + offset, min(self.part_size, length - offset))
+                offset = self.patch(record['url'], offset, chunk)
+                self.save_state(record, done=offset)
+            self.save_state(record, complete=True)
+        self.with_retries(attempt)
+
+    def upload_parallel(self):
+        parts = self.state.setdefault('parts', [])
+        if not parts:
+            for start in range(0, self.size, self.part_size):
+                parts.append({'start': start, 'length': min(self.part_size, self.size - start)})
+            self.save_state()
+
+        pending = [part for part in parts if not part.get('complete')]
+        self.resumed_parts += len(parts) - len(pending)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(self.send_range, part, part['start'], part['length'], 'partial')
+                for part in pending
+            ]
+            for future in futures:
+                future.result()
+
+        def commit():
+            # Once the final upload is recorded, retries and resumed runs only check it. If
+            # the response itself was lost, the repeat concatenates the same parts into the
+            # same object (x-upsert), so the result is unchanged.
+            final_url = self.state.get('final')
+            if final_url and self.server_offset(final_url) == self.size:
+                return
+            self.save_state(self.state, final=self.concatenate([part['url'] for part in parts]))
+        self.with_retries(commit)
+
+    def upload_sequential(self):
+        record = self.state.setdefault('upload', {})
+        self.send_range(record, 0, self.size)
+
+    def run(self):
+        """Upload the file, resuming saved progress; returns transfer stats"""
+        started = time.monotonic()
+        self.state = self.load_state()
+        # Parts already created carry the name of the upload that created them
+        self.object_name = self.state.setdefault('object_name', self.object_name)
+        mode = self.state.get('mode')
+        if mode is None:
+            mode = 'parallel' if self.size > self.part_size and self.supports_concatenation() else 'sequential'
+            self.state['mode'] = mode
+            self.save_state()
+
+        if mode == 'parallel':
+            self.upload_parallel()
+        else:
+            self.upload_sequential()
+        self.clear_state()
+
+        seconds = time.monotonic() - started
+        return {
+            'mode': mode,
+            'object_name': self.object_name,
+            'bytes': self.size,
+            'parts': max(1, -(-self.size // self.part_size)),
+            'resumed_parts': self.resumed_parts,
+            'retries': self.retries,
+            'seconds': round(seconds, 3),
+            'throughput_mb_s': round(self.size / (1024 * 1024) / seconds, 2) if seconds else None
+        }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python resumable_upload.py <local file> <object name>")
+        sys.exit(1)
+    path, object_name = sys.argv[1], sys.argv[2]
+    with open(path, 'rb') as f:
+        upload = ResumableUpload(
+            os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'],
+            os.environ.get('SUPABASE_BUCKET', 'videos'), object_name, f,
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        print(json.dumps(upload.run(), indent=2))
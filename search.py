@@ -0,0 +1,234 @@
+"""
+Full-text search over articles (TextContent) and documents
+
+The index is a separate table with one entry per searchable row, holding a
+title, a summary (excerpt/description) and a body (article text, or the
+document's filename), weighted in that order:
+
+    PostgreSQL - search_entry with a generated, weighted tsvector column and
+                 a GIN index; websearch_to_tsquery, ts_rank_cd, ts_headline
+    SQLite     - an FTS5 virtual table (search_index); bm25() and snippet()
+
+Entries are written in the same transaction as the content change (see
+update_search_index in main.py), and rebuild() repopulates the index from
+the content tables in SQL (rebuild_search_index.py).
+
+Snippets are returned as HTML: the matched text is escaped and only the
+highlights are markup (<mark>), so article bodies can't inject any.
+"""
+
+import os
+import re
+
+from markupsafe import escape
+from sqlalchemy import text, inspect
+
+# Text search configuration on PostgreSQL; 'simple' does no stemming, which
+# suits mixed-language content. Changing it requires rebuild_search_index.py.
+SEARCH_LANGUAGE = os.environ.get('SEARCH_LANGUAGE', 'simple')
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 50))
+
+# kind -> (table, category column, title, summary, body columns)
+SOURCES = {
+    'text': ('text_content', None, 'title', 'excerpt', 'content'),
+    'document': ('document', 'category', 'title', 'description', 'filename'),
+}
+# SQLite rowid = ref_id * ROWID_STRIDE + kind code, so an entry is found by rowid
+KIND_CODES = {'text': 0, 'document': 1}
+ROWID_STRIDE = 16
+
+# The database marks highlights with private-use characters; they become
+# <mark> tags only after the snippet text has been escaped (see result_to_dict)
+SNIPPET_START = '\ue000'
+SNIPPET_END = '\ue001'
+
+
+class SearchError(ValueError):
+    """Unusable query or filter (reported as 400)"""
+
+
+def entry_values(kind, obj):
+    """Index fields of a TextContent/Document object (or any row with the same attributes)"""
+    _, category, title, summary, body = SOURCES[kind]
+    return {
+        'category': getattr(obj, category) if category else None,
+        'published': bool(obj.is_published),
+        'title': getattr(obj, title) or '',
+        'summary': getattr(obj, summary) or '',
+        'body': getattr(obj, body) or '',
+    }
+
+
+def index_exists(index, conn):
+    """Whether ensure_schema() has created the index table"""
+    return inspect(conn).has_table(index.table)
+
+
+def indexed_attributes(kind):
+    _, category, title, summary, body = SOURCES[kind]
+    return {name for name in (category, title, summary, body, 'is_published') if name}
+
+
+class PostgresSearchIndex:
+    name = 'postgresql'
+    table = 'search_entry'
+
+    def __init__(self, language=SEARCH_LANGUAGE):
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_.]*', language):
+            raise ValueError(f"Invalid SEARCH_LANGUAGE: {language}")
+        self.config = f"'{language}'::regconfig"
+
+    def ensure_schema(self, conn):
+        config = self.config
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS search_entry (
+                kind VARCHAR(20) NOT NULL,
+                ref_id INTEGER NOT NULL,
+                category VARCHAR(100),
+                published BOOLEAN NOT NULL DEFAULT TRUE,
+                title TEXT NOT NULL DEFAULT '',
+                summary TEXT NOT NULL DEFAULT '',
+                body TEXT NOT NULL DEFAULT '',
+                tsv TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector({config}, title), 'A') ||
+                    setweight(to_tsvector({config}, summary), 'B') ||
+                    setweight(to_tsvector({config}, body), 'C')
+                ) STORED,
+                PRIMARY KEY (kind, ref_id)
+            )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_search_entry_tsv ON search_entry USING GIN (tsv)"))
+
+    def upsert(self, conn, kind, ref_id, values):
+        conn.execute(text("""
+            INSERT INTO search_entry (kind, ref_id, category, published, title, summary, body)
+            VALUES (:kind, :ref_id, :category, :published, :title, :summary, :body)
+            ON CONFLICT (kind, ref_id) DO UPDATE SET
+                category = EXCLUDED.category, published = EXCLUDED.published,
+                title = EXCLUDED.title, summary = EXCLUDED.summary, body = EXCLUDED.body
+        """), {'kind': kind, 'ref_id': ref_id, **values})
+
+    def delete(self, conn, kind, ref_id):
+        conn.execute(text("DELETE FROM search_entry WHERE kind = :kind AND ref_id = :ref_id"),
+                     {'kind': kind, 'ref_id': ref_id})
+
+    def search(self, conn, query, kinds, category, limit, offset):
+        # Headlines are expensive, so they are only built for the page being returned
+        rows = conn.execute(text(f"""
+            SELECT page.kind, page.ref_id, page.category, page.title, page.summary, page.rank,
+                   ts_headline({self.config}, concat_ws(' ', page.summary, page.body), page.query,
+                               'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords=30, MinWords=12, MaxFragments=2')
+            FROM (
+                SELECT e.kind, e.ref_id, e.category, e.title, e.summary, e.body, q.query,
+                       ts_rank_cd(e.tsv, q.query) AS rank
+                FROM search_entry e, websearch_to_tsquery({self.config}, :query) AS q(query)
+                WHERE e.tsv @@ q.query AND e.published
+                  AND e.kind = ANY(:kinds)
+                  AND (CAST(:category AS VARCHAR) IS NULL OR e.category = :category)
+                ORDER BY rank DESC, e.ref_id DESC
+                LIMIT :limit OFFSET :offset
+            ) AS page
+            ORDER BY page.rank DESC, page.ref_id DESC
+        """), {'query': query, 'kinds': list(kinds), 'category': category, 'limit': limit, 'offset': offset})
+        return rows.all()
+
+    def rebuild(self, conn):
+        conn.execute(text("DELETE FROM search_entry"))
+        for kind, (table, category, title, summary, body) in SOURCES.items():
+            conn.execute(text(f"""
+                INSERT INTO search_entry (kind, ref_id, category, published, title, summary, body)
+                SELECT '{kind}', id, {category or 'NULL'}, COALESCE(is_published, FALSE),
+                       COALESCE({title}, ''), COALESCE({summary}, ''), COALESCE({body}, '')
+                FROM {table}
+            """))
+        conn.execute(text("ANALYZE search_entry"))
+
+
+class SQLiteSearchIndex:
+    name = 'sqlite'
+    table = 'search_index'
+
+    def ensure_schema(self, conn):
+        conn.execute(text("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                title, summary, body,
+                kind UNINDEXED, ref_id UNINDEXED, category UNINDEXED, published UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """))
+
+    def upsert(self, conn, kind, ref_id, values):
+        rowid = ref_id * ROWID_STRIDE + KIND_CODES[kind]
+        conn.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': rowid})
+        conn.execute(text("""
+            INSERT INTO search_index (rowid, title, summary, body, kind, ref_id, category, published)
+            VALUES (:rowid, :title, :summary, :body, :kind, :ref_id, :category, :published)
+        """), {'rowid': rowid, 'kind': kind, 'ref_id': ref_id, **values})
+
+    def delete(self, conn, kind, ref_id):
+        conn.execute(text("DELETE FROM search_index WHERE rowid = :rowid"),
+                     {'rowid': ref_id * ROWID_STRIDE + KIND_CODES[kind]})
+
+    @staticmethod
+    def match_expression(query):
+        """FTS5 query matching every word of the input, the last one as a prefix"""
+        words = re.findall(r'\w+', query)
+        if not words:
+            raise SearchError('Query has no searchable words')
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, conn, query, kinds, category, limit, offset):
+        kind_params = {f'kind{i}': kind for i, kind in enumerate(kinds)}
+        # bm25() is lower for better matches; column weights favour title, then summary
+        rows = conn.execute(text(f"""
+            SELECT kind, ref_id, category, title, summary,
+                   -bm25(search_index, 10.0, 4.0, 1.0) AS rank,
+                   snippet(search_index, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16)
+            FROM search_index
+            WHERE search_index MATCH :match AND published = 1
+              AND kind IN ({', '.join(':' + name for name in kind_params)})
+              {'AND category = :category' if category else ''}
+            ORDER BY rank DESC, ref_id DESC
+            LIMIT :limit OFFSET :offset
+        """), {'match': self.match_expression(query), 'category': category,
+               'limit': limit, 'offset': offset, **kind_params})
+        return rows.all()
+
+    def rebuild(self, conn):
+        conn.execute(text("DELETE FROM search_index"))
+        for kind, (table, category, title, summary, body) in SOURCES.items():
+            conn.execute(text(f"""
+                INSERT INTO search_index (rowid, title, summary, body, kind, ref_id, category, published)
+                SELECT id * {ROWID_STRIDE} + {KIND_CODES[kind]}, COALESCE({title}, ''), COALESCE({summary}, ''),
+                       COALESCE({body}, ''), '{kind}', id, {category or 'NULL'}, COALESCE(is_published, 0)
+                FROM {table}
+            """))
+        conn.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+
+
+def create_search_index(dialect_name):
+    if dialect_name == 'postgresql':
+        return PostgresSearchIndex()
+    return SQLiteSearchIndex()
+
+
+def snippet_html(snippet):
+    if snippet is None:
+        return None
+    html = str(escape(snippet))
+    return html.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+
+
+def result_to_dict(row):
+    kind, ref_id, category, title, summary, rank, snippet = row
+    return {
+        'type': kind,
+        'id': ref_id,
+        'title': title,
+        'summary': summary,
+        'category': category,
+        'snippet': snippet_html(snippet),
+        'rank': float(f"{rank:.4g}"),
+    }
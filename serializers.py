@@ -0,0 +1,139 @@
+"""
+Serialization of query rows and JSON encoding for the API
+
+Each listing is declared once as output fields (see main.py): a Field names
+the columns it needs and, for computed values, how to render them from a
+row. Serializer turns the rows of a Core query selecting those columns into
+dicts without loading ORM objects: plain column fields are copied by
+position with one itemgetter call per row, and only converted or computed
+fields run Python code (and come after the plain ones in each dict).
+Datetimes are left to the encoder.
+
+dumps() encodes with orjson when it is installed and with the standard
+json module otherwise; both produce compact UTF-8 and write datetimes as
+ISO 8601. iter_json_array() encodes a long sequence a batch at a time, so a
+large array can be written out without building the whole document.
+"""
+
+import json
+import uuid
+from decimal import Decimal
+from datetime import date
+from operator import itemgetter
+from collections import namedtuple
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Items encoded per chunk by iter_json_array()
+JSON_ARRAY_BATCH = 500
+
+# render(row) computes a value from the row's columns; column fields have
+# render None and an optional convert(value) instead
+Field = namedtuple('Field', ['columns', 'render', 'convert'], defaults=(None,))
+
+
+def column(attribute, convert=None):
+    """Field backed by one column, optionally transformed by convert(value)"""
+    return Field((attribute,), None, convert)
+
+
+class Serializer:
+    def __init__(self, fields, names=None):
+        """names selects fields (in output order); defaults to all of them"""
+        self.names = list(names or fields)
+        self.columns = {}
+        for name in self.names:
+            for c in fields[name].columns:
+                self.columns.setdefault(c.key, c)
+        positions = {key: i for i, key in enumerate(self.columns)}
+        plain = [name for name in self.names if fields[name].render is None and fields[name].convert is None]
+        self.plain_names = plain
+        self.plain_getter = itemgetter(*[positions[fields[name].columns[0].key] for name in plain]) if plain else None
+        self.converted = [(name, positions[fields[name].columns[0].key], fields[name].convert)
+                          for name in self.names if fields[name].render is None and fields[name].convert]
+        self.computed = [(name, fields[name].render) for name in self.names if fields[name].render]
+        self.single_plain = len(plain) == 1
+
+    def select_columns(self, extra=()):
+        """Labeled columns to select: the fields' columns first, then any extra ones (e.g. sort keys)"""
+        columns = dict(self.columns)
+        for c in extra:
+            columns.setdefault(c.key, c)
+        return [c.label(key) for key, c in columns.items()]
+
+    def row(self, row):
+        if self.plain_getter is None:
+            item = {}
+        elif self.single_plain:
+            item = {self.plain_names[0]: self.plain_getter(row)}
+        else:
+            item = dict(zip(self.plain_names, self.plain_getter(row)))
+        for name, position, convert in self.converted:
+            item[name] = convert(row[position])
+        for name, render in self.computed:
+            item[name] = render(row)
+        return item
+
+    def rows(self, rows):
+        return [self.row(row) for row in rows]
+
+
+def default(value):
+    """Values neither encoder handles natively"""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj, indent=False):
+    """Compact (or indented) UTF-8 JSON bytes"""
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=default, option=option)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=default).encode()
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=default).encode()
+
+
+def loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def iter_json_array(items, batch=JSON_ARRAY_BATCH):
+    """Encode an iterable as one JSON array, yielding bytes a batch of items at a time"""
+    yield b'['
+    first = True
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= batch:
+            yield (b'' if first else b',') + dumps(chunk)[1:-1]
+            first = False
+            chunk = []
+    if chunk:
+        yield (b'' if first else b',') + dumps(chunk)[1:-1]
+    yield b']'
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider (jsonify, request.get_json) backed by dumps()/loads()"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, indent=bool(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = dumps(obj, indent=self._app.debug) + b'\n'
+        return self._app.response_class(body, mimetype='application/json')
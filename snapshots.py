@@ -0,0 +1,190 @@
+"""
+Precompressed JSON snapshots of the public catalog
+
+A snapshot is the whole published listing of one collection and category
+(e.g. every published video in "Culture"), serialized once and written to
+SNAPSHOT_DIR as <collection>/<key>-<revision>.json, next to .json.gz and,
+when the brotli package is installed, .json.br copies. The revision is the
+listing namespace's ContentRevision, so a file never changes once written:
+a newer state of the catalog gets a new name. Files are written under a
+temporary name and renamed into place, the plain .json last, so a snapshot
+whose .json exists is complete. Older revisions are deleted once
+SNAPSHOT_KEEP newer ones exist.
+
+main.py hands SnapshotPublisher the namespaces each commit changed, and its
+thread rebuilds just those snapshots. A process that finds no file for the
+current revision (the write happened in another dyno, or the publisher is
+behind) builds it on demand. Only admin edits change a revision: counters
+such as download counts are not part of a snapshot (main.py serves them
+separately), so clicks never cause a rebuild.
+"""
+
+import os
+import re
+import sys
+import gzip
+import uuid
+import hashlib
+import tempfile
+import threading
+
+from logs import get_logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'catalog_snapshots'))
+SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', 3))
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+SNAPSHOT_NAME = re.compile(r'^(all|c[0-9a-f]{16})-(\d+)\.json$')
+
+log = get_logger('snapshots')
+
+
+def snapshot_key(category):
+    """File name part for a category; categories are free text, so they are hashed"""
+    if not category:
+        return 'all'
+    return 'c' + hashlib.sha1(category.encode()).hexdigest()[:16]
+
+
+def parse_snapshot_name(name):
+    """(key, revision) of a snapshot file name, or None if it isn't one"""
+    match = SNAPSHOT_NAME.match(name)
+    return (match.group(1), int(match.group(2))) if match else None
+
+
+class SnapshotStore:
+    def __init__(self, directory=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+        self.directory = directory
+        self.keep = max(keep, 1)
+        self.lock = threading.Lock()
+        self.counters = {'published': 0, 'built_on_demand': 0, 'served': 0, 'bytes_written': 0}
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def filename(self, category, revision):
+        return f"{snapshot_key(category)}-{revision}.json"
+
+    def path(self, collection, name):
+        return os.path.join(self.directory, collection, name)
+
+    def find(self, collection, category, revision):
+        """Path of the complete snapshot for this revision, or None"""
+        path = self.path(collection, self.filename(category, revision))
+        return path if os.path.exists(path) else None
+
+    def write(self, collection, category, revision, chunks):
+        """Store the bytes of chunks, and compressed copies, as the snapshot for revision; returns its path
+
+        chunks is written as it is produced, so the snapshot never has to
+        fit in memory as a whole.
+        """
+        path = self.path(collection, self.filename(category, revision))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        token = uuid.uuid4().hex
+        temp = {suffix: f"{path}{suffix}.{token}.tmp" for suffix in ('', '.gz') + (('.br',) if brotli else ())}
+        plain = open(temp[''], 'wb')
+        gz = gzip.GzipFile(temp['.gz'], 'wb', compresslevel=9, mtime=0)
+        br = open(temp['.br'], 'wb') if brotli else None
+        compressor = brotli.Compressor(quality=11) if brotli else None
+        try:
+            for chunk in chunks:
+                plain.write(chunk)
+                gz.write(chunk)
+                if br:
+                    br.write(compressor.process(chunk))
+            if br:
+                br.write(compressor.finish())
+        finally:
+            for f in (plain, gz, br):
+                if f:
+                    f.close()
+            if sys.exc_info()[0]:
+                for temp_path in temp.values():
+                    os.unlink(temp_path)
+        # The plain file goes last: its presence means the snapshot is complete
+        for suffix in sorted(temp, key=lambda suffix: suffix == ''):
+            self.count('bytes_written', os.path.getsize(temp[suffix]))
+            os.replace(temp[suffix], path + suffix)
+        self.prune(collection, category, revision)
+        return path
+
+    def prune(self, collection, category, revision):
+        """Delete revisions of this snapshot older than the newest SNAPSHOT_KEEP"""
+        pattern = re.compile(rf"^{snapshot_key(category)}-(\d+)\.json(\.gz|\.br)?$")
+        try:
+            names = os.listdir(os.path.join(self.directory, collection))
+        except OSError:
+            return
+        revisions = sorted({int(m.group(1)) for m in map(pattern.match, names) if m}, reverse=True)
+        stale = set(revisions[self.keep:])
+        for name in names:
+            m = pattern.match(name)
+            if m and int(m.group(1)) in stale and int(m.group(1)) < revision:
+                try:
+                    os.unlink(os.path.join(self.directory, collection, name))
+                except OSError:
+                    pass
+
+    def negotiate(self, path, accept_encodings):
+        """(file to send, Content-Encoding or None) for the client's Accept-Encoding"""
+        for encoding, suffix in ENCODINGS:
+            if accept_encodings[encoding] and os.path.exists(path + suffix):
+                return path + suffix, encoding
+        return path, None
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats['directory'] = self.directory
+        stats['brotli'] = brotli is not None
+        return stats
+
+
+class SnapshotPublisher:
+    def __init__(self, publish):
+        """publish(namespace) rebuilds one namespace's snapshot (called on this class's thread)"""
+        self.publish = publish
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.started_pid = None
+
+    def request(self, namespaces):
+        """Queue namespaces for rebuilding; returns immediately"""
+        with self.lock:
+            self.pending.update(namespaces)
+        self.start()
+        self.wakeup.set()
+
+    def start(self):
+        if self.started_pid == os.getpid():
+            return
+        with self.lock:
+            if self.started_pid == os.getpid():
+                return
+            self.started_pid = os.getpid()
+            threading.Thread(target=self.loop, name='snapshot-publisher', daemon=True).start()
+
+    def loop(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            self.publish_pending()
+
+    def publish_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, set()
+        for namespace in sorted(pending):
+            try:
+                self.publish(namespace)
+            except Exception as e:
+                # The next read of this namespace builds it on demand instead
+                log.exception('snapshot_publish_failed', namespace=namespace, error=str(e))
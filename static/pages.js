@@ -0,0 +1,17 @@
+// Shared by the site pages and the admin panel: list endpoints return one
+// page at a time (PAGE_SIZE items unless ?limit= is given) and link the
+// next page with X-Next-Cursor, so callers that need every item follow it.
+
+// Fetch every page of a list endpoint (pages are linked by X-Next-Cursor)
+async function fetchAllPages(url) {
+    const items = [];
+    let cursor = null;
+    do {
+        const separator = url.includes('?') ? '&' : '?';
+        const response = await fetch(cursor ? `${url}${separator}cursor=${encodeURIComponent(cursor)}` : url);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        items.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return items;
+}
@@ -0,0 +1,169 @@
+"""
+Shared HTTP client for Supabase Storage
+
+One requests.Session per process keeps TLS connections to storage alive
+across requests. Every call names an operation (upload, list, delete, ...)
+which picks its timeout, and idempotent calls are retried with jittered
+exponential backoff on connection errors and 429/5xx responses. Pool
+hit/miss counters show how often a request had to open a new connection.
+Every attempt is timed and counted per operation in metrics.py.
+"""
+
+import os
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics
+
+STORAGE_POOL_SIZE = int(os.environ.get('STORAGE_POOL_SIZE', 10))
+STORAGE_CONNECT_TIMEOUT = float(os.environ.get('STORAGE_CONNECT_TIMEOUT', 5))
+STORAGE_MAX_RETRIES = int(os.environ.get('STORAGE_MAX_RETRIES', 3))
+STORAGE_BACKOFF_BASE = float(os.environ.get('STORAGE_BACKOFF_BASE', 0.2))
+STORAGE_BACKOFF_CAP = float(os.environ.get('STORAGE_BACKOFF_CAP', 5))
+
+# Read timeouts in seconds per operation, overridable with STORAGE_TIMEOUT_<OPERATION>
+DEFAULT_TIMEOUTS = {
+    'probe': 10,
+    'upload': 300,
+    'list': 30,
+    'delete': 30,
+    'get': 60,
+    'download': 120,
+}
+TIMEOUTS = {
+    operation: float(os.environ.get(f'STORAGE_TIMEOUT_{operation.upper()}', seconds))
+    for operation, seconds in DEFAULT_TIMEOUTS.items()
+}
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+RETRY_STATUSES = {429, 502, 503, 504}
+
+_stats_lock = threading.Lock()
+_stats = {'requests': 0, 'pool_misses': 0, 'retries': 0, 'errors': 0}
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count('pool_misses')
+        return super()._new_conn()
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count('pool_misses')
+        return super()._new_conn()
+
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count every new connection they open"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+def get_session():
+    """The keep-alive session for this process (recreated after fork)"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = CountingAdapter(pool_connections=4, pool_maxsize=STORAGE_POOL_SIZE, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def timeout_for(operation):
+    return (STORAGE_CONNECT_TIMEOUT, TIMEOUTS.get(operation, TIMEOUTS['get']))
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(STORAGE_BACKOFF_CAP, STORAGE_BACKOFF_BASE * 2 ** attempt))
+
+
+def sent_bytes(kwargs):
+    """Size of a request body given as data=/content= (streamed bodies: their Content-Length)"""
+    body = kwargs.get('data', kwargs.get('content'))
+    if body is None or isinstance(body, dict):
+        return 0
+    try:
+        return len(body)
+    except TypeError:
+        return int((kwargs.get('headers') or {}).get('Content-Length') or 0)
+
+
+def record_call(operation, method, status, seconds, kwargs, response_headers=None):
+    """Count and time one storage call; status is the HTTP status or 'error'"""
+    metrics.inc('storage_requests_total', operation=operation, status=status)
+    metrics.observe('storage_request_duration_seconds', seconds, operation=operation)
+    sent = sent_bytes(kwargs)
+    if sent:
+        metrics.inc('storage_bytes_sent_total', sent, operation=operation)
+    if response_headers is not None and method != 'HEAD':
+        received = int(response_headers.get('Content-Length') or 0)
+        if received:
+            metrics.inc('storage_bytes_received_total', received, operation=operation)
+
+
+def request(operation, method, url, idempotent=None, **kwargs):
+    """Send a storage request through the shared session
+
+    idempotent defaults to the HTTP method's semantics; pass True for
+    read-only POSTs such as bucket listing. Non-idempotent calls are sent
+    exactly once. Streaming request bodies are never retried.
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    if kwargs.get('data') is not None and not isinstance(kwargs['data'], (bytes, str, dict)):
+        idempotent = False
+    kwargs.setdefault('timeout', timeout_for(operation))
+    attempts = STORAGE_MAX_RETRIES + 1 if idempotent else 1
+
+    session = get_session()
+    for attempt in range(attempts):
+        _count('requests')
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            record_call(operation, method, 'error', time.perf_counter() - started, kwargs)
+            if attempt == attempts - 1:
+                _count('errors')
+                raise
+        else:
+            record_call(operation, method, response.status_code, time.perf_counter() - started, kwargs, response.headers)
+            if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                return response
+            response.close()
+        _count('retries')
+        time.sleep(backoff_delay(attempt))
+
+
+def stats():
+    """Request, retry and connection-pool counters for this process"""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    snapshot['pool_hits'] = max(0, snapshot['requests'] - snapshot['pool_misses'])
+    return snapshot
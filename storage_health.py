@@ -0,0 +1,92 @@
+"""
+Background health check of Supabase Storage
+
+main.py used to probe the bucket API while it was being imported, so every
+worker boot waited on the network (for the whole probe timeout when storage
+was down) and the answer never changed afterwards. StorageHealth probes from
+a thread instead, started with the worker's first request, and probes again
+every STORAGE_PROBE_INTERVAL seconds (every STORAGE_PROBE_RETRY seconds
+while storage is down), so an outage and the recovery from it are both
+noticed. Until the first probe has answered, storage counts as available
+whenever credentials are configured, so nothing is refused during boot.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime, timezone
+
+from logs import get_logger
+
+STORAGE_PROBE_INTERVAL = float(os.environ.get('STORAGE_PROBE_INTERVAL', 60))
+STORAGE_PROBE_RETRY = float(os.environ.get('STORAGE_PROBE_RETRY', 10))
+
+log = get_logger('storage_health')
+
+
+class StorageHealth:
+    def __init__(self, probe, configured, interval=STORAGE_PROBE_INTERVAL, retry=STORAGE_PROBE_RETRY):
+        """probe() returns None when storage answers, or a description of what failed
+
+        An interval of 0 turns background probing off; check() still works.
+        """
+        self.probe = probe
+        self.configured = configured
+        self.interval = interval
+        self.retry = min(retry, interval) if interval > 0 else retry
+        self.ok = configured
+        self.error = None if configured else 'missing credentials'
+        self.checked_at = None
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.started_pid = None
+
+    @property
+    def available(self):
+        return self.configured and self.ok
+
+    def check(self):
+        """Probe storage now and record the result; returns whether it is available"""
+        if not self.configured:
+            return False
+        try:
+            error = self.probe()
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        with self.lock:
+            changed = self.checked_at is None or (error is None) != self.ok
+            self.ok = error is None
+            self.error = error
+            self.checked_at = time.time()
+            self.failures = 0 if self.ok else self.failures + 1
+        if changed:
+            if self.ok:
+                log.info('storage_probe_ok')
+            else:
+                log.warning('storage_probe_failed', error=error, consecutive_failures=self.failures)
+        return self.ok
+
+    def start(self):
+        """Start this process's probe thread once (safe to call per request)"""
+        if not self.configured or self.interval <= 0 or self.started_pid == os.getpid():
+            return
+        with self.lock:
+            if self.started_pid == os.getpid():
+                return
+            self.started_pid = os.getpid()
+            threading.Thread(target=self.loop, name='storage-probe', daemon=True).start()
+
+    def loop(self):
+        while True:
+            self.check()
+            time.sleep(self.interval if self.ok else self.retry)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'available': self.available,
+                'checked_at': datetime.fromtimestamp(self.checked_at, timezone.utc).isoformat() if self.checked_at else None,
+                'error': self.error,
+                'consecutive_failures': self.failures,
+                'interval': self.interval
+            }
@@ -0,0 +1,110 @@
+"""
+Bucket listing for the admin file browser
+
+Supabase's list endpoint returns one folder level, one page (limit/offset)
+at a time. BucketLister walks a bucket, or one prefix of it, by keeping
+several page requests in flight: once a folder's first page comes back
+full, up to STORAGE_LIST_CONCURRENCY of its next pages are requested at
+once, and every subfolder found starts a walk of its own. A failed page
+aborts the whole walk, so a partial listing is never mistaken for the
+bucket's contents.
+
+main.py stores the walk's result in the StorageObject table, keeps it
+current from its own uploads and deletes, and reconciles it with a full
+walk every STORAGE_RECONCILE_SECONDS; /api/files reads only that table.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+STORAGE_LIST_PAGE_SIZE = int(os.environ.get('STORAGE_LIST_PAGE_SIZE', 1000))
+STORAGE_LIST_CONCURRENCY = int(os.environ.get('STORAGE_LIST_CONCURRENCY', 4))
+STORAGE_RECONCILE_SECONDS = int(os.environ.get('STORAGE_RECONCILE_SECONDS', 900))
+
+
+def join_path(prefix, name):
+    return f"{prefix}/{name}" if prefix else name
+
+
+def parse_timestamp(value):
+    """Naive UTC datetime from an ISO timestamp such as 2024-01-01T00:00:00.000Z (None if unusable)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def object_from_listing(prefix, info):
+    """Index row for one file entry of a list response"""
+    metadata = info.get('metadata') or {}
+    created_at = parse_timestamp(info.get('created_at')) or parse_timestamp(info.get('updated_at'))
+    return {
+        'name': join_path(prefix, info['name']),
+        'size': metadata.get('size'),
+        'content_type': metadata.get('mimetype'),
+        'etag': (metadata.get('eTag') or '').strip('"') or None,
+        'created_at': created_at or datetime.utcnow(),
+    }
+
+
+class BucketLister:
+    def __init__(self, list_page, page_size=STORAGE_LIST_PAGE_SIZE, concurrency=STORAGE_LIST_CONCURRENCY):
+        """list_page(prefix, offset, limit) returns one page of list endpoint entries"""
+        self.list_page = list_page
+        self.page_size = page_size
+        self.concurrency = max(concurrency, 1)
+        self.pages = 0
+        self.seconds = None
+
+    def walk(self, prefix=''):
+        """Every object under prefix, as object_from_listing() rows"""
+        self.pages = 0
+        started = time.perf_counter()
+        objects = {}
+        pending = {}
+        next_offset = {}
+        in_flight = {}
+        finished = set()
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='storage-list')
+
+        def request_page(folder):
+            offset = next_offset[folder]
+            next_offset[folder] += self.page_size
+            in_flight[folder] += 1
+            pending[pool.submit(self.list_page, folder, offset, self.page_size)] = folder
+
+        def start(folder):
+            next_offset[folder] = 0
+            in_flight[folder] = 0
+            request_page(folder)
+
+        try:
+            start(prefix.strip('/'))
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    folder = pending.pop(future)
+                    in_flight[folder] -= 1
+                    entries = future.result()
+                    self.pages += 1
+                    for info in entries:
+                        if info.get('id') is None:
+                            start(join_path(folder, info['name']))
+                        else:
+                            row = object_from_listing(folder, info)
+                            objects[row['name']] = row
+                    if len(entries) < self.page_size:
+                        finished.add(folder)
+                    while folder not in finished and in_flight[folder] < self.concurrency:
+                        request_page(folder)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.seconds = time.perf_counter() - started
+        return list(objects.values())
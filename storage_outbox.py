@@ -0,0 +1,157 @@
+"""
+Deletion outbox for files in storage
+
+Deleting a video or document queues the storage keys of its files as rows
+of the outbox table in the same transaction (see queue_storage_deletions in
+main.py), so a rolled-back delete never removes a file and a worker that
+dies after the commit never forgets one. Each worker process runs a thread
+that claims due rows in batches, skips keys something still refers to,
+removes the rest with one multi-object delete and retries failures with
+exponential backoff. Keys wait STORAGE_DELETE_DELAY seconds before their
+first attempt, so an identical re-upload can still claim the file.
+"""
+
+import os
+import uuid
+import random
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, select
+
+from logs import get_logger
+
+STORAGE_DELETE_INTERVAL = float(os.environ.get('STORAGE_DELETE_INTERVAL', 30))
+STORAGE_DELETE_DELAY = int(os.environ.get('STORAGE_DELETE_DELAY', 60))
+STORAGE_DELETE_BATCH_SIZE = int(os.environ.get('STORAGE_DELETE_BATCH_SIZE', 100))
+# Longest wait between attempts for a key storage keeps refusing
+STORAGE_DELETE_MAX_BACKOFF = 3600
+# A claimed batch is retried by another worker if it is not finished in time
+CLAIM_SECONDS = 300
+
+log = get_logger('storage_outbox')
+
+
+class DeletionOutbox:
+    def __init__(self, app, db, model, delete_files, keys_in_use, interval=STORAGE_DELETE_INTERVAL):
+        """delete_files(keys) removes keys from storage; keys_in_use(keys) returns those still referenced"""
+        self.app = app
+        self.db = db
+        self.model = model
+        self.delete_files = delete_files
+        self.keys_in_use = keys_in_use
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.process_lock = threading.Lock()
+        self.started_pid = None
+        self.counters = {'deleted': 0, 'skipped_in_use': 0, 'failures': 0, 'batches': 0}
+
+    def enqueue(self, conn, keys, reason, delay=STORAGE_DELETE_DELAY):
+        """Queue keys for deletion in conn's transaction"""
+        if not keys:
+            return
+        due = datetime.utcnow() + timedelta(seconds=delay)
+        conn.execute(self.model.__table__.insert(), [
+            {'filename': key, 'reason': reason, 'attempts': 0, 'next_attempt_at': due, 'created_at': datetime.utcnow()}
+            for key in dict.fromkeys(keys)
+        ])
+
+    def start(self):
+        """Start this process's deletion thread once (cheap to call per request)"""
+        if self.started_pid == os.getpid() or self.interval <= 0:
+            return
+        with self.lock:
+            if self.started_pid == os.getpid():
+                return
+            self.started_pid = os.getpid()
+            threading.Thread(target=self.loop, name='storage-deletions', daemon=True).start()
+
+    def loop(self):
+        while True:
+            # Jitter keeps workers started together from claiming in lockstep
+            self.wakeup.wait(self.interval * random.uniform(0.8, 1.2))
+            self.wakeup.clear()
+            try:
+                self.process()
+            except Exception as e:
+                log.exception('storage_deletion_worker_error', error=str(e))
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def claim(self, session):
+        """Mark up to a batch of due rows as ours; returns [(id, filename, attempts)]"""
+        table = self.model.__table__
+        now = datetime.utcnow()
+        token = str(uuid.uuid4())
+        due = (select(table.c.id).where(table.c.next_attempt_at <= now)
+               .order_by(table.c.next_attempt_at).limit(STORAGE_DELETE_BATCH_SIZE))
+        session.execute(
+            table.update()
+            .where(table.c.id.in_(due), table.c.next_attempt_at <= now)
+            .values(claimed_by=token, next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+        )
+        session.commit()
+        return session.execute(
+            select(table.c.id, table.c.filename, table.c.attempts).where(table.c.claimed_by == token)
+        ).all()
+
+    def process(self):
+        """Work through every due row; returns the number of keys deleted from storage"""
+        deleted = 0
+        with self.process_lock, self.app.app_context():
+            session = self.db.session
+            table = self.model.__table__
+            while True:
+                rows = self.claim(session)
+                if not rows:
+                    return deleted
+                self.count('batches')
+                keys = {filename for _, filename, _ in rows}
+                try:
+                    in_use = set(self.keys_in_use(keys))
+                    to_delete = sorted(keys - in_use)
+                    if to_delete:
+                        self.delete_files(to_delete)
+                except Exception as e:
+                    log.exception('storage_deletion_batch_failed', keys=len(keys), error=str(e))
+                    self.count('failures')
+                    session.rollback()
+                    now = datetime.utcnow()
+                    session.execute(
+                        table.update().where(table.c.id == bindparam('row_id')).values(
+                            attempts=table.c.attempts + 1, next_attempt_at=bindparam('retry_at'),
+                            claimed_by=None, last_error=str(e)[:500]
+                        ),
+                        [{'row_id': row_id, 'retry_at': now + timedelta(seconds=self.backoff(attempts))}
+                         for row_id, _, attempts in rows]
+                    )
+                    session.commit()
+                    # Leave the remaining rows for the next round rather than hammering storage
+                    return deleted
+                session.execute(table.delete().where(table.c.id.in_([row_id for row_id, _, _ in rows])))
+                session.commit()
+                deleted += len(to_delete)
+                self.count('deleted', len(to_delete))
+                self.count('skipped_in_use', len(in_use))
+
+    @staticmethod
+    def backoff(attempts):
+        return min(STORAGE_DELETE_MAX_BACKOFF, 30 * 2 ** attempts)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        try:
+            with self.app.app_context():
+                table = self.model.__table__
+                pending, failing = self.db.session.execute(
+                    select(func.count(), func.count(table.c.last_error)).select_from(table)
+                ).one()
+            stats.update(pending=pending, failing=failing)
+        except Exception as e:
+            stats['error'] = str(e)
+        stats['interval'] = self.interval
+        return stats
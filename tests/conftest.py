@@ -0,0 +1,75 @@
+"""
+Test setup: the app runs against a throwaway SQLite database and the storage
+stand-in from benchmarks/fake_storage.py, with every cache, spool and
+snapshot directory under one temporary directory.
+
+The environment is set before main is imported, because main reads its
+configuration at import time.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_storage import start_fake_storage
+
+WORKDIR = tempfile.mkdtemp(prefix='app_tests_')
+storage_server, STORAGE_URL = start_fake_storage(root=os.path.join(WORKDIR, 'storage'))
+
+TEST_ENV = {
+    'SUPABASE_URL': STORAGE_URL,
+    'SUPABASE_KEY': 'test',
+    'DATABASE_URL': f"sqlite:///{os.path.join(WORKDIR, 'app.db')}",
+    'RESPONSE_CACHE_PATH': os.path.join(WORKDIR, 'response_cache.sqlite3'),
+    'SNAPSHOT_DIR': os.path.join(WORKDIR, 'snapshots'),
+    'METRICS_DIR': os.path.join(WORKDIR, 'metrics'),
+    'JOB_SPOOL_DIR': os.path.join(WORKDIR, 'spool'),
+    'DOCUMENT_CACHE_DIR': os.path.join(WORKDIR, 'document_cache'),
+    # Jobs run inline, so a request's side effects are done when it returns
+    'JOB_WORKERS': '0',
+    'STORAGE_DELETE_DELAY': '0',
+    'LOG_LEVEL': 'CRITICAL',
+}
+os.environ.update(TEST_ENV)
+
+import main
+
+main.create_schema()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    storage_server.shutdown()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def app_main():
+    """The main module with empty tables and an empty bucket"""
+    with main.app.app_context():
+        for table in reversed(main.db.metadata.sorted_tables):
+            main.db.session.execute(table.delete())
+        main.db.session.commit()
+    shutil.rmtree(storage_server.storage.root, ignore_errors=True)
+    os.makedirs(storage_server.storage.root)
+    main.response_cache.clear()
+    # Revisions start again from an empty table, so older snapshot files would match them
+    shutil.rmtree(TEST_ENV['SNAPSHOT_DIR'], ignore_errors=True)
+    return main
+
+
+@pytest.fixture
+def client(app_main):
+    return app_main.app.test_client()
+
+
+@pytest.fixture
+def storage():
+    """The fake storage's state (objects live under storage.root/<bucket>/)"""
+    return storage_server.storage
@@ -0,0 +1,77 @@
+"""Precompressed catalog snapshots served from files (see snapshots.py)"""
+
+import gzip
+import json
+
+
+def add_video(app_main, title, category='Science', is_published=True, order_index=0):
+    with app_main.app.app_context():
+        app_main.db.session.add(app_main.VideoContent(
+            title=title, video_url=f'https://example.com/{title}.mp4', category=category,
+            is_published=is_published, order_index=order_index))
+        app_main.db.session.commit()
+
+
+def titles(response):
+    return [video['title'] for video in response.get_json()]
+
+
+def test_snapshot_lists_published_videos_in_order(client, app_main):
+    add_video(app_main, 'Low', order_index=1)
+    add_video(app_main, 'High', order_index=5)
+    add_video(app_main, 'Draft', is_published=False)
+    response = client.get('/catalog/videos.json')
+    assert response.status_code == 200
+    assert titles(response) == ['High', 'Low']
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert titles(client.get('/catalog/videos.json?category=Science')) == ['High', 'Low']
+    assert titles(client.get('/catalog/videos.json?category=History')) == []
+
+
+def test_unchanged_snapshot_is_not_modified(client, app_main):
+    add_video(app_main, 'First')
+    first = client.get('/catalog/videos.json')
+    again = client.get('/catalog/videos.json', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+
+    # The revision's own URL never changes, so it is cacheable for good
+    immutable = client.get(first.headers['Content-Location'])
+    assert immutable.status_code == 200
+    assert 'immutable' in immutable.headers['Cache-Control']
+    assert immutable.get_data() == first.get_data()
+
+
+def test_write_publishes_a_new_revision(client, app_main):
+    add_video(app_main, 'First')
+    first = client.get('/catalog/videos.json')
+    add_video(app_main, 'Second', order_index=1)
+    after = client.get('/catalog/videos.json', headers={'If-None-Match': first.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert titles(after) == ['Second', 'First']
+
+
+def test_each_encoding_has_its_own_etag(client, app_main):
+    add_video(app_main, 'First')
+    plain = client.get('/catalog/videos.json')
+    gzipped = client.get('/catalog/videos.json', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['ETag'] != plain.headers['ETag']
+    assert 'Accept-Encoding' in gzipped.headers['Vary']
+    assert json.loads(gzip.decompress(gzipped.get_data())) == plain.get_json()
+    # A revalidated gzip copy is not an answer to a request for the plain one
+    stale = client.get('/catalog/videos.json', headers={'If-None-Match': gzipped.headers['ETag']})
+    assert stale.status_code == 200
+
+
+def test_counter_flushes_keep_the_snapshot(client, app_main):
+    with app_main.app.app_context():
+        document = app_main.Document(title='Doc', file_url='https://example.com/doc.pdf', filename='doc.pdf')
+        app_main.db.session.add(document)
+        app_main.db.session.commit()
+        doc_id = document.id
+    first = client.get('/catalog/documents.json')
+    client.get(f'/download/{doc_id}')
+    app_main.download_counters.flush()
+    again = client.get('/catalog/documents.json', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
@@ -0,0 +1,66 @@
+"""ETag / Last-Modified answers of the read APIs (see conditional_get in main.py)"""
+
+import os
+import sys
+import json
+import subprocess
+
+from conftest import ROOT, TEST_ENV, WORKDIR
+
+# A second dyno: its own process, its own response cache, the same database
+OTHER_DYNO = '''
+import sys, json
+import main
+response = main.app.test_client().get(sys.argv[1])
+print(json.dumps({'etag': response.headers.get('ETag'), 'body': response.get_json()}))
+'''
+
+
+def read_on_other_dyno(path):
+    env = {**os.environ, **TEST_ENV, 'RESPONSE_CACHE_PATH': os.path.join(WORKDIR, 'other_dyno_cache.sqlite3')}
+    output = subprocess.run([sys.executable, '-c', OTHER_DYNO, path], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def add_text(app_main, title):
+    with app_main.app.app_context():
+        app_main.db.session.add(app_main.TextContent(title=title, content='...'))
+        app_main.db.session.commit()
+
+
+def test_unchanged_listing_is_not_modified(client, app_main):
+    add_text(app_main, 'First')
+    first = client.get('/api/texts')
+    assert first.status_code == 200
+    again = client.get('/api/texts', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def test_write_changes_etag_and_body(client, app_main):
+    add_text(app_main, 'First')
+    first = client.get('/api/texts')
+    add_text(app_main, 'Second')
+    after = client.get('/api/texts', headers={'If-None-Match': first.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert sorted(t['title'] for t in after.get_json()) == ['First', 'Second']
+
+
+def test_write_on_one_dyno_is_seen_by_another(client, app_main):
+    add_text(app_main, 'First')
+    before = read_on_other_dyno('/api/texts')
+    assert [t['title'] for t in before['body']] == ['First']
+
+    # Written through this process: the other one's cache hears nothing of it
+    response = client.post('/api/texts', json={'title': 'Second', 'content': '...'})
+    assert response.status_code in (200, 201)
+
+    after = read_on_other_dyno('/api/texts')
+    assert after['etag'] != before['etag']
+    assert sorted(t['title'] for t in after['body']) == ['First', 'Second']
+    # This process answers with the same representation
+    local = client.get('/api/texts')
+    assert local.headers['ETag'] == after['etag']
+    assert local.get_json() == after['body']
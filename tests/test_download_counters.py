@@ -0,0 +1,56 @@
+"""Buffered download counts (see counters.py)"""
+
+from counters import CounterBuffer
+
+
+def add_document(app_main, title, is_published=True):
+    with app_main.app.app_context():
+        document = app_main.Document(title=title, file_url=f'https://example.com/{title}.pdf', filename=f'{title}.pdf',
+                                     is_published=is_published)
+        app_main.db.session.add(document)
+        app_main.db.session.commit()
+        return document.id
+
+
+def download_count(app_main, doc_id):
+    with app_main.app.app_context():
+        return app_main.db.session.get(app_main.Document, doc_id).download_count or 0
+
+
+def test_increments_are_written_in_one_flush(app_main):
+    first, second = add_document(app_main, 'first'), add_document(app_main, 'second')
+    counters = CounterBuffer(app_main.app, app_main.db, interval=3600)
+    for _ in range(5):
+        counters.increment(app_main.Document.download_count, first)
+    counters.increment(app_main.Document.download_count, second, amount=2)
+    assert download_count(app_main, first) == 0
+
+    assert counters.flush() == 2
+    assert (download_count(app_main, first), download_count(app_main, second)) == (5, 2)
+    assert counters.flush() == 0
+    assert counters.stats()['increments'] == 7
+
+
+def test_counts_are_added_to_the_stored_value(app_main):
+    doc_id = add_document(app_main, 'doc')
+    for amount in (3, 4):
+        counters = CounterBuffer(app_main.app, app_main.db, interval=0)
+        counters.increment(app_main.Document.download_count, doc_id, amount=amount)
+    assert download_count(app_main, doc_id) == 7
+
+
+def test_downloads_leave_cached_listings_valid(client, app_main):
+    doc_id = add_document(app_main, 'doc')
+    draft_id = add_document(app_main, 'draft', is_published=False)
+    listing = client.get('/api/documents')
+
+    for _ in range(3):
+        response = client.get(f'/download/{doc_id}')
+        assert response.status_code == 302
+    assert client.get(f'/download/{draft_id}').status_code == 404
+    app_main.download_counters.flush()
+
+    again = client.get('/api/documents', headers={'If-None-Match': listing.headers['ETag']})
+    assert again.status_code == 304
+    assert client.get('/api/documents/downloads').get_json() == {str(doc_id): 3}
+    assert client.get('/api/admin/documents/downloads').get_json() == {str(doc_id): 3, str(draft_id): 0}
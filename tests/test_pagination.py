@@ -0,0 +1,89 @@
+"""Keyset pages and field projection of the list endpoints (see pagination.py)"""
+
+import json
+import base64
+
+import pytest
+
+
+def add_videos(app_main, count, order_index=0):
+    with app_main.app.app_context():
+        app_main.db.session.add_all([
+            app_main.VideoContent(title=f'Video {i}', video_url=f'https://example.com/{i}.mp4', order_index=order_index)
+            for i in range(count)
+        ])
+        app_main.db.session.commit()
+
+
+def walk(client, url):
+    items, pages = [], 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        items.extend(response.get_json())
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        assert ('Link' in response.headers) == bool(cursor)
+        url = f"/api/admin/videos?limit=7&cursor={cursor}" if cursor else None
+    return items, pages
+
+
+def test_pages_cover_every_row_once_despite_ties(client, app_main):
+    # Every row shares order_index, so only the id breaks ties
+    add_videos(app_main, 30)
+    items, pages = walk(client, '/api/admin/videos?limit=7')
+    assert pages == 5
+    ids = [item['id'] for item in items]
+    assert len(set(ids)) == 30
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_rows_added_while_paging_do_not_shift_pages(client, app_main):
+    add_videos(app_main, 10)
+    first = client.get('/api/admin/videos?limit=5')
+    add_videos(app_main, 3)
+    rest = client.get(f"/api/admin/videos?limit=5&cursor={first.headers['X-Next-Cursor']}")
+    seen = [item['id'] for item in first.get_json() + rest.get_json()]
+    assert len(set(seen)) == 10
+
+
+def test_fields_select_columns(client, app_main):
+    add_videos(app_main, 2)
+    response = client.get('/api/admin/videos?fields=id,title')
+    assert all(set(item) == {'id', 'title'} for item in response.get_json())
+    assert client.get('/api/admin/videos?fields=id,password').status_code == 400
+
+
+def test_limit_is_capped(client, app_main):
+    add_videos(app_main, 3)
+    assert client.get('/api/admin/videos?limit=0').status_code == 400
+    assert client.get('/api/admin/videos?limit=ten').status_code == 400
+    assert len(client.get(f'/api/admin/videos?limit={10 ** 9}').get_json()) == 3
+
+
+def encode(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    'é',
+    encode('not json'),
+    encode(json.dumps({'order_index': 1})),
+    encode(json.dumps([1])),
+    encode(json.dumps([{'a': 1}, 2])),
+    encode(json.dumps([[1], 2])),
+    encode(json.dumps(['1', 2])),
+    encode(json.dumps([True, 2])),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+])
+def test_malformed_cursor_is_a_bad_request(client, app_main, cursor):
+    add_videos(app_main, 3)
+    response = client.get('/api/admin/videos', query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert 'cursor' in response.get_json()['error']
+
+
+def test_malformed_date_cursor_is_a_bad_request(client, app_main):
+    response = client.get('/api/admin/documents', query_string={'cursor': encode(json.dumps(['yesterday', 1]))})
+    assert response.status_code == 400
@@ -0,0 +1,102 @@
+"""TUS uploads in parallel parts, with retries and resume (see resumable_upload.py)"""
+
+import os
+
+import pytest
+import requests
+
+from conftest import STORAGE_URL
+from resumable_upload import ResumableUpload
+
+PART_SIZE = 64 * 1024
+
+
+@pytest.fixture
+def upload_file(tmp_path):
+    content = os.urandom(5 * PART_SIZE + 1000)
+    path = tmp_path / 'movie.mp4'
+    path.write_bytes(content)
+    return path, content
+
+
+@pytest.fixture
+def state_dir(tmp_path):
+    return str(tmp_path / 'state')
+
+
+@pytest.fixture
+def storage_settings(storage):
+    yield storage
+    storage.fail_every = 0
+    storage.concatenation = True
+
+
+def make_upload(f, object_name, state_dir, **options):
+    options.setdefault('part_size', PART_SIZE)
+    return ResumableUpload(STORAGE_URL, 'test', 'videos', object_name, f, 'video/mp4', state_dir=state_dir, **options)
+
+
+def stored_object(storage, name):
+    with open(os.path.join(storage.root, 'videos', name), 'rb') as f:
+        return f.read()
+
+
+class FailingSession(requests.Session):
+    """Session whose PATCH requests fail once `allowed` of them have gone through"""
+
+    def __init__(self, allowed):
+        super().__init__()
+        self.allowed = allowed
+
+    def patch(self, *args, **kwargs):
+        if self.allowed <= 0:
+            raise requests.ConnectionError('connection dropped')
+        self.allowed -= 1
+        return super().patch(*args, **kwargs)
+
+
+def test_parallel_parts_are_concatenated(upload_file, state_dir, storage_settings):
+    path, content = upload_file
+    with open(path, 'rb') as f:
+        stats = make_upload(f, 'parallel.mp4', state_dir).run()
+    assert stats['mode'] == 'parallel'
+    assert stats['parts'] == 6
+    assert stored_object(storage_settings, 'parallel.mp4') == content
+    assert os.listdir(state_dir) == []
+
+
+def test_sequential_without_concatenation(upload_file, state_dir, storage_settings):
+    storage_settings.concatenation = False
+    path, content = upload_file
+    with open(path, 'rb') as f:
+        stats = make_upload(f, 'sequential.mp4', state_dir).run()
+    assert stats['mode'] == 'sequential'
+    assert stored_object(storage_settings, 'sequential.mp4') == content
+
+
+def test_dropped_connections_are_retried(upload_file, state_dir, storage_settings):
+    # The fake storage drops a PATCH once 128 KiB of its body have arrived
+    storage_settings.fail_every = 1
+    path, content = upload_file
+    with open(path, 'rb') as f:
+        stats = make_upload(f, 'retried.mp4', state_dir, part_size=4 * PART_SIZE, workers=1, max_retries=3).run()
+    assert stats['retries'] > 0
+    assert stored_object(storage_settings, 'retried.mp4') == content
+
+
+def test_failed_upload_resumes_under_its_first_name(upload_file, state_dir, storage_settings):
+    path, content = upload_file
+    with open(path, 'rb') as f:
+        with pytest.raises(requests.ConnectionError):
+            make_upload(f, 'first.mp4', state_dir, workers=1, max_retries=0,
+                        session=FailingSession(allowed=3), content_key='abc').run()
+    assert len(os.listdir(state_dir)) == 1
+
+    # The retry of the same content picks up the finished parts
+    with open(path, 'rb') as f:
+        stats = make_upload(f, 'second.mp4', state_dir, content_key='abc').run()
+    assert stats['object_name'] == 'first.mp4'
+    assert stats['resumed_parts'] >= 3
+    assert stored_object(storage_settings, 'first.mp4') == content
+    assert not os.path.exists(os.path.join(storage_settings.root, 'videos', 'second.mp4'))
+    assert os.listdir(state_dir) == []
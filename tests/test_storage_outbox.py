@@ -0,0 +1,86 @@
+"""Storage deletions through the outbox, and the orphan collector (see storage_outbox.py)"""
+
+import os
+
+
+def put_object(storage, name, content=b'data'):
+    path = os.path.join(storage.root, 'videos', name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def bucket_files(storage):
+    directory = os.path.join(storage.root, 'videos')
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def pending_deletions(app_main):
+    with app_main.app.app_context():
+        return sorted(row.filename for row in app_main.StorageDeletion.query)
+
+
+def add(app_main, obj):
+    with app_main.app.app_context():
+        app_main.db.session.add(obj)
+        app_main.db.session.commit()
+        return obj.id
+
+
+def test_deleting_a_video_queues_and_removes_its_files(client, app_main, storage):
+    put_object(storage, 'clip.mp4')
+    put_object(storage, 'clip_thumb.jpg')
+    video_id = add(app_main, app_main.VideoContent(
+        title='Clip', video_url=app_main.storage_public_url('clip.mp4'),
+        thumbnail_url=app_main.storage_public_url('clip_thumb.jpg')))
+
+    assert client.delete(f'/api/videos/{video_id}').status_code == 200
+    assert pending_deletions(app_main) == ['clip.mp4', 'clip_thumb.jpg']
+    assert app_main.storage_outbox.process() == 2
+    assert bucket_files(storage) == []
+    assert pending_deletions(app_main) == []
+
+
+def test_rolled_back_delete_queues_nothing(app_main):
+    video_id = add(app_main, app_main.VideoContent(title='Clip', video_url=app_main.storage_public_url('clip.mp4')))
+    with app_main.app.app_context():
+        app_main.db.session.delete(app_main.db.session.get(app_main.VideoContent, video_id))
+        app_main.db.session.flush()
+        app_main.db.session.rollback()
+    assert pending_deletions(app_main) == []
+
+
+def test_files_still_in_use_are_kept(client, app_main, storage):
+    put_object(storage, 'shared.pdf')
+    put_object(storage, 'figure.png')
+    url = app_main.storage_public_url('shared.pdf')
+    first = add(app_main, app_main.Document(title='First', file_url=url, filename='shared.pdf'))
+    add(app_main, app_main.Document(title='Second', file_url=url, filename='shared.pdf'))
+    # An article embeds the image in its body
+    add(app_main, app_main.TextContent(
+        title='Article', content=f'<img src="{app_main.storage_public_url("figure.png")}">'))
+    with app_main.app.app_context():
+        with app_main.db.engine.begin() as conn:
+            app_main.storage_outbox.enqueue(conn, ['figure.png'], 'test', delay=0)
+
+    assert client.delete(f'/api/documents/{first}').status_code == 200
+    assert app_main.storage_outbox.process() == 0
+    assert bucket_files(storage) == ['figure.png', 'shared.pdf']
+
+
+def test_gc_reports_then_removes_orphans(client, app_main, storage, monkeypatch):
+    monkeypatch.setattr(app_main, 'STORAGE_GC_MIN_AGE_HOURS', 0)
+    put_object(storage, 'used.pdf')
+    put_object(storage, 'orphan.pdf')
+    put_object(storage, 'figure.png')
+    add(app_main, app_main.Document(title='Used', file_url=app_main.storage_public_url('used.pdf'), filename='used.pdf'))
+    add(app_main, app_main.TextContent(title='Article', content=f'See {app_main.storage_public_url("figure.png")}'))
+
+    dry_run = client.post('/api/files/gc', json={}).get_json()['result']
+    assert dry_run['dry_run'] is True
+    assert dry_run['sample'] == ['orphan.pdf']
+    assert bucket_files(storage) == ['figure.png', 'orphan.pdf', 'used.pdf']
+
+    client.post('/api/files/gc', json={'dry_run': False})
+    app_main.storage_outbox.process()
+    assert bucket_files(storage) == ['figure.png', 'used.pdf']
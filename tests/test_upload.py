@@ -0,0 +1,48 @@
+"""/api/upload streams the spooled body to storage (see SpoolingRequest and FileChunkStream in main.py)"""
+
+import io
+import os
+
+from conftest import TEST_ENV
+
+
+def stored_object(storage, name):
+    with open(os.path.join(storage.root, 'videos', name), 'rb') as f:
+        return f.read()
+
+
+def spooled_files():
+    spool_dir = TEST_ENV['JOB_SPOOL_DIR']
+    return [name for name in os.listdir(spool_dir) if os.path.isfile(os.path.join(spool_dir, name))] \
+        if os.path.isdir(spool_dir) else []
+
+
+def test_upload_reaches_storage_intact(client, storage):
+    content = os.urandom(3 * 1024 * 1024 + 123)
+    response = client.post('/api/upload', data={'type': 'document', 'file': (io.BytesIO(content), 'report.pdf')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['size'] == len(content)
+    assert result['method'] == 'http_upload'
+    assert stored_object(storage, result['filename']) == content
+
+
+def test_spool_is_removed_after_the_request(client):
+    client.post('/api/upload', data={'type': 'document', 'file': (io.BytesIO(b'x' * 4096), 'notes.txt')},
+                content_type='multipart/form-data')
+    # Rejected uploads are spooled too, and removed the same way
+    response = client.post('/api/upload', data={'type': 'document', 'file': (io.BytesIO(b'x' * 4096), 'tool.exe')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert spooled_files() == []
+
+
+def test_chunk_stream_sends_the_rest_of_the_file(app_main):
+    fileobj = io.BytesIO(b'0123456789' * 10)
+    fileobj.seek(5)
+    stream = app_main.FileChunkStream(fileobj, chunk_size=30)
+    assert len(stream) == 95
+    chunks = list(stream)
+    assert [len(chunk) for chunk in chunks] == [30, 30, 30, 5]
+    assert b''.join(chunks) == (b'0123456789' * 10)[5:]
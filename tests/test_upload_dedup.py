@@ -0,0 +1,66 @@
+"""Uploads of identical content share one stored file (see Blob and count_blob_references in main.py)"""
+
+import io
+import os
+import hashlib
+
+
+def upload(client, content, name='report.pdf'):
+    response = client.post('/api/upload', data={'type': 'document', 'file': (io.BytesIO(content), name)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def add_document(client, app_main, url, title):
+    assert client.post('/api/documents', json={'title': title, 'file_url': url}).status_code == 201
+    with app_main.app.app_context():
+        return app_main.Document.query.filter_by(title=title).one().id
+
+
+def blob(app_main, sha256):
+    with app_main.app.app_context():
+        return app_main.db.session.get(app_main.Blob, sha256)
+
+
+def bucket_files(storage):
+    return sorted(os.listdir(os.path.join(storage.root, 'videos')))
+
+
+def test_upload_is_hashed_while_spooled(client):
+    content = os.urandom(256 * 1024)
+    assert upload(client, content)['sha256'] == hashlib.sha256(content).hexdigest()
+
+
+def test_identical_upload_reuses_the_stored_file(client, app_main, storage):
+    content = os.urandom(100 * 1024)
+    first = upload(client, content)
+    add_document(client, app_main, first['url'], 'First')
+    second = upload(client, content, 'copy.pdf')
+    assert second['method'] == 'deduplicated'
+    assert second['url'] == first['url']
+    assert bucket_files(storage) == [first['filename']]
+    # Different content is stored separately
+    assert upload(client, content + b'!')['url'] != first['url']
+
+
+def test_file_is_deleted_with_its_last_reference(client, app_main, storage):
+    content = os.urandom(64 * 1024)
+    uploaded = upload(client, content)
+    sha256 = uploaded['sha256']
+    first = add_document(client, app_main, uploaded['url'], 'First')
+    second = add_document(client, app_main, upload(client, content)['url'], 'Second')
+    assert blob(app_main, sha256).ref_count == 2
+
+    assert client.delete(f'/api/documents/{first}').status_code == 200
+    assert blob(app_main, sha256).ref_count == 1
+    app_main.storage_outbox.process()
+    assert uploaded['filename'] in bucket_files(storage)
+
+    assert client.delete(f'/api/documents/{second}').status_code == 200
+    assert blob(app_main, sha256).ref_count == 0
+    app_main.storage_outbox.process()
+    assert uploaded['filename'] not in bucket_files(storage)
+    # The removed file's blob is forgotten, so the next upload stores the content again
+    assert blob(app_main, sha256) is None
+    assert upload(client, content)['method'] == 'http_upload'